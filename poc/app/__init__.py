@@ -1,11 +1,50 @@
+import os
+import tempfile
 from flask import Flask
 
-def create_app():
+def load_config():
+    """
+    Read the AIC-IF deployment settings from the environment
+    
+    AICIF_DATA_DIR: directory for persistent data (in-memory when unset)
+    AICIF_SHARING: 'local' for per-process components, 'shared' to use
+        one store process shared by all workers
+    AICIF_SHARED_ADDRESS: Unix socket path or host:port of the shared store
+    AICIF_SHARED_AUTHKEY: shared secret for connecting to the store
+    AICIF_GRAPH_BACKEND: 'networkx' (default) or 'compact' for the
+        integer-indexed CSR knowledge graph
+    AICIF_MODEL_DIR: directory of datasets and pickled models to serve
+        besides the sample ones
+    AICIF_MODEL_MEMORY_MB: memory budget for models loaded from
+        AICIF_MODEL_DIR (default 512)
+    AICIF_CREDIT_WINDOW: seconds of explanation credit aggregated into
+        one citation per DOI (default 60)
+    """
+    return {
+        'AICIF_DATA_DIR': os.environ.get('AICIF_DATA_DIR'),
+        'AICIF_SHARING': os.environ.get('AICIF_SHARING', 'local'),
+        'AICIF_SHARED_ADDRESS': os.environ.get(
+            'AICIF_SHARED_ADDRESS', os.path.join(tempfile.gettempdir(), 'aicif-store.sock')),
+        'AICIF_SHARED_AUTHKEY': os.environ.get('AICIF_SHARED_AUTHKEY', 'aicif-development-key'),
+        'AICIF_GRAPH_BACKEND': os.environ.get('AICIF_GRAPH_BACKEND', 'networkx'),
+        'AICIF_MODEL_DIR': os.environ.get('AICIF_MODEL_DIR'),
+        'AICIF_MODEL_MEMORY_MB': int(os.environ.get('AICIF_MODEL_MEMORY_MB', 512)),
+        'AICIF_CREDIT_WINDOW': float(os.environ.get('AICIF_CREDIT_WINDOW', 60))
+    }
+
+def create_app(config=None):
     app = Flask(__name__, 
                 static_folder='../static',
                 template_folder='../templates')
     
     app.config['SECRET_KEY'] = 'aicif-development-key'
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+    
+    # Shared components used by all blueprints
+    from app.services import init_services
+    init_services(app)
     
     # Register blueprints
     from app.main import bp as main_bp
@@ -1,13 +1,13 @@
-from flask import jsonify, request, current_app
+from flask import Response, jsonify, request, current_app, stream_with_context, url_for
 from app.api import bp
-from app.models.citation_registry import CitationRegistry
-from app.models.knowledge_graph import KnowledgeGraph
+from app.services import (centrality_index, citation_ingest, citation_registry, explanation_jobs,
+                          knowledge_graph)
+import csv
+import io
 import json
-from datetime import datetime
-
-# Initialize our components
-citation_registry = CitationRegistry()
-knowledge_graph = KnowledgeGraph()
+import math
+import time
+from datetime import datetime, timezone
 
 @bp.route('/citations', methods=['POST'])
 def log_citation():
@@ -40,11 +40,14 @@ def log_citation():
     if 'timestamp' not in data:
         data['timestamp'] = datetime.utcnow().isoformat()
         
-    # Log the citation in our registry
-    citation_id = citation_registry.add_citation(data)
-    
-    # Update the knowledge graph
-    knowledge_graph.add_citation(data)
+    # Log the citation in our registry and the knowledge graph
+    try:
+        citation_id = citation_ingest.add_citation(data)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
     return jsonify({
         'status': 'success',
@@ -52,6 +55,73 @@ def log_citation():
         'message': 'Citation logged successfully'
     })
 
+# Upper bound on the number of events accepted in one bulk request
+MAX_BULK_CITATIONS = 10000
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+@bp.route('/citations/bulk', methods=['POST'])
+def log_citations_bulk():
+    """
+    API endpoint to log a batch of citation events in one request
+    
+    The body is either a JSON array of citation objects (as accepted by
+    POST /citations) or NDJSON, one citation object per line, sent with
+    Content-Type application/x-ndjson. Each event is validated on its own;
+    the response reports the outcome of every event by its position in the
+    batch (for NDJSON, its position among the non-blank lines).
+    """
+    citations = []
+    results = []
+    if request.mimetype in NDJSON_MIMETYPES:
+        lines = [line for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        for index, line in enumerate(lines):
+            try:
+                citations.append((index, json.loads(line)))
+            except ValueError as e:
+                results.append({'index': index, 'status': 'error', 'message': f'Invalid JSON: {e}'})
+        total = len(lines)
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'Request body must be a JSON array or NDJSON'
+            }), 400
+        citations = list(enumerate(data))
+        total = len(data)
+    
+    if total > MAX_BULK_CITATIONS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Batch exceeds {MAX_BULK_CITATIONS} citations'
+        }), 413
+    
+    # Stamp here so the registry and the graph see the same timestamp
+    timestamp = datetime.utcnow().isoformat()
+    for _, citation_data in citations:
+        if isinstance(citation_data, dict) and 'timestamp' not in citation_data:
+            citation_data['timestamp'] = timestamp
+    
+    # Validate and index the batch in the registry; the accepted events
+    # are added to the knowledge graph in one bulk update
+    accepted = []
+    registry_results = citation_ingest.add_citations_bulk([c for _, c in citations])
+    for (index, citation_data), result in zip(citations, registry_results):
+        result['index'] = index
+        results.append(result)
+        if result['status'] == 'success':
+            accepted.append(citation_data)
+    
+    results.sort(key=lambda r: r['index'])
+    rejected = total - len(accepted)
+    return jsonify({
+        'status': 'success' if not rejected else ('partial' if accepted else 'error'),
+        'accepted': len(accepted),
+        'rejected': rejected,
+        'results': results
+    }), 200 if accepted or not total else 400
+
 @bp.route('/citations', methods=['GET'])
 def get_citations():
     """Get citation logs based on filters"""
@@ -60,23 +130,139 @@ def get_citations():
     ai_model = request.args.get('ai_model')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    cursor = request.args.get('cursor')
     limit = request.args.get('limit', 50, type=int)
     
     # Get citations from the registry
-    citations = citation_registry.get_citations(
-        doi=doi,
-        ai_model=ai_model,
-        start_date=start_date,
-        end_date=end_date,
-        limit=limit
-    )
+    try:
+        citations, next_cursor = citation_registry.get_citations_page(
+            doi=doi,
+            ai_model=ai_model,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
     return jsonify({
         'status': 'success',
         'count': len(citations),
-        'citations': citations
+        'citations': citations,
+        'next_cursor': next_cursor
     })
 
+# Rows fetched from the registry per step of a streaming export
+EXPORT_PAGE_SIZE = 1000
+
+EXPORT_CSV_FIELDS = ['citation_id', 'timestamp', 'doi', 'source_title', 'source_type',
+                     'authors', 'ai_model', 'contribution_score', 'user_id', 'context']
+
+@bp.route('/citations/export', methods=['GET'])
+def export_citations():
+    """
+    Stream filtered citation logs as NDJSON or CSV
+    
+    Accepts the same filters as GET /citations plus format=ndjson|csv.
+    Rows are fetched from the registry a page at a time and written out as
+    they arrive, so memory use stays flat however large the export is.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({
+            'status': 'error',
+            'message': f'Unsupported export format: {export_format}'
+        }), 400
+    
+    filters = {
+        'doi': request.args.get('doi'),
+        'ai_model': request.args.get('ai_model'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date')
+    }
+    
+    # Fetch the first page up front so bad filters still get a 400
+    try:
+        first_page = citation_registry.get_citations_page(
+            cursor=request.args.get('cursor'), limit=EXPORT_PAGE_SIZE, **filters)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    def pages():
+        citations, next_cursor = first_page
+        yield citations
+        while next_cursor:
+            citations, next_cursor = citation_registry.get_citations_page(
+                cursor=next_cursor, limit=EXPORT_PAGE_SIZE, **filters)
+            yield citations
+    
+    def generate_ndjson():
+        for citations in pages():
+            yield ''.join(json.dumps(c) + '\n' for c in citations)
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for citations in pages():
+            writer.writerows(citations)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if export_format == 'csv':
+        return Response(stream_with_context(generate_csv()), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=citations.csv'})
+    return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+
+@bp.route('/stats', methods=['GET'])
+def stats():
+    """
+    Get summary statistics for the dashboard
+    
+    Supports conditional requests: polling clients that send back the
+    ETag or Last-Modified they received get a 304 until a citation is added.
+    Last-Modified has whole-second resolution, so it is rounded up from
+    the last change and only sent once that second is over; any later
+    change is then newer than every Last-Modified handed out.
+    """
+    etag, modified_at = citation_registry.get_stats_version()
+    last_modified = datetime.fromtimestamp(math.ceil(modified_at), tz=timezone.utc)
+    
+    # Answer revalidations before touching the statistics
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = (request.if_modified_since is not None and
+                        datetime.fromtimestamp(modified_at, tz=timezone.utc) <= request.if_modified_since)
+    
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        summary = citation_registry.get_summary_stats()
+        response = jsonify({
+            'status': 'success',
+            'total_citations': summary['total_citations'],
+            'unique_sources': summary['unique_sources'],
+            'unique_models': len(summary['ai_models']),
+            'unique_researchers': summary['total_authors'],
+            'ai_models': summary['ai_models'],
+            'source_types': summary['source_types']
+        })
+    
+    response.set_etag(etag)
+    if time.time() >= math.ceil(modified_at):
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
 @bp.route('/stats/top-cited', methods=['GET'])
 def top_cited():
     """Get top cited works"""
@@ -93,56 +279,309 @@ def top_cited():
         'top_cited': top_cited
     })
 
+@bp.route('/authors', methods=['GET'])
+def author_lookup():
+    """
+    Resolve an author name to its canonical author and list their works
+    
+    Query params:
+        name: Author name in any form, e.g. "Smith, J.", "J. Smith" or "Smith et al."
+    """
+    name = request.args.get('name', '').strip()
+    if not name:
+        return jsonify({
+            'status': 'error',
+            'message': 'name is required'
+        }), 400
+    
+    author = citation_registry.get_author(name)
+    connections = knowledge_graph.get_entity_connections(author['author'])
+    if 'error' in connections and not author['citations']:
+        return jsonify({
+            'status': 'error',
+            'message': f"Unknown author: {name}"
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'author': author['author'],
+        'citations': author['citations'],
+        'works': connections.get('outgoing', [])
+    })
+
+@bp.route('/analytics/breakdown', methods=['GET'])
+def analytics_breakdown():
+    """Get citation statistics per AI model or source type"""
+    by = request.args.get('by', 'ai_model')
+    
+    try:
+        breakdown = citation_registry.get_breakdown(by=by)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'status': 'success',
+        'by': by,
+        'breakdown': breakdown
+    })
+
+@bp.route('/analytics/timeseries', methods=['GET'])
+def analytics_timeseries():
+    """Get daily citation counts, optionally filtered"""
+    try:
+        series = citation_registry.get_time_series(
+            doi=request.args.get('doi'),
+            ai_model=request.args.get('ai_model'),
+            start_date=request.args.get('start_date'),
+            end_date=request.args.get('end_date')
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'status': 'success',
+        'series': series
+    })
+
+@bp.route('/analytics/aicif-scores', methods=['GET'])
+def analytics_aicif_scores():
+    """Get AIC-IF scores for all DOIs, highest first"""
+    limit = request.args.get('limit', 100, type=int)
+    
+    return jsonify({
+        'status': 'success',
+        'scores': citation_registry.get_aicif_scores(limit=limit)
+    })
+
+# Largest graph view returned in one response
+MAX_GRAPH_NODES = 2000
+
+@bp.route('/graph/overview', methods=['GET'])
+def graph_overview():
+    """Low-zoom graph view with one super-node per entity type"""
+    return jsonify({
+        'status': 'success',
+        'graph': knowledge_graph.get_overview()
+    })
+
+@bp.route('/graph/ego', methods=['GET'])
+def graph_ego():
+    """Neighbourhood of one node, up to depth hops and max_nodes nodes"""
+    node_id = request.args.get('node')
+    if not node_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing required parameter: node'
+        }), 400
+    
+    graph = knowledge_graph.get_ego_network(
+        node_id,
+        depth=min(request.args.get('depth', 1, type=int), 5),
+        max_nodes=min(request.args.get('max_nodes', 500, type=int), MAX_GRAPH_NODES)
+    )
+    if 'error' in graph:
+        return jsonify({
+            'status': 'error',
+            'message': graph['error']
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'graph': graph
+    })
+
+@bp.route('/graph/top', methods=['GET'])
+def graph_top():
+    """Top-N nodes by degree, AIC-IF score or network influence, with the edges among them"""
+    n = min(request.args.get('n', 100, type=int), MAX_GRAPH_NODES)
+    by = request.args.get('by', 'degree')
+    if by not in ('degree', 'aicif', 'pagerank', 'influence'):
+        return jsonify({
+            'status': 'error',
+            'message': f'Unsupported ranking: {by}'
+        }), 400
+    
+    scores = None
+    if by == 'aicif':
+        scores = {s['doi']: s['aicif_score'] for s in citation_registry.get_aicif_scores()}
+    elif by in ('pagerank', 'influence'):
+        scores = centrality_index.get_scores(by)
+    
+    return jsonify({
+        'status': 'success',
+        'graph': knowledge_graph.get_top_nodes(n=n, scores=scores, node_type=request.args.get('type'))
+    })
+
+@bp.route('/graph/nodes', methods=['GET'])
+def graph_nodes():
+    """Paginated node listing"""
+    page = knowledge_graph.get_nodes_page(
+        offset=max(request.args.get('offset', 0, type=int), 0),
+        limit=min(request.args.get('limit', 100, type=int), MAX_GRAPH_NODES),
+        node_type=request.args.get('type')
+    )
+    return jsonify({'status': 'success', **page})
+
+@bp.route('/graph/edges', methods=['GET'])
+def graph_edges():
+    """Paginated edge listing"""
+    page = knowledge_graph.get_edges_page(
+        offset=max(request.args.get('offset', 0, type=int), 0),
+        limit=min(request.args.get('limit', 100, type=int), MAX_GRAPH_NODES)
+    )
+    return jsonify({'status': 'success', **page})
+
+@bp.route('/graph/influence', methods=['GET'])
+def graph_influence():
+    """
+    Rank graph nodes by network influence
+    
+    Query parameters: metric (pagerank, influence or weighted_degree),
+    type (e.g. paper), limit, and seed (repeatable node ID, since IDs such
+    as author names may contain commas) for personalized PageRank around
+    those nodes. Scores come from a cache
+    recomputed in the background; 'stale' tells whether the graph has
+    changed since they were computed.
+    """
+    seeds = [seed for seed in request.args.getlist('seed') if seed]
+    try:
+        result = centrality_index.get_ranking(
+            metric=request.args.get('metric', 'pagerank'),
+            node_type=request.args.get('type'),
+            limit=min(request.args.get('limit', 20, type=int), MAX_GRAPH_NODES),
+            seeds=seeds or None
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    return jsonify({'status': 'success', **result})
+
+@bp.route('/graph/edge', methods=['GET'])
+def graph_edge():
+    """Aggregated citation statistics of one edge, with a per-day histogram"""
+    source = request.args.get('source')
+    target = request.args.get('target')
+    if not source or not target:
+        return jsonify({
+            'status': 'error',
+            'message': 'Both source and target are required'
+        }), 400
+    
+    edge = knowledge_graph.get_edge_stats(source, target)
+    if 'error' in edge:
+        return jsonify({
+            'status': 'error',
+            'message': edge['error']
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'edge': edge
+    })
+
+@bp.route('/graph/path', methods=['GET'])
+def graph_path():
+    """
+    Find citation paths between two entities in the knowledge graph
+    
+    Query parameters: source, target, max_depth, max_paths,
+    relationships (comma-separated, e.g. CITES,USES) and time_budget
+    (seconds). Paths are returned shortest first.
+    """
+    source = request.args.get('source')
+    target = request.args.get('target')
+    if not source or not target:
+        return jsonify({
+            'status': 'error',
+            'message': 'Both source and target are required'
+        }), 400
+    
+    relationships = request.args.get('relationships')
+    result = knowledge_graph.find_paths(
+        source, target,
+        max_depth=min(request.args.get('max_depth', 3, type=int), 10),
+        max_paths=min(request.args.get('max_paths', 10, type=int), 100),
+        relationships=[r.strip().upper() for r in relationships.split(',')] if relationships else None,
+        time_budget=min(request.args.get('time_budget', 1.0, type=float), 5.0)
+    )
+    
+    return jsonify({
+        'status': 'success',
+        'count': len(result['paths']),
+        'truncated': result['truncated'],
+        'paths': result['paths']
+    })
+
 @bp.route('/contributions/analyze', methods=['POST'])
 def analyze_contributions():
     """
-    Analyze feature contributions using SHAP and LIME
+    Start a SHAP or LIME analysis of feature contributions
+    
+    The analysis runs as a background job; poll the returned job URL for
+    progress and results. Unless "credit" is false, the explained rows are
+    credited to their features' sources once the job is done, and logged
+    as one aggregated citation per source and time window.
     
     Request body example:
     {
-        "model_id": "climate_model_1",
-        "input_data": [...],
-        "method": "shap"  # or "lime"
+        "model_id": "temperature_prediction",
+        "dataset_id": "climate_data",  # defaults to the model's first compatible dataset
+        "input_data": [...],  # rows as lists or {feature name: value}; defaults to a dataset sample
+        "method": "shap",  # "permutation" for fast approximate SHAP, or "lime"
+        "credit": true
     }
     """
     data = request.get_json()
+    method = data.get('method', 'shap')
+    model_id = data.get('model_id')
     
-    # This would be a more complex integration with model interpretability tools
-    # For the PoC, we'll simulate this with sample data
-    
-    if data.get('method', 'shap').lower() == 'shap':
-        # Simulated SHAP values
-        contributions = [
-            {"feature": "Temperature Data (Smith et al., 2023)", "doi": "10.1038/s12345", "value": 0.45},
-            {"feature": "CO2 Measurements (Johnson, 2022)", "doi": "10.1126/s98765", "value": 0.28},
-            {"feature": "Ocean Current Dataset (NOAA, 2023)", "doi": "10.1016/j12345", "value": 0.15},
-            {"feature": "Rainfall Patterns (Lee & Wong, 2021)", "doi": "10.1038/s55555", "value": 0.12}
-        ]
-    else:
-        # Simulated LIME explanations
-        contributions = [
-            {"feature": "Temperature Data (Smith et al., 2023)", "doi": "10.1038/s12345", "value": 0.42},
-            {"feature": "CO2 Measurements (Johnson, 2022)", "doi": "10.1126/s98765", "value": 0.31},
-            {"feature": "Ocean Current Dataset (NOAA, 2023)", "doi": "10.1016/j12345", "value": 0.17},
-            {"feature": "Rainfall Patterns (Lee & Wong, 2021)", "doi": "10.1038/s55555", "value": 0.10}
-        ]
-        
-    # Log the contributions as citations
-    for contrib in contributions:
-        citation_data = {
-            "doi": contrib["doi"],
-            "source_title": contrib["feature"],
-            "ai_model": data.get("model_id", "unknown_model"),
-            "contribution_score": contrib["value"],
-            "user_id": data.get("user_id", "system"),
-            "context": f"Feature contribution via {data.get('method', 'shap').upper()} analysis",
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        citation_registry.add_citation(citation_data)
-        knowledge_graph.add_citation(citation_data)
+    try:
+        job = explanation_jobs.submit(
+            dataset_id=data.get('dataset_id'),
+            model_id=model_id,
+            method=method,
+            input_data=data.get('input_data'),
+            credit=bool(data.get('credit', True))
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f"Unknown model {model_id} or dataset {data.get('dataset_id')}, or they are not compatible"
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'job': job,
+        'job_url': url_for('api.contribution_job', job_id=job['id']),
+        'explanation_method': method.upper()
+    }), 202
+
+@bp.route('/contributions/jobs/<job_id>', methods=['GET'])
+def contribution_job(job_id):
+    """Progress of a contribution analysis job, and its contributions once done"""
+    job = explanation_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Unknown or expired job'
+        }), 404
     
     return jsonify({
         'status': 'success',
-        'contributions': contributions,
-        'explanation_method': data.get('method', 'shap').upper()
+        'job': job
     })
@@ -1,18 +1,11 @@
 from flask import render_template, request, jsonify, redirect, url_for
 from app.demo import bp
-from app.models.citation_registry import CitationRegistry
-from app.models.knowledge_graph import KnowledgeGraph
-from app.models.model_interpreter import ModelInterpreter
+from app.services import citation_ingest, explanation_jobs
 import json
 import numpy as np
 import pandas as pd
 from datetime import datetime
 
-# Initialize components
-citation_registry = CitationRegistry()
-knowledge_graph = KnowledgeGraph()
-model_interpreter = ModelInterpreter()
-
 @bp.route('/citation-tracker')
 def citation_tracker():
     """Redirect to real-time citations demo"""
@@ -25,43 +18,42 @@ def model_interpretation():
 
 @bp.route('/feature-contributions', methods=['POST'])
 def feature_contributions():
-    """Analyze and visualize feature contributions using SHAP or LIME"""
+    """Start a SHAP or LIME analysis of feature contributions as a background job"""
     data = request.get_json()
     
     dataset_id = data.get('dataset_id', 'climate_data')
     model_id = data.get('model_id', 'regression_model')
     method = data.get('method', 'shap')
     
-    # Generate feature contributions using the specified method
-    contributions = model_interpreter.analyze_contributions(
-        dataset_id=dataset_id,
-        model_id=model_id,
-        method=method
-    )
+    # The explained rows are credited to their sources once the job is done
+    try:
+        job = explanation_jobs.submit(
+            dataset_id=dataset_id,
+            model_id=model_id,
+            method=method,
+            credit=True
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
-    # Log each feature contribution as a citation
-    for contrib in contributions:
-        citation_data = {
-            "doi": contrib["doi"],
-            "source_title": contrib["feature"],
-            "source_type": "dataset",
-            "ai_model": model_id,
-            "contribution_score": float(contrib["value"]),
-            "user_id": data.get("user_id", "demo_user"),
-            "context": f"Feature contribution via {method.upper()} analysis",
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        citation_registry.add_citation(citation_data)
-        knowledge_graph.add_citation(citation_data)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Model {model_id} cannot be applied to dataset {dataset_id}'
+        }), 404
     
     return jsonify({
         'status': 'success',
-        'contributions': contributions,
+        'job': job,
+        'job_url': url_for('api.contribution_job', job_id=job['id']),
         'visualization_url': url_for('demo.contribution_visualization', 
                                    dataset_id=dataset_id, 
                                    model_id=model_id,
                                    method=method)
-    })
+    }), 202
 
 @bp.route('/visualization/<dataset_id>/<model_id>/<method>')
 def contribution_visualization(dataset_id, model_id, method):
@@ -102,10 +94,10 @@ def simulate_citations():
     ]
     
     # Generate random citations
-    citations = []
+    batch = []
     for i in range(count):
         pub = publications[i % len(publications)]
-        citation_data = {
+        batch.append({
             "doi": pub["doi"],
             "source_title": pub["title"],
             "source_type": "journal_article",
@@ -115,19 +107,25 @@ def simulate_citations():
             "user_id": f"demo_user_{i % 5 + 1}",
             "context": contexts[i % len(contexts)],
             "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        # Log the citation
-        citation_id = citation_registry.add_citation(citation_data)
-        knowledge_graph.add_citation(citation_data)
-        
-        citations.append({
-            "citation_id": citation_id,
-            **citation_data
         })
     
-    return jsonify({
-        "status": "success",
+    # Log the batch in one registry append and one graph update
+    results = citation_ingest.add_citations_bulk(batch)
+    
+    # Only accepted citations have an ID; report the others with the reason
+    citations = []
+    errors = []
+    for citation_data, result in zip(batch, results):
+        if result["status"] == "success":
+            citations.append({"citation_id": result["citation_id"], **citation_data})
+        else:
+            errors.append({"index": result["index"], "message": result["message"]})
+    
+    response = {
+        "status": "success" if not errors else ("partial" if citations else "error"),
         "count": len(citations),
         "citations": citations
-    })
+    }
+    if errors:
+        response["rejected"] = errors
+    return jsonify(response), 200 if citations or not batch else 400
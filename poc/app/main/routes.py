@@ -1,11 +1,6 @@
 from flask import render_template, current_app, request, jsonify, redirect, url_for
 from app.main import bp
-from app.models.citation_registry import CitationRegistry
-from app.models.knowledge_graph import KnowledgeGraph
-
-# Initialize our core components
-citation_registry = CitationRegistry()
-knowledge_graph = KnowledgeGraph()
+from app.services import citation_registry, knowledge_graph
 
 @bp.route('/')
 def index():
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class AttributionSummary:
+    """
+    Global feature importance of one model on one dataset
+
+    Condenses a rows x features attribution matrix into per-feature
+    statistics: mean |attribution| (the global importance credited to the
+    feature's source), mean signed attribution, and a fixed-size histogram
+    of each feature's attributions for distribution plots.
+
+    Attributes:
+        mean_abs (np.ndarray): Mean |attribution| per feature
+        mean (np.ndarray): Mean attribution per feature
+        hist_counts (np.ndarray): features x bins row counts
+        hist_edges (np.ndarray): features x (bins + 1) bin edges
+        rows (int): Rows the summary was computed from
+        base_value (float): Expected model output
+        computed_at (float): Epoch seconds
+        interval (np.ndarray): For approximate methods, 95% confidence
+            half-width of each feature's mean |attribution|, else None
+        details (dict): For approximate methods, how the estimate was made
+    """
+
+    # Histogram bins per feature
+    BINS = 16
+
+    __slots__ = ('mean_abs', 'mean', 'hist_counts', 'hist_edges', 'rows', 'base_value', 'computed_at',
+                 'interval', 'details')
+
+    def __init__(self, mean_abs, mean, hist_counts, hist_edges, rows, base_value, computed_at=None,
+                 interval=None, details=None):
+        self.mean_abs = mean_abs
+        self.mean = mean
+        self.hist_counts = hist_counts
+        self.hist_edges = hist_edges
+        self.rows = rows
+        self.base_value = base_value
+        self.computed_at = computed_at or time.time()
+        self.interval = interval
+        self.details = details
+
+    @classmethod
+    def from_explanation(cls, explanation, bins=BINS):
+        """
+        Summarize an Explanation
+
+        Args:
+            explanation (Explanation): Per-row attributions
+            bins (int): Histogram bins per feature
+
+        Returns:
+            AttributionSummary: The summary
+        """
+        values = explanation.values
+        n_features = values.shape[1]
+        counts = np.zeros((n_features, bins), dtype=np.int32)
+        edges = np.zeros((n_features, bins + 1))
+        for feature in range(n_features):
+            column = values[:, feature]
+            value_range = (column.min(), column.max()) if len(column) else (0.0, 0.0)
+            counts[feature], edges[feature] = np.histogram(column, bins=bins, range=value_range)
+        return cls(explanation.mean_abs(), values.mean(axis=0) if len(values) else np.zeros(n_features),
+                   counts, edges, len(values), explanation.base_value,
+                   interval=explanation.interval, details=explanation.details)
+
+    def histograms(self):
+        """Per-feature histograms as lists, for JSON responses"""
+        return [
+            {'edges': [round(edge, 6) for edge in edges.tolist()], 'counts': counts.tolist()}
+            for counts, edges in zip(self.hist_counts, self.hist_edges)
+        ]
+
+
+class AttributionStore:
+    """
+    Store of precomputed attribution summaries
+
+    Summaries are keyed by (model ID, model version, dataset ID, dataset
+    version, method), so refitting a model or changing a dataset makes the
+    old entries unreachable instead of serving stale attributions. This
+    base class keeps them in memory only.
+    """
+
+    def __init__(self):
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a stored summary
+
+        Args:
+            key (tuple): (model_id, model_version, dataset_id, dataset_version, method)
+
+        Returns:
+            AttributionSummary: The summary, or None
+        """
+        with self._lock:
+            return self._summaries.get(key)
+
+    def put(self, key, summary):
+        """Store a summary, replacing any older one under the same key"""
+        with self._lock:
+            self._summaries[key] = summary
+
+    def keys(self):
+        """Keys of all stored summaries"""
+        with self._lock:
+            return list(self._summaries)
+
+
+class DiskAttributionStore(AttributionStore):
+    """
+    Attribution summaries persisted as one .npz file each
+
+    Files are named by a hash of the key, hold the arrays plus the key and
+    scalar fields as a JSON string, and are written to a temporary file and
+    renamed into place. All summaries are loaded when the store is opened
+    (they are a few kilobytes each), and a key missing from memory is looked
+    up on disk, so summaries written by other processes are picked up.
+    """
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.npz'):
+                loaded = self._load(os.path.join(directory, name))
+                if loaded is not None:
+                    self._summaries[loaded[0]] = loaded[1]
+
+    @staticmethod
+    def _load(path):
+        try:
+            with np.load(path) as arrays:
+                meta = json.loads(str(arrays['meta']))
+                summary = AttributionSummary(arrays['mean_abs'], arrays['mean'], arrays['hist_counts'],
+                                             arrays['hist_edges'], meta['rows'], meta['base_value'],
+                                             meta['computed_at'],
+                                             arrays['interval'] if 'interval' in arrays else None,
+                                             meta.get('details'))
+        except (OSError, ValueError, KeyError):
+            return None
+        return tuple(meta['key']), summary
+
+    def get(self, key):
+        summary = super().get(key)
+        if summary is None and os.path.exists(self._path(key)):
+            loaded = self._load(self._path(key))
+            if loaded is not None and loaded[0] == tuple(key):
+                summary = loaded[1]
+                super().put(key, summary)
+        return summary
+
+    def _path(self, key):
+        digest = hashlib.sha1(json.dumps(list(key)).encode()).hexdigest()[:20]
+        return os.path.join(self.directory, f'{digest}.npz')
+
+    def put(self, key, summary):
+        meta = {
+            'key': list(key),
+            'rows': summary.rows,
+            'base_value': summary.base_value,
+            'computed_at': summary.computed_at,
+            'details': summary.details
+        }
+        arrays = {'interval': summary.interval} if summary.interval is not None else {}
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), mean_abs=summary.mean_abs, mean=summary.mean,
+                     hist_counts=summary.hist_counts, hist_edges=summary.hist_edges, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        super().put(key, summary)
+
+
+def open_attribution_store(data_dir=None):
+    """
+    Build the attribution store for a data directory
+
+    Args:
+        data_dir (str, optional): Directory for persistent data; the
+            in-memory store is used when not set
+
+    Returns:
+        AttributionStore: The store
+    """
+    if not data_dir:
+        return AttributionStore()
+    return DiskAttributionStore(os.path.join(data_dir, 'attributions'))
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import load_config
+    from app.models.explanation_engine import ExplanationEngine
+    from app.services import build_interpreter
+
+    parser = argparse.ArgumentParser(
+        description='Precompute the attribution summaries of every compatible model and dataset.')
+    parser.add_argument('--method', action='append', choices=ExplanationEngine.METHODS,
+                        help='explanation method, repeatable (default: shap and lime)')
+    args = parser.parse_args()
+
+    config = load_config()
+    interpreter = build_interpreter(config['AICIF_DATA_DIR'], config['AICIF_MODEL_DIR'],
+                                    config['AICIF_MODEL_MEMORY_MB'])
+    for dataset_id, model_id, method, seconds in interpreter.precompute(args.method or ('shap', 'lime')):
+        print(f'{model_id} on {dataset_id} ({method.upper()}): {seconds}s')
@@ -0,0 +1,288 @@
+import re
+import threading
+import unicodedata
+
+# Separators that always end an author in a citation's "authors" field
+_AUTHOR_SEPARATORS = re.compile(r'\s*[&;]\s*')
+
+# "and", which also occurs inside organization names
+_AND = re.compile(r'(\s+and\s+)', re.IGNORECASE)
+
+# Trailing markers for omitted co-authors
+_ET_AL = re.compile(r'[\s,]*\b(?:et\.?\s*al\.?|and\s+others)\s*$', re.IGNORECASE)
+
+# Words marking an organization rather than a person
+_ORGANIZATION_WORDS = {
+    'agency', 'association', 'center', 'centre', 'consortium', 'council', 'department',
+    'foundation', 'group', 'institute', 'laboratory', 'lab', 'ministry', 'office',
+    'organization', 'organisation', 'program', 'programme', 'service', 'society',
+    'survey', 'team', 'university'
+}
+
+# Lowercase words that may start or sit inside a surname, e.g. "van der Berg"
+_NAME_PARTICLES = {'al', 'bin', 'da', 'de', 'del', 'della', 'den', 'der', 'di', 'dos', 'du', 'la', 'le',
+                   'ter', 'van', 'von'}
+
+
+def _is_initials(token):
+    """Whether a token only holds initials, such as J., JA or J.-P."""
+    letters = token.replace('.', '').replace('-', '')
+    return letters.isalpha() and letters.isupper() and (len(letters) <= 3 or '.' in token)
+
+
+def _is_organization(tokens):
+    return any(_fold(token) in _ORGANIZATION_WORDS for token in tokens)
+
+
+def _is_name(text):
+    """Whether text is shaped like a person's name (or an acronym) rather than part of a longer title"""
+    tokens = text.replace(',', ' ').split()
+    return (0 < len(tokens) <= 5 and not _is_organization(tokens) and
+            all(token[0].isupper() or token.lower() in _NAME_PARTICLES for token in tokens))
+
+
+def _is_surname(tokens):
+    return (not _is_initials(tokens[-1]) and tokens[-1][0].isupper() and
+            all(token.lower() in _NAME_PARTICLES for token in tokens[:-1]))
+
+
+def _split_and(text):
+    """Split on "and" where both neighbours are name-shaped, keeping "Food and Agriculture Organization" whole"""
+    parts = _AND.split(text)
+    names = [parts[0]]
+    for separator, part in zip(parts[1::2], parts[2::2]):
+        # Only the names next to the "and" matter in "Smith J, Doe A and Lee K"
+        if _is_name(names[-1].rstrip(' ,').rsplit(',', 1)[-1]) and _is_name(part.split(',', 1)[0]):
+            names.append(part)
+        else:
+            names[-1] += separator + part
+    return names
+
+
+def _split_commas(text):
+    """
+    Split a comma-separated list of names
+
+    A surname followed by initials is one surname-first name ("Smith, J.,
+    Doe, A."); so is a pair of single names making up the whole list
+    ("Smith, John"). Other commas separate names ("Smith J, Doe A").
+    """
+    segments = [segment.strip() for segment in text.split(',') if segment.strip()]
+    names, paired = [], False
+    for segment in segments:
+        tokens = segment.split()
+        previous = names[-1].split() if names else None
+        given = all(_is_initials(token) for token in tokens) or (
+            len(segments) == 2 and len(tokens) <= 3 and
+            all(_is_initials(token) or token.istitle() for token in tokens))
+        if previous and not paired and given and _is_surname(previous):
+            names[-1] = f'{names[-1]}, {segment}'
+            paired = True
+        else:
+            names.append(segment)
+            paired = False
+    return names
+
+
+def split_authors(authors):
+    """
+    Split an "authors" field into individual names
+
+    Accepts "&" and ";" as separators, "and" between two name-shaped
+    neighbours (so "Food and Agriculture Organization" stays whole) and
+    commas between names; "Smith, J." stays a single surname-first name.
+    A trailing "et al." is dropped from each name.
+
+    Args:
+        authors (str): Raw authors field, e.g. "Johnson & Williams" or
+            "Smith J, Doe A"
+
+    Returns:
+        list: Non-empty names, stripped
+    """
+    names = []
+    for part in _AUTHOR_SEPARATORS.split(authors or ''):
+        for text in _split_and(_ET_AL.sub('', part)):
+            for name in _split_commas(text):
+                name = _ET_AL.sub('', name).strip(' ,')
+                if name:
+                    names.append(name)
+    return names
+
+
+def _fold(text):
+    """Lowercase ASCII letters only, e.g. 'García-López' -> 'garcialopez'"""
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z]', '', ascii_text.lower())
+
+
+def parse_author(name):
+    """
+    Split one author name into a blocking key and initials
+
+    Understands "Smith, J.", "Smith JA", "J. Smith", "John A. Smith" and
+    bare surnames such as "Smith" (from "Smith et al."). Organizations ("NOAA", "Marine
+    Biology Institute") are kept whole.
+
+    Args:
+        name (str): One name, e.g. as returned by split_authors
+
+    Returns:
+        tuple: (key, surname as written, initials tuple, is_organization)
+    """
+    name = _ET_AL.sub('', name).strip(' ,')
+    tokens = name.replace(',', ' ').split()
+    if (len(tokens) == 1 and name.isupper() and len(name) > 1) or \
+            any(_fold(token) in _ORGANIZATION_WORDS for token in tokens):
+        return 'org:' + ' '.join(_fold(token) for token in tokens), name, (), True
+
+    if ',' in name:
+        surname, given = (part.strip() for part in name.split(',', 1))
+    elif len(tokens) > 1 and _is_initials(tokens[-1]) and not _is_initials(tokens[0]):
+        # Initials after the surname, e.g. "Smith JA"
+        start = next(i for i in range(len(tokens), 0, -1) if not _is_initials(tokens[i - 1]))
+        surname, given = ' '.join(tokens[:start]), ' '.join(tokens[start:])
+    elif len(tokens) > 1:
+        surname, given = tokens[-1], ' '.join(tokens[:-1])
+    else:
+        surname, given = name, ''
+
+    initials = tuple(letter for part in re.split(r'[\s.\-]+', given) if part and part[0].isalpha()
+                     for letter in (part if _is_initials(part) else part[0].upper()))
+    return _fold(surname) or surname.lower(), surname, initials, False
+
+
+def _compatible(a, b):
+    """Initials agree where both are known, e.g. ('J',) and ('J', 'A')"""
+    return a[:len(b)] == b[:len(a)]
+
+
+class AuthorIndex:
+    """
+    Entity resolution for author names
+
+    Maps every raw author name to a canonical author ID, so that
+    "Smith, J.", "J. Smith" and "John Smith" become one author "Smith, J.".
+    Candidates are blocked by normalized surname; within a block a name
+    matches an author whose initials are compatible with its own, and a
+    bare surname ("Smith et al.") matches the block's author when there is
+    exactly one. Resolutions are cached per raw name, so a name resolves
+    the same way for the life of the index even as new authors arrive.
+
+    The registry and the knowledge graph share one index, which makes
+    author counts and author nodes agree. Resolution depends on the order
+    names are first seen; the index state is persisted with the graph
+    snapshot so restarts resolve exactly as before.
+    """
+
+    def __init__(self):
+        # Normalized surname -> [(initials, canonical ID)] of known authors
+        self._blocks = {}
+        # Raw name -> canonical ID
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(block) for block in self._blocks.values())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        """
+        Get the canonical author ID of one name, registering it if new
+
+        Args:
+            name (str): One author name
+
+        Returns:
+            str: Canonical author ID
+        """
+        canonical = self._cache.get(name)
+        if canonical is not None:
+            return canonical
+
+        with self._lock:
+            canonical = self._cache.get(name)
+            if canonical is None:
+                canonical = self._cache[name] = self._match(name)
+        return canonical
+
+    def lookup(self, name):
+        """
+        Get the canonical author ID a name would resolve to, without registering it
+
+        Args:
+            name (str): One author name
+
+        Returns:
+            str: Canonical author ID, or the name's own canonical form when
+                it matches no known author
+        """
+        canonical = self._cache.get(name)
+        if canonical is None:
+            with self._lock:
+                canonical = self._match(name, register=False)
+        return canonical
+
+    def resolve_all(self, authors):
+        """
+        Canonical IDs of all authors in an "authors" field, without duplicates
+
+        Args:
+            authors (str): Raw authors field
+
+        Returns:
+            list: Canonical author IDs in the order they appear
+        """
+        return list(dict.fromkeys(self.resolve(name) for name in split_authors(authors)))
+
+    def _match(self, name, register=True):
+        key, surname, initials, is_organization = parse_author(name)
+        block = self._blocks.get(key, [])
+        if is_organization:
+            return block[0][1] if block else self._register(key, (), name, register)
+
+        if initials:
+            matches = [entry for entry in block if entry[0] and _compatible(entry[0], initials)]
+            exact = [entry for entry in matches if entry[0] == initials]
+            if exact or len(matches) == 1:
+                return (exact or matches)[0][1]
+            canonical = f"{surname}, {' '.join(initial + '.' for initial in initials)}"
+        else:
+            named = [entry for entry in block if entry[0]]
+            if len(named) == 1:
+                return named[0][1]
+            bare = [entry for entry in block if not entry[0]]
+            if bare:
+                return bare[0][1]
+            canonical = surname
+
+        return self._register(key, initials, canonical, register)
+
+    def _register(self, key, initials, canonical, register):
+        if register:
+            self._blocks.setdefault(key, []).append((initials, canonical))
+        return canonical
+
+    def to_dict(self):
+        """JSON-serializable state, for graph snapshots"""
+        with self._lock:
+            return {
+                'blocks': {key: [[''.join(initials), canonical] for initials, canonical in block]
+                           for key, block in self._blocks.items()},
+                'cache': dict(self._cache)
+            }
+
+    def load_dict(self, state):
+        """Replace the index state with one produced by to_dict"""
+        with self._lock:
+            self._blocks = {key: [(tuple(initials), canonical) for initials, canonical in block]
+                            for key, block in state['blocks'].items()}
+            self._cache = dict(state['cache'])
@@ -0,0 +1,368 @@
+import base64
+import binascii
+import heapq
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+
+def parse_timestamp(timestamp):
+    """
+    Convert an ISO-8601 timestamp into epoch seconds
+
+    Naive timestamps are treated as UTC, which is what the registry writes
+    when it stamps events itself (``datetime.utcnow().isoformat()``).
+
+    Args:
+        timestamp (str): ISO-8601 timestamp, optionally ending in 'Z'
+
+    Returns:
+        float: Seconds since the Unix epoch
+
+    Raises:
+        ValueError: If the timestamp cannot be parsed
+    """
+    if not isinstance(timestamp, str):
+        raise ValueError(f'Invalid timestamp: {timestamp!r}')
+
+    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def encode_cursor(epoch, position):
+    """Encode a (timestamp, log position) keyset as an opaque cursor string"""
+    raw = f'{epoch!r}:{position}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        epoch, position = raw.split(':')
+        return float(epoch), int(position)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+
+
+class TimeIndex:
+    """
+    Time-sorted index of citation positions
+
+    Keeps parallel arrays of epoch timestamps and positions into the
+    registry's event list, ordered by (timestamp, position). Events usually
+    arrive in time order, so inserts are appends. Late events are buffered
+    and merged into the arrays in one pass when the index is next read,
+    instead of shifting the arrays once per event. Range queries are two
+    bisections.
+    """
+
+    __slots__ = ('_epochs', '_positions', '_late')
+
+    def __init__(self):
+        self._epochs = array('d')
+        self._positions = array('q')
+        # (epoch, position) of late events not merged yet
+        self._late = []
+
+    def __len__(self):
+        return len(self._positions) + len(self._late)
+
+    @property
+    def epochs(self):
+        if self._late:
+            self._merge()
+        return self._epochs
+
+    @property
+    def positions(self):
+        if self._late:
+            self._merge()
+        return self._positions
+
+    def add(self, epoch, position):
+        """Add a position, appending it when it is in time order and buffering it otherwise"""
+        if not self._epochs or epoch >= self._epochs[-1]:
+            self._epochs.append(epoch)
+            self._positions.append(position)
+        else:
+            self._late.append((epoch, position))
+
+    def _merge(self):
+        """Merge the buffered late events in, copying each run of the arrays once"""
+        late, self._late = sorted(self._late), []
+        epochs, positions = array('d'), array('q')
+        copied = 0
+        for epoch, position in late:
+            # Positions grow with insertion order within equal timestamps
+            lo = bisect_left(self._epochs, epoch, copied)
+            i = bisect_left(self._positions, position, lo, bisect_right(self._epochs, epoch, lo))
+            epochs.extend(self._epochs[copied:i])
+            positions.extend(self._positions[copied:i])
+            epochs.append(epoch)
+            positions.append(position)
+            copied = i
+        epochs.extend(self._epochs[copied:])
+        positions.extend(self._positions[copied:])
+        self._epochs, self._positions = epochs, positions
+
+    def bounds(self, start=None, end=None):
+        """
+        Locate the slice of the index inside a time window
+
+        Args:
+            start (float, optional): Inclusive lower bound in epoch seconds
+            end (float, optional): Inclusive upper bound in epoch seconds
+
+        Returns:
+            tuple: (lo, hi) slice bounds into the index
+        """
+        lo = 0 if start is None else bisect_left(self.epochs, start)
+        hi = len(self.epochs) if end is None else bisect_right(self.epochs, end)
+        return lo, max(lo, hi)
+
+    def before(self, epoch, position):
+        """
+        Find where entries ordered strictly before (epoch, position) end
+
+        Used for keyset pagination: a page that ended at (epoch, position)
+        resumes at the returned bound, walking towards older entries.
+        """
+        lo = bisect_left(self.epochs, epoch)
+        hi = bisect_right(self.epochs, epoch, lo)
+        # Positions grow with insertion order within equal timestamps
+        return bisect_left(self.positions, position, lo, hi)
+
+
+class CitationAggregate:
+    """
+    Running per-DOI aggregates for the AIC-IF score
+
+    Updated once per citation event so that scoring a DOI never touches
+    its citation history. Recency is an exponentially decayed sum of
+    citation weights, stored relative to the newest citation seen
+    (``recency_ref``) so the accumulator can be rescaled in O(1) both
+    when new events arrive and when the score is read.
+    """
+
+    __slots__ = ('count', 'contribution_sum', 'models', 'recency_sum', 'recency_ref')
+
+    # Days for a citation's recency weight to fall to one half
+    RECENCY_HALF_LIFE_DAYS = 2.0
+    DECAY_RATE = math.log(2) / (RECENCY_HALF_LIFE_DAYS * 86400)
+
+    def __init__(self):
+        self.count = 0
+        self.contribution_sum = 0.0
+        self.models = set()
+        self.recency_sum = 0.0
+        self.recency_ref = None
+
+    def add(self, epoch, contribution, ai_model):
+        """Fold one citation event into the aggregates"""
+        self.count += 1
+        self.contribution_sum += contribution
+        self.models.add(ai_model)
+
+        if self.recency_ref is None:
+            self.recency_sum = 1.0
+            self.recency_ref = epoch
+        elif epoch > self.recency_ref:
+            self.recency_sum = self.recency_sum * math.exp(
+                -self.DECAY_RATE * (epoch - self.recency_ref)) + 1.0
+            self.recency_ref = epoch
+        else:
+            self.recency_sum += math.exp(-self.DECAY_RATE * (self.recency_ref - epoch))
+
+    def recency(self, now):
+        """Average decayed recency weight of all citations at time ``now``"""
+        if not self.count:
+            return 0.0
+        elapsed = max(0.0, now - self.recency_ref)
+        return self.recency_sum * math.exp(-self.DECAY_RATE * elapsed) / self.count
+
+    def score(self, now):
+        """
+        Compute the AIC-IF score from the running aggregates
+
+        Args:
+            now (float): Current time in epoch seconds
+
+        Returns:
+            float: The AIC-IF score
+        """
+        if not self.count:
+            return 0.0
+
+        avg_contribution = self.contribution_sum / self.count
+        model_diversity = min(1.0, len(self.models) / 5)  # Normalize to max of 1.0
+
+        aicif_score = (self.count * 0.4 +
+                       avg_contribution * 0.3 +
+                       self.recency(now) * 0.2 +
+                       model_diversity * 0.1) * 10  # Scale to a 0-10 range
+
+        return round(aicif_score, 2)
+
+
+class EdgeAggregate:
+    """
+    Running statistics of the citations behind one graph edge
+
+    The knowledge graph keeps a single edge per (AI model, source) pair;
+    every citation event updates these counters in O(1) instead of adding
+    or overwriting an edge, so edge weights reflect citation volume.
+    """
+
+    __slots__ = ('count', 'first', 'last', 'contribution_sum', 'days')
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.contribution_sum = 0.0
+        # UTC day number (days since the epoch) -> citations on that day
+        self.days = {}
+
+    def add(self, epoch, contribution):
+        """
+        Fold one citation event into the statistics
+
+        Args:
+            epoch (float): Citation time in epoch seconds, or None if unknown
+            contribution (float): Contribution score of the citation
+        """
+        self.count += 1
+        self.contribution_sum += contribution
+        if epoch is None:
+            return
+        if self.first is None or epoch < self.first:
+            self.first = epoch
+        if self.last is None or epoch > self.last:
+            self.last = epoch
+        day = int(epoch // 86400)
+        self.days[day] = self.days.get(day, 0) + 1
+
+    def merge(self, other):
+        """Fold the statistics of another set of citations into these"""
+        self.count += other.count
+        self.contribution_sum += other.contribution_sum
+        if other.first is not None and (self.first is None or other.first < self.first):
+            self.first = other.first
+        if other.last is not None and (self.last is None or other.last > self.last):
+            self.last = other.last
+        for day, count in other.days.items():
+            self.days[day] = self.days.get(day, 0) + count
+
+    @staticmethod
+    def _isoformat(epoch):
+        return datetime.fromtimestamp(epoch, timezone.utc).isoformat() if epoch is not None else None
+
+    def to_dict(self, histogram=False):
+        """
+        Serializable view of the statistics
+
+        Args:
+            histogram (bool): Include the per-day citation counts
+
+        Returns:
+            dict: Count, first/last citation time, contribution sum and mean
+        """
+        stats = {
+            'count': self.count,
+            'first_timestamp': self._isoformat(self.first),
+            'last_timestamp': self._isoformat(self.last),
+            'contribution_sum': round(self.contribution_sum, 4),
+            'mean_contribution': round(self.contribution_sum / self.count, 4) if self.count else 0.0
+        }
+        if histogram:
+            stats['daily'] = [
+                {'date': datetime.fromtimestamp(day * 86400, timezone.utc).strftime('%Y-%m-%d'),
+                 'citations': count}
+                for day, count in sorted(self.days.items())
+            ]
+        return stats
+
+
+def citation_event(citation_data, timestamp):
+    """
+    Time and contribution of a citation, as folded into an EdgeAggregate
+
+    Missing contribution scores count as 0.5, the registry's default, and
+    unparseable timestamps leave the time statistics untouched.
+
+    Returns:
+        tuple: (epoch seconds or None, contribution score)
+    """
+    try:
+        epoch = parse_timestamp(timestamp)
+    except ValueError:
+        epoch = None
+    contribution = citation_data.get('contribution_score')
+    return epoch, 0.5 if contribution is None else float(contribution)
+
+
+class Leaderboard:
+    """
+    Maintained top-k ranking of keys by count
+
+    Every increment pushes the key's new count onto a max-heap; entries
+    left behind by older counts are discarded lazily when they surface
+    during a query, and the heap is rebuilt once stale entries outnumber
+    live ones. Ties are broken by first appearance, matching
+    ``Counter.most_common``.
+    """
+
+    __slots__ = ('counts', '_order', '_heap')
+
+    def __init__(self):
+        self.counts = {}
+        self._order = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def increment(self, key, amount=1):
+        """Add ``amount`` (> 0) to the count of ``key``"""
+        order = self._order.setdefault(key, len(self._order))
+        count = self.counts.get(key, 0) + amount
+        self.counts[key] = count
+        heapq.heappush(self._heap, (-count, order, key))
+
+        if len(self._heap) > 2 * len(self.counts) + 64:
+            self._heap = [(-c, self._order[k], k) for k, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, k):
+        """
+        Get the ``k`` highest-counted keys
+
+        Args:
+            k (int): Number of entries to return
+
+        Returns:
+            list: (key, count) tuples, highest count first
+        """
+        result = []
+        live = []
+        while self._heap and len(result) < k:
+            entry = heapq.heappop(self._heap)
+            neg_count, _, key = entry
+            if self.counts.get(key) != -neg_count:
+                continue  # Superseded by a later increment
+            result.append((key, -neg_count))
+            live.append(entry)
+
+        for entry in live:
+            heapq.heappush(self._heap, entry)
+
+        return result
@@ -1,9 +1,20 @@
 import json
+import logging
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
 import pandas as pd
 from collections import defaultdict, Counter
+from app.models.author_index import AuthorIndex
+from app.models.citation_analytics import CitationAnalytics
+from app.models.citation_index import (CitationAggregate, Leaderboard, TimeIndex, decode_cursor,
+                                       encode_cursor, parse_timestamp)
+from app.models.citation_storage import CitationStorage
+from app.models.citation_store import CitationSequence, ColumnarCitationStore, GroupedCitations
+
+logger = logging.getLogger(__name__)
 
 class CitationRegistry:
     """
@@ -14,20 +25,133 @@ class CitationRegistry:
     - Tracking attribution and contribution metrics
     - Providing impact analytics
     
-    This simulates a database with in-memory storage for the PoC.
-    In production, this would use a proper database like PostgreSQL.
+    Queries are served from in-memory indexes. A storage backend can be
+    supplied to persist citation events across restarts; by default the
+    registry is purely in-memory as in the original PoC. Snapshots of the
+    state are taken by a background thread: it serializes the state while
+    holding the registry's lock, and writes it out after releasing it, so
+    requests never wait on snapshot I/O.
     """
     
-    def __init__(self):
-        """Initialize the citation registry"""
-        # In-memory storage for the PoC
-        self.citations = []
+    # Bump when the layout of the in-memory state changes so that older
+    # snapshots are ignored and the log is replayed from the start
+    STATE_VERSION = 5
+    
+    def __init__(self, storage=None, load_sample_data=True, author_index=None, lock=None):
+        """
+        Initialize the citation registry
+        
+        Args:
+            storage (CitationStorage, optional): Persistence backend
+            load_sample_data (bool): Seed sample citations when the
+                storage holds no data
+            author_index (AuthorIndex, optional): Author name resolution,
+                shared with the knowledge graph so both see the same authors
+            lock (threading.RLock, optional): Lock callers hold while using
+                the registry; snapshots hold it while serializing the state
+        """
+        self.storage = storage or CitationStorage()
+        self.author_index = AuthorIndex() if author_index is None else author_index
+        self._lock = lock or threading.RLock()
+        self._snapshot_requested = threading.Event()
+        self._snapshot_thread = None
+        
+        # In-memory state, rebuilt from storage on startup. Events live in
+        # a compact columnar store; self.citations and self.citation_by_doi
+        # are read-only dict views over it
+        self.store = ColumnarCitationStore()
         self.citation_counts = defaultdict(int)
+        # Citations per canonical author (see AuthorIndex)
         self.author_citations = defaultdict(int)
-        self.citation_by_doi = defaultdict(list)
+        self.source_type_counts = Counter()
+        
+        # Change tracking for conditional requests: the instance ID makes
+        # validators from a different (e.g. re-seeded) registry never match
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.last_modified = time.time()
+        
+        # Secondary indexes over positions in the store, each kept
+        # in time order so filtered queries never scan the full list
+        self._time_index = TimeIndex()
+        self._doi_index = defaultdict(TimeIndex)
+        self._model_index = defaultdict(TimeIndex)
         
-        # Load sample data if available
-        self._load_sample_data()
+        # Running per-DOI score aggregates, updated at ingest
+        self.doi_aggregates = defaultdict(CitationAggregate)
+        
+        # Maintained leaderboards (global and per AI model) and the
+        # descriptive metadata of each DOI, taken from its first citation
+        self.doi_metadata = {}
+        self._leaderboard = Leaderboard()
+        self._model_leaderboards = defaultdict(Leaderboard)
+        
+        # Restore persisted state, or load sample data into a fresh registry
+        if not self._restore() and load_sample_data:
+            self._load_sample_data()
+    
+    def _restore(self):
+        """
+        Restore state from the latest snapshot plus the log written after it
+        
+        Returns:
+            bool: Whether the storage held any citations
+        """
+        position = 0
+        snapshot = self.storage.load_snapshot()
+        if snapshot is not None:
+            state, snapshot_position = snapshot
+            if state.get('version') == self.STATE_VERSION:
+                self.__dict__.update(state['attributes'])
+                position = snapshot_position
+        
+        for citation_data in self.storage.replay(position):
+            epoch, contribution = self._validate_citation(citation_data)
+            self._index_citation(citation_data, epoch, contribution)
+        
+        return self.storage.position > 0
+    
+    @property
+    def citations(self):
+        """All citation events in insertion order, as dicts"""
+        return CitationSequence(self.store)
+    
+    @property
+    def citation_by_doi(self):
+        """Citation events grouped by DOI, as dicts"""
+        return GroupedCitations(self.store, self._doi_index)
+    
+    def _snapshot_state(self):
+        """Capture the in-memory state for a storage snapshot"""
+        excluded = ('storage', 'author_index', '_lock', '_snapshot_requested', '_snapshot_thread')
+        return {
+            'version': self.STATE_VERSION,
+            'attributes': {k: v for k, v in self.__dict__.items() if k not in excluded}
+        }
+    
+    def _request_snapshot(self):
+        """Have the snapshot thread take a snapshot once it is free"""
+        self._snapshot_requested.set()
+        if self._snapshot_thread is None:
+            self._snapshot_thread = threading.Thread(target=self._run_snapshots, name='aicif-snapshot',
+                                                     daemon=True)
+            self._snapshot_thread.start()
+    
+    def _run_snapshots(self):
+        while True:
+            self._snapshot_requested.wait()
+            self._snapshot_requested.clear()
+            try:
+                # Serializing freezes the state; the slow write needs no lock
+                with self._lock:
+                    snapshot = self.storage.dump_snapshot(self._snapshot_state())
+                self.storage.save_snapshot(snapshot)
+            except Exception:
+                logger.exception('Writing the registry snapshot failed; the log still holds every citation')
+    
+    def close(self):
+        """Close the storage; the log already holds every citation"""
+        with self._lock:
+            self.storage.close()
     
     def _load_sample_data(self):
         """Load sample citation data for demonstration"""
@@ -86,28 +210,136 @@ class CitationRegistry:
                 
         Returns:
             str: The generated citation ID
+            
+        Raises:
+            ValueError: If a required field is missing, the timestamp is not
+                valid ISO-8601 or the contribution score is not a number
         """
+        # Ensure timestamp exists and is parseable before touching any state
+        if 'timestamp' not in citation_data:
+            citation_data['timestamp'] = datetime.utcnow().isoformat()
+        epoch, contribution = self._validate_citation(citation_data)
+        
         # Generate a citation ID if not provided
         citation_id = citation_data.get('citation_id', str(uuid.uuid4()))
         citation_data['citation_id'] = citation_id
         
-        # Ensure timestamp exists
-        if 'timestamp' not in citation_data:
-            citation_data['timestamp'] = datetime.utcnow().isoformat()
+        # Log before indexing so that an indexed event is always durable
+        self.storage.append(citation_data)
+        self._index_citation(citation_data, epoch, contribution)
+        
+        if self.storage.snapshot_due():
+            self._request_snapshot()
+        
+        return citation_id
+    
+    def add_citations_bulk(self, citations):
+        """
+        Log a batch of citation events
+        
+        Every event is validated first; the valid ones are written to
+        storage in a single append and then indexed. Invalid events are
+        reported and skipped without affecting the rest of the batch.
+        
+        Args:
+            citations (list): Citation metadata dicts, as for add_citation
+            
+        Returns:
+            list: One result per input event, in order, with 'index' and
+                'status' plus either 'citation_id' or an error 'message'
+        """
+        results = []
+        accepted = []
+        for index, citation_data in enumerate(citations):
+            if not isinstance(citation_data, dict):
+                results.append({
+                    'index': index,
+                    'status': 'error',
+                    'message': 'Citation must be a JSON object'
+                })
+                continue
+            
+            if 'timestamp' not in citation_data:
+                citation_data['timestamp'] = datetime.utcnow().isoformat()
+            try:
+                epoch, contribution = self._validate_citation(citation_data)
+            except ValueError as e:
+                results.append({'index': index, 'status': 'error', 'message': str(e)})
+                continue
+            
+            citation_id = citation_data.get('citation_id', str(uuid.uuid4()))
+            citation_data['citation_id'] = citation_id
+            accepted.append((citation_data, epoch, contribution))
+            results.append({'index': index, 'status': 'success', 'citation_id': citation_id})
+        
+        if accepted:
+            self.storage.append_many([citation_data for citation_data, _, _ in accepted])
+            for citation_data, epoch, contribution in accepted:
+                self._index_citation(citation_data, epoch, contribution)
+            
+            if self.storage.snapshot_due():
+                self._request_snapshot()
+        
+        return results
+    
+    def _validate_citation(self, citation_data):
+        """
+        Check a citation event and parse the fields the indexes need
+        
+        Returns:
+            tuple: (epoch timestamp, contribution score)
+        """
+        epoch = parse_timestamp(citation_data['timestamp'])
+        for field in ('doi', 'ai_model'):
+            if field not in citation_data:
+                raise ValueError(f'Missing required field: {field}')
+            if not isinstance(citation_data[field], str):
+                raise ValueError(f'Field {field} must be a string')
+        for field in ('source_type', 'authors'):
+            if field in citation_data and not isinstance(citation_data[field], str):
+                raise ValueError(f'Field {field} must be a string')
+        try:
+            contribution = float(citation_data.get('contribution_score', 0.5))
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"Invalid contribution_score: {citation_data.get('contribution_score')!r}")
+        return epoch, contribution
+    
+    def _index_citation(self, citation_data, epoch, contribution):
+        """Add a validated citation event to the in-memory state"""
+        doi = citation_data['doi']
+        ai_model = citation_data['ai_model']
         
         # Add to our in-memory storage
-        self.citations.append(citation_data)
+        position = self.store.append(citation_data, epoch)
+        
+        # Update secondary indexes
+        self._time_index.add(epoch, position)
+        self._doi_index[doi].add(epoch, position)
+        self._model_index[ai_model].add(epoch, position)
         
         # Update citation counts
-        doi = citation_data['doi']
         self.citation_counts[doi] += 1
-        self.citation_by_doi[doi].append(citation_data)
+        self.doi_aggregates[doi].add(epoch, contribution, ai_model)
+        
+        # Update leaderboards
+        self._leaderboard.increment(doi)
+        self._model_leaderboards[ai_model].increment(doi)
+        if doi not in self.doi_metadata:
+            self.doi_metadata[doi] = {
+                'title': citation_data.get('source_title', 'Unknown'),
+                'authors': citation_data.get('authors', 'Unknown'),
+                'type': citation_data.get('source_type', 'journal_article')
+            }
         
-        # Update author citation counts if authors are provided
+        # Update citation counts of each resolved author
         if 'authors' in citation_data:
-            self.author_citations[citation_data['authors']] += 1
+            for author in self.author_index.resolve_all(citation_data['authors']):
+                self.author_citations[author] += 1
         
-        return citation_id
+        # Update dashboard counters
+        self.source_type_counts[citation_data.get('source_type', 'unknown')] += 1
+        self.last_modified = time.time()
     
     def get_citations(self, doi=None, ai_model=None, start_date=None, end_date=None, limit=50):
         """
@@ -121,33 +353,92 @@ class CitationRegistry:
             limit (int, optional): Maximum number of results
             
         Returns:
-            list: Filtered citation logs
+            list: Filtered citation logs, newest first
+            
+        Raises:
+            ValueError: If a date filter is not valid ISO-8601
+        """
+        citations, _ = self.get_citations_page(
+            doi=doi, ai_model=ai_model, start_date=start_date, end_date=end_date, limit=limit)
+        return citations
+    
+    def get_citations_page(self, doi=None, ai_model=None, start_date=None, end_date=None,
+                           cursor=None, limit=50):
         """
-        # Start with all citations
-        filtered = self.citations
+        Retrieve one page of citation logs using keyset pagination
         
-        # Apply filters
-        if doi:
-            filtered = [c for c in filtered if c['doi'] == doi]
+        Pages are ordered newest first by (timestamp, log position), so a
+        cursor stays valid while new citations are being added and paging
+        through any number of results costs the same per page.
         
+        Args:
+            doi (str, optional): Filter by DOI
+            ai_model (str, optional): Filter by AI model
+            start_date (str, optional): Filter by start date (ISO format)
+            end_date (str, optional): Filter by end date (ISO format)
+            cursor (str, optional): Cursor returned with the previous page
+            limit (int, optional): Maximum number of results
+            
+        Returns:
+            tuple: (citations, next_cursor); next_cursor is None on the last page
+            
+        Raises:
+            ValueError: If a date filter or the cursor is invalid
+        """
+        start = parse_timestamp(start_date) if start_date else None
+        end = parse_timestamp(end_date) if end_date else None
+        after = decode_cursor(cursor) if cursor else None
+        
+        # Every index is time-sorted, so each filter narrows to a bisected
+        # slice; drive the scan from the smallest slice and check the
+        # remaining equality filters per row
+        candidates = [self._time_index]
+        if doi:
+            if doi not in self._doi_index:
+                return [], None
+            candidates.append(self._doi_index[doi])
         if ai_model:
-            filtered = [c for c in filtered if c['ai_model'] == ai_model]
+            if ai_model not in self._model_index:
+                return [], None
+            candidates.append(self._model_index[ai_model])
         
-        if start_date:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            filtered = [c for c in filtered if datetime.fromisoformat(
-                c['timestamp'].replace('Z', '+00:00')) >= start_dt]
+        def bounds(idx):
+            lo, hi = idx.bounds(start, end)
+            if after is not None:
+                hi = max(lo, min(hi, idx.before(*after)))
+            return lo, hi
         
-        if end_date:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            filtered = [c for c in filtered if datetime.fromisoformat(
-                c['timestamp'].replace('Z', '+00:00')) <= end_dt]
+        index, (lo, hi) = min(
+            ((idx, bounds(idx)) for idx in candidates),
+            key=lambda item: item[1][1] - item[1][0]
+        )
         
-        # Sort by timestamp (newest first)
-        filtered.sort(key=lambda x: x['timestamp'], reverse=True)
+        # Walk newest first and stop as soon as the limit is reached,
+        # checking the other filters against dictionary codes
+        results = []
+        if limit <= 0:
+            return results, None
         
-        # Apply limit
-        return filtered[:limit]
+        checks = []
+        if doi and index is not self._doi_index[doi]:
+            checks.append((self.store.columns['doi'], self.store.pools['doi'].lookup(doi)))
+        if ai_model and index is not self._model_index[ai_model]:
+            checks.append((self.store.columns['ai_model'], self.store.pools['ai_model'].lookup(ai_model)))
+        
+        last = None
+        exhausted = True
+        for i in range(hi - 1, lo - 1, -1):
+            position = index.positions[i]
+            if any(column[position] != code for column, code in checks):
+                continue
+            if len(results) >= limit:
+                exhausted = False
+                break
+            results.append(self.store.get(position))
+            last = (index.epochs[i], position)
+        
+        next_cursor = None if exhausted else encode_cursor(*last)
+        return results, next_cursor
     
     def get_top_cited(self, ai_model=None, limit=10):
         """
@@ -161,52 +452,122 @@ class CitationRegistry:
             list: Top cited works with citation counts
         """
         if ai_model:
-            # Filter citations by AI model
-            filtered_citations = [c for c in self.citations if c['ai_model'] == ai_model]
-            # Count DOIs
-            counter = Counter([c['doi'] for c in filtered_citations])
+            leaderboard = self._model_leaderboards.get(ai_model)
+            if leaderboard is None:
+                return []
         else:
-            # Convert defaultdict to Counter
-            counter = Counter()
-            for doi, count in self.citation_counts.items():
-                counter[doi] = count
-        
-        # Get top cited
-        top_cited_dois = [doi for doi, _ in counter.most_common(limit)] if counter else []
+            leaderboard = self._leaderboard
         
         # Format results
         top_cited = []
-        for doi in top_cited_dois:
-            # Get details from the first citation with this DOI
-            citation = next((c for c in self.citations if c['doi'] == doi), None)
-            if citation:
-                top_cited.append({
-                    'doi': doi,
-                    'title': citation.get('source_title', 'Unknown'),
-                    'authors': citation.get('authors', 'Unknown'),
-                    'type': citation.get('source_type', 'journal_article'),
-                    'citation_count': counter[doi],
-                    'aicif_score': self._calculate_aicif_score(doi)
-                })
+        for doi, count in leaderboard.top(limit):
+            metadata = self.doi_metadata[doi]
+            top_cited.append({
+                'doi': doi,
+                'title': metadata['title'],
+                'authors': metadata['authors'],
+                'type': metadata['type'],
+                'citation_count': count,
+                'aicif_score': self._calculate_aicif_score(doi)
+            })
         
         return top_cited
     
     def get_recent_citations(self, limit=5):
         """Get most recent citation events"""
-        # Sort by timestamp (newest first)
-        sorted_citations = sorted(self.citations, key=lambda x: x['timestamp'], reverse=True)
-        return sorted_citations[:limit]
+        return self.get_citations(limit=limit)
+    
+    @property
+    def analytics(self):
+        """Vectorized analytics over the citation store"""
+        return CitationAnalytics(self.store, self.author_index)
     
     def get_summary_stats(self):
-        """Get summary statistics for the dashboard"""
+        """
+        Get summary statistics for the dashboard
+        
+        Read from counters maintained at ingest; analytics.summary_stats()
+        recomputes the same figures from the raw columns.
+        """
         return {
-            'total_citations': len(self.citations),
+            'total_citations': len(self.store),
             'unique_sources': len(self.citation_counts),
-            'ai_models': list(set(c['ai_model'] for c in self.citations)),
-            'source_types': Counter(c.get('source_type', 'unknown') for c in self.citations),
+            'ai_models': list(self._model_index),
+            'source_types': dict(self.source_type_counts),
             'total_authors': len(self.author_citations)
         }
     
+    def get_author(self, name):
+        """
+        Resolve an author name and get the citations of that author
+        
+        Args:
+            name (str): Author name in any supported form, e.g. "J. Smith"
+                or "Smith et al."
+        
+        Returns:
+            dict: Canonical author ID and its citation count
+        """
+        author = self.author_index.lookup(name.strip())
+        return {
+            'author': author,
+            'citations': self.author_citations.get(author, 0)
+        }
+    
+    def get_stats_version(self):
+        """
+        Get validators for the summary statistics
+        
+        Returns:
+            tuple: (etag, last_modified epoch seconds); the ETag changes
+                whenever a citation is added
+        """
+        return f'{self.instance_id}-{len(self.store)}', self.last_modified
+    
+    def get_breakdown(self, by='ai_model'):
+        """
+        Get citation statistics per AI model or per source type
+        
+        Args:
+            by (str): 'ai_model' or 'source_type'
+            
+        Returns:
+            list: Per-group citation counts, unique sources and mean contribution
+        """
+        return self.analytics.breakdown(by)
+    
+    def get_time_series(self, doi=None, ai_model=None, start_date=None, end_date=None):
+        """
+        Get citations per day
+        
+        Args:
+            doi (str, optional): Filter by DOI
+            ai_model (str, optional): Filter by AI model
+            start_date (str, optional): Filter by start date (ISO format)
+            end_date (str, optional): Filter by end date (ISO format)
+            
+        Returns:
+            list: Daily citation counts and mean contribution scores
+        """
+        start = parse_timestamp(start_date) if start_date else None
+        end = parse_timestamp(end_date) if end_date else None
+        return self.analytics.daily_series(doi=doi, ai_model=ai_model, start=start, end=end)
+    
+    def get_aicif_scores(self, limit=None):
+        """
+        Get AIC-IF scores for all DOIs, computed in one vectorized pass
+        
+        Args:
+            limit (int, optional): Only return the highest-scoring DOIs
+            
+        Returns:
+            list: DOIs with their AIC-IF scores, highest first
+        """
+        scores = sorted(self.analytics.aicif_scores().items(), key=lambda item: item[1], reverse=True)
+        if limit is not None:
+            scores = scores[:limit]
+        return [{'doi': doi, 'aicif_score': score} for doi, score in scores]
+    
     def _calculate_aicif_score(self, doi):
         """
         Calculate the AI-Driven Citation Impact Factor score for a publication
@@ -215,46 +576,17 @@ class CitationRegistry:
         that takes into account citation frequency, recency, contribution scores,
         and AI model reputation/usage.
         
+        The score is read from running aggregates maintained by add_citation,
+        so its cost does not grow with the DOI's citation history.
+        
         Args:
             doi (str): The DOI of the publication
             
         Returns:
             float: The AIC-IF score
         """
-        citations = self.citation_by_doi.get(doi, [])
-        
-        if not citations:
+        aggregate = self.doi_aggregates.get(doi)
+        if aggregate is None:
             return 0.0
         
-        # Basic calculation based on citation count and contribution scores
-        citation_count = len(citations)
-        avg_contribution = sum(c.get('contribution_score', 0.5) for c in citations) / citation_count
-        
-        # Calculate recency factor (more recent citations have higher weight)
-        now = datetime.utcnow()
-        recency_weights = []
-        
-        for citation in citations:
-            try:
-                citation_time = datetime.fromisoformat(citation['timestamp'].replace('Z', '+00:00'))
-                # Calculate days since citation (with a minimum of 1 day)
-                days_since = max(1, (now - citation_time).days)
-                # More recent citations get higher weights
-                recency_weights.append(1 / days_since)
-            except (ValueError, KeyError):
-                recency_weights.append(0.5)  # Default weight for invalid timestamps
-        
-        avg_recency = sum(recency_weights) / len(recency_weights) if recency_weights else 0.5
-        
-        # AI model diversity factor
-        ai_models = set(c['ai_model'] for c in citations)
-        model_diversity = min(1.0, len(ai_models) / 5)  # Normalize to max of 1.0
-        
-        # Calculate final AIC-IF score
-        # This is a simplified formula for the PoC
-        aicif_score = (citation_count * 0.4 + 
-                      avg_contribution * 0.3 + 
-                      avg_recency * 0.2 +
-                      model_diversity * 0.1) * 10  # Scale to a 0-10 range
-        
-        return round(aicif_score, 2)
+        return aggregate.score(time.time())
@@ -0,0 +1,280 @@
+import fcntl
+import json
+import os
+import pickle
+
+
+class StorageLockedError(RuntimeError):
+    """Raised when another writer already has a log directory open"""
+
+
+class CitationStorage:
+    """
+    Storage backend interface for the Citation Registry
+
+    The base class is the in-memory backend: nothing is persisted and a
+    fresh registry starts empty. Persistent backends keep an ordered log
+    of citation records plus occasional snapshots of the registry's
+    in-memory state, so a restart costs one snapshot load plus a replay
+    of the records written after it.
+    """
+
+    @property
+    def position(self):
+        """Number of records written to the log so far"""
+        return 0
+
+    def append(self, record):
+        """Durably log one citation record"""
+
+    def append_many(self, records):
+        """Durably log several citation records"""
+        for record in records:
+            self.append(record)
+
+    def load_snapshot(self):
+        """
+        Load the most recent snapshot
+
+        Returns:
+            tuple: (state, position) or None if no snapshot exists
+        """
+        return None
+
+    def replay(self, position=0):
+        """Yield logged records starting at ``position``"""
+        return iter(())
+
+    def snapshot_due(self):
+        """Whether enough records were logged since the last snapshot"""
+        return False
+
+    def dump_snapshot(self, state):
+        """
+        Serialize registry state as of the current log position
+
+        Cheap compared to writing it out, and done while the state cannot
+        change; save_snapshot then writes the result from any thread.
+
+        Returns:
+            The frozen snapshot, for save_snapshot
+        """
+        return None
+
+    def save_snapshot(self, snapshot):
+        """Persist a snapshot made by dump_snapshot"""
+
+    def write_snapshot(self, state):
+        """Persist registry state as of the current log position"""
+        self.save_snapshot(self.dump_snapshot(state))
+
+    def close(self):
+        """Release any open file handles"""
+
+
+class SegmentedLogStorage(CitationStorage):
+    """
+    Append-only segmented log with periodic snapshots
+
+    Records are stored as one JSON document per line in segment files of
+    ``segment_size`` records each, so the segment holding any log position
+    is known without scanning. Snapshots are pickled and written through a
+    temporary file and an atomic rename, so a crash never leaves a
+    half-written snapshot behind. A snapshot is serialized by dump_snapshot
+    and can be written by save_snapshot on another thread. A torn final line left by a crash during
+    an append is truncated when the log is reopened.
+
+    The log has a single writer: an exclusive lock on LOCK_FILE is taken
+    when the directory is opened and held until close(), so a second
+    storage on the same directory, in this or any other process, fails
+    instead of interleaving its appends. Processes that share a data
+    directory must route writes through one registry instance.
+    """
+
+    SEGMENT_PATTERN = 'segment-{:08d}.ndjson'
+    SNAPSHOT_FILE = 'snapshot.pkl'
+    LOCK_FILE = 'writer.lock'
+
+    def __init__(self, directory, segment_size=100000, snapshot_interval=10000, fsync=False):
+        """
+        Open (or create) a log directory
+
+        Args:
+            directory (str): Directory holding segments and snapshots
+            segment_size (int): Records per segment file
+            snapshot_interval (int): Records between automatic snapshots
+            fsync (bool): Whether to fsync after every append
+
+        Raises:
+            StorageLockedError: If another storage has the directory open
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+
+        os.makedirs(directory, exist_ok=True)
+        # Taken before recovery, which may truncate the live writer's segment
+        self._lock_file = self._acquire_lock()
+
+        self._position = self._recover()
+        self._snapshot_position = 0
+        self._file = None
+
+    def _acquire_lock(self):
+        lock_file = open(os.path.join(self.directory, self.LOCK_FILE), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise StorageLockedError(f'{self.directory} is already open for writing by another process; '
+                                     f'use AICIF_SHARING=shared to share it between processes')
+        return lock_file
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, self.SEGMENT_PATTERN.format(index))
+
+    def _recover(self):
+        """Find the end of the log, dropping a torn final record if any"""
+        index = 0
+        while os.path.exists(self._segment_path(index + 1)):
+            index += 1
+
+        path = self._segment_path(index)
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, 'rb+') as f:
+            data = f.read()
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                f.truncate(complete)
+
+        return index * self.segment_size + data.count(b'\n', 0, complete)
+
+    @property
+    def position(self):
+        return self._position
+
+    def _writer(self):
+        """Get the open segment file, rolling over when it is full"""
+        if self._file is not None and self._position % self.segment_size == 0:
+            self._file.close()
+            self._file = None
+
+        if self._file is None:
+            index = self._position // self.segment_size
+            self._file = open(self._segment_path(index), 'a', encoding='utf-8')
+
+        return self._file
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        for record in records:
+            self._writer().write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._position += 1
+
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def replay(self, position=0):
+        return read_log_range(self.directory, self.segment_size, position, self._position)
+
+    def load_snapshot(self):
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        # A snapshot ahead of the log (e.g. the log was truncated) is unusable
+        if snapshot['position'] > self._position:
+            return None
+
+        self._snapshot_position = snapshot['position']
+        return snapshot['state'], snapshot['position']
+
+    def snapshot_due(self):
+        return self._position - self._snapshot_position >= self.snapshot_interval
+
+    def dump_snapshot(self, state):
+        # Counted from here, so appends made during the write do not
+        # request another snapshot straight away
+        self._snapshot_position = self._position
+        return pickle.dumps({'position': self._position, 'state': state}, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def save_snapshot(self, snapshot):
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        tmp_path = path + '.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            # Closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def read_log_range(directory, segment_size, start, end):
+    """
+    Yield the records at log positions [start, end) of a segmented log
+
+    Only reads, so it is safe to call from other processes (e.g. to
+    process parts of the log in parallel) while the log is open.
+
+    Args:
+        directory (str): Log directory
+        segment_size (int): Records per segment file
+        start (int): First position
+        end (int): Position to stop at
+    """
+    index, skip = divmod(start, segment_size)
+    position = start
+    while position < end:
+        path = os.path.join(directory, SegmentedLogStorage.SEGMENT_PATTERN.format(index))
+        if not os.path.exists(path):
+            return
+
+        with open(path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f):
+                if line_no < skip:
+                    continue
+                if position >= end:
+                    return
+                yield json.loads(line)
+                position += 1
+
+        index += 1
+        skip = 0
+
+
+def open_storage(data_dir=None, **kwargs):
+    """
+    Build the storage backend for a data directory
+
+    Args:
+        data_dir (str, optional): Directory for persistent data; the
+            in-memory backend is used when not set
+
+    Returns:
+        CitationStorage: The storage backend
+    """
+    if not data_dir:
+        return CitationStorage()
+    return SegmentedLogStorage(os.path.join(data_dir, 'citations'), **kwargs)
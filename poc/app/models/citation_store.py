@@ -0,0 +1,249 @@
+import uuid
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class StringPool:
+    """
+    Dictionary encoding for a string column
+
+    Each distinct value is stored once and rows hold its integer code.
+    Code -1 marks a missing value.
+    """
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        """Get the code of a value, adding it to the pool if new"""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def lookup(self, value):
+        """Get the code of a value without adding it (-1 if unknown)"""
+        return self.codes.get(value, -1)
+
+    def decode(self, code):
+        return self.values[code]
+
+
+class ChunkedColumn:
+    """
+    Fixed-type NumPy column that grows one chunk at a time
+
+    Appends never copy existing data; full chunks are kept as-is and only
+    the last chunk is partially filled.
+    """
+
+    __slots__ = ('dtype', 'chunk_size', 'chunks', 'length')
+
+    def __init__(self, dtype, chunk_size=65536):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, value):
+        offset = self.length % self.chunk_size
+        if offset == 0:
+            self.chunks.append(np.empty(self.chunk_size, dtype=self.dtype))
+        self.chunks[-1][offset] = value
+        self.length += 1
+
+    def __getitem__(self, position):
+        chunk, offset = divmod(position, self.chunk_size)
+        return self.chunks[chunk][offset]
+
+    def to_numpy(self):
+        """Get the column as one contiguous array"""
+        if not self.chunks:
+            return np.empty(0, dtype=self.dtype)
+        tail = self.length - (len(self.chunks) - 1) * self.chunk_size
+        return np.concatenate(self.chunks[:-1] + [self.chunks[-1][:tail]])
+
+
+class ColumnarCitationStore:
+    """
+    Compact columnar storage for citation events
+
+    String fields are dictionary-encoded into int32 code columns,
+    timestamps are int64 epoch microseconds and contribution scores are
+    float32 (NaN when absent). Citation IDs that are canonical UUIDs are
+    kept as 16 raw bytes. Anything that would not round-trip through the
+    columns (non-canonical timestamp strings or IDs, non-float scores,
+    extra keys) is kept in small per-row override maps, so get()
+    reproduces the original event, with scores at float32 precision.
+    """
+
+    STRING_FIELDS = ('doi', 'ai_model', 'source_title', 'source_type',
+                     'authors', 'user_id', 'context')
+    CORE_FIELDS = STRING_FIELDS + ('citation_id', 'timestamp', 'contribution_score')
+
+    def __init__(self, chunk_size=65536):
+        self.pools = {field: StringPool() for field in self.STRING_FIELDS}
+        self.columns = {field: ChunkedColumn(np.int32, chunk_size) for field in self.STRING_FIELDS}
+        self.timestamps = ChunkedColumn(np.int64, chunk_size)
+        self.contributions = ChunkedColumn(np.float32, chunk_size)
+        self.citation_ids = ChunkedColumn('V16', chunk_size)
+
+        # Sparse per-row data that does not fit the columns
+        self.raw_timestamps = {}
+        self.raw_citation_ids = {}
+        self.raw_contributions = {}
+        self.extras = {}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, citation_data, epoch):
+        """
+        Store one validated citation event
+
+        Args:
+            citation_data (dict): Citation metadata
+            epoch (float): Parsed timestamp in epoch seconds
+
+        Returns:
+            int: Position of the stored event
+        """
+        position = len(self)
+
+        for field in self.STRING_FIELDS:
+            value = citation_data.get(field)
+            if field in citation_data and isinstance(value, str):
+                code = self.pools[field].encode(value)
+            else:
+                code = -1
+                if field in citation_data:
+                    self.extras.setdefault(position, {})[field] = value
+            self.columns[field].append(code)
+
+        micros = round(epoch * 1000000)
+        self.timestamps.append(micros)
+        timestamp = citation_data['timestamp']
+        if timestamp != self._format_timestamp(micros):
+            self.raw_timestamps[position] = timestamp
+
+        contribution = citation_data.get('contribution_score')
+        if contribution is None:
+            self.contributions.append(np.nan)
+            if 'contribution_score' in citation_data:
+                self.raw_contributions[position] = None
+        else:
+            self.contributions.append(float(contribution))
+            if type(contribution) is not float:
+                self.raw_contributions[position] = contribution
+
+        citation_id = citation_data['citation_id']
+        try:
+            packed = uuid.UUID(citation_id)
+            canonical = str(packed) == citation_id
+        except (TypeError, ValueError, AttributeError):
+            canonical = False
+        if canonical:
+            self.citation_ids.append(packed.bytes)
+        else:
+            self.citation_ids.append(bytes(16))
+            self.raw_citation_ids[position] = citation_id
+
+        extra = {k: v for k, v in citation_data.items() if k not in self.CORE_FIELDS}
+        if extra:
+            self.extras.setdefault(position, {}).update(extra)
+
+        return position
+
+    @staticmethod
+    def _format_timestamp(micros):
+        return (_EPOCH + timedelta(microseconds=int(micros))).isoformat()
+
+    def field_code(self, field, position):
+        """Get the dictionary code of a string field at a position"""
+        return int(self.columns[field][position])
+
+    def get(self, position):
+        """
+        Reconstruct the citation event stored at a position
+
+        Returns:
+            dict: A fresh dict equal to the event that was stored
+        """
+        citation = {}
+        for field in self.STRING_FIELDS:
+            code = self.columns[field][position]
+            if code >= 0:
+                citation[field] = self.pools[field].values[code]
+
+        if position in self.raw_citation_ids:
+            citation['citation_id'] = self.raw_citation_ids[position]
+        else:
+            citation['citation_id'] = str(uuid.UUID(bytes=self.citation_ids[position].tobytes()))
+
+        citation['timestamp'] = self.raw_timestamps.get(position) or \
+            self._format_timestamp(self.timestamps[position])
+
+        if position in self.raw_contributions:
+            citation['contribution_score'] = self.raw_contributions[position]
+        else:
+            contribution = self.contributions[position]
+            if not np.isnan(contribution):
+                # Shortest repr of the float32 value, e.g. 0.89 rather than 0.8899999856948853
+                citation['contribution_score'] = float(str(contribution))
+
+        if position in self.extras:
+            citation.update(self.extras[position])
+
+        return citation
+
+
+class CitationSequence(Sequence):
+    """Read-only list view of a columnar store, yielding citation dicts"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._store.get(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('citation index out of range')
+        return self._store.get(position)
+
+
+class GroupedCitations(Mapping):
+    """Read-only mapping view from a key to its citation dicts, in insertion order"""
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key):
+        if key not in self._index:
+            raise KeyError(key)
+        return [self._store.get(p) for p in sorted(self._index[key].positions)]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
@@ -0,0 +1,866 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from datetime import datetime
+import numpy as np
+from app.models.author_index import AuthorIndex
+from app.models.citation_index import EdgeAggregate, citation_event
+from app.models.citation_storage import CitationStorage
+from app.models.citation_store import StringPool
+from app.models.graph_storage import (decode_strings, decode_timestamp, encode_strings, encode_timestamp,
+                                      graph_record)
+from app.models.graph_paths import PathQueryEngine
+
+logger = logging.getLogger(__name__)
+
+# Relationship types, encoded as small integers on every edge
+RELATIONSHIPS = ("CITES", "AUTHORED", "CREATED", "USES")
+
+# Node types known up front; other source types are added on first use
+NODE_TYPES = ("paper", "dataset", "code", "author", "ai_model")
+
+NODE_STYLES = {
+    "ai_model": (12, "#9b59b6"),
+    "author": (7, "#e74c3c"),
+    "dataset": (10, "#2ecc71"),
+    "code": (10, "#f39c12"),
+}
+DEFAULT_NODE_STYLE = (10, "#3498db")
+
+
+def _seeded_pool(values):
+    pool = StringPool()
+    for value in values:
+        pool.encode(value)
+    return pool
+
+
+class _Adjacency(Mapping):
+    """networkx-style adjacency view (node -> {neighbor: edge attributes})"""
+
+    def __init__(self, graph, incoming):
+        self._graph = graph
+        self._incoming = incoming
+
+    def __getitem__(self, node_id):
+        graph = self._graph
+        node = graph._ids[node_id]
+        edges = graph._in_edges(node) if self._incoming else graph._out_edges(node)
+        relationships = graph._relationships.values
+        return {graph._names[other]: {"relationship": relationships[graph._edge_rel[edge]]}
+                for other, edge in edges}
+
+    def __iter__(self):
+        return iter(self._graph._names)
+
+    def __len__(self):
+        return len(self._graph._names)
+
+
+class CompactKnowledgeGraph:
+    """
+    Integer-indexed alternative backend for the knowledge graph
+
+    Offers the same API as KnowledgeGraph with a much smaller footprint:
+    - node IDs are interned to dense integers, node types and titles are
+      dictionary-encoded, display sizes are an int8 column (set like the
+      networkx backend's, so the sample graph keeps its own) and colors are
+      derived from the type
+    - edges get dense integer IDs; their relationship (int8 code), weight
+      and timestamp (int64 epoch microseconds) are typed columns indexed
+      by edge ID, and so are the citation statistics of CITES edges, whose
+      per-day histograms are linked lists in shared slot columns
+    - the topology lives in CSR arrays (NumPy) sorted by source and then
+      target, with a reverse CSR for incoming edges
+    - new edges go to a small pending buffer that is merged into the CSR
+      arrays in bulk once it grows past a fraction of the graph
+    Neighbor scans are contiguous slices of the CSR arrays.
+    """
+
+    # Pending edges merged into the CSR arrays at max(this, edges / 8)
+    MIN_PENDING_EDGES = 4096
+
+    # Citations applied per batch when replaying the log or rebuilding
+    REPLAY_BATCH_SIZE = 10000
+
+    def __init__(self, storage=None, load_sample_data=True, author_index=None, lock=None):
+        """
+        Initialize the knowledge graph
+
+        Args:
+            storage (CitationStorage, optional): Persistence backend, as for KnowledgeGraph
+            load_sample_data (bool): Seed the sample graph when there is
+                no snapshot to start from
+            author_index (AuthorIndex, optional): Author name resolution, as for KnowledgeGraph
+            lock (threading.RLock, optional): Lock callers hold while using
+                the graph, as for KnowledgeGraph
+        """
+        self.storage = storage or CitationStorage()
+        self.author_index = AuthorIndex() if author_index is None else author_index
+        self._lock = lock or threading.RLock()
+        self._snapshot_requested = threading.Event()
+        self._snapshot_thread = None
+
+        # Bumped on every change, to tell when derived indexes are stale
+        self.version = 0
+
+        self._reset()
+        self.restored = self._restore(load_sample_data)
+
+    def _reset(self):
+        """Start from an empty graph"""
+        # Node table
+        self._ids = {}
+        self._names = []
+        self._types = array('b')
+        self._sizes = array('b')
+        self._titles = array('i')
+        self._node_types = _seeded_pool(NODE_TYPES)
+        self._title_pool = StringPool()
+        self._relationships = _seeded_pool(RELATIONSHIPS)
+
+        # Edge attributes, indexed by edge ID
+        self._edge_rel = array('b')
+        self._edge_weight = array('f')
+        self._edge_ts = array('q')
+        # Timestamps that do not round-trip through epoch microseconds
+        self._raw_timestamps = {}
+        # Aggregated citation statistics (see EdgeAggregate), indexed by
+        # edge ID; edges without citations have a count of 0
+        self._stats_count = array('q')
+        self._stats_first = array('d')
+        self._stats_last = array('d')
+        self._stats_contribution = array('d')
+        # Per-day citation counts: each edge's days form a linked list of
+        # slots, latest day first, starting at its head slot (-1: none)
+        self._stats_head = array('q')
+        self._day = array('i')
+        self._day_count = array('q')
+        self._day_next = array('q')
+
+        # Forward CSR: out-edges of node u are [indptr[u], indptr[u + 1])
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.empty(0, dtype=np.int32)
+        self._eids = np.empty(0, dtype=np.int64)
+
+        # Reverse CSR: in-edges of node v are [rindptr[v], rindptr[v + 1])
+        self._rindptr = np.zeros(1, dtype=np.int64)
+        self._rindices = np.empty(0, dtype=np.int32)
+        self._reids = np.empty(0, dtype=np.int64)
+
+        # Edges not yet merged into the CSR arrays: (u, v) -> edge ID
+        self._pending = {}
+        self._pending_out = defaultdict(list)
+        self._pending_in = defaultdict(list)
+
+    def _restore(self, load_sample_data):
+        """
+        Restore the graph from the latest snapshot plus the log written after it
+
+        Returns:
+            bool: Whether the storage held a snapshot or logged citations
+        """
+        position = 0
+        snapshot = self.storage.load_snapshot()
+        if snapshot is not None:
+            state, position = snapshot
+            self._load_snapshot_state(state)
+        elif load_sample_data:
+            self._load_sample_data()
+
+        for record in self.storage.replay(position):
+            self._add_citation(record)
+
+        return snapshot is not None or self.storage.position > 0
+
+    def rebuild(self, aggregate, load_sample_data=True):
+        """Replace the graph with one built from a citation history, as KnowledgeGraph.rebuild"""
+        self._reset()
+        if load_sample_data:
+            self._load_sample_data()
+        self.merge_aggregate(aggregate)
+        self.storage.write_snapshot(self._snapshot_state())
+
+    def merge_aggregate(self, aggregate):
+        """Apply the aggregate of a run of citations in one pass"""
+        self.version += 1
+        for node_id, (node_type, title) in aggregate.nodes.items():
+            self._node(node_id, node_type, title)
+
+        for (ai_model, doi), (stats, timestamp) in aggregate.cites.items():
+            edge = self._set_edge(self._ids[ai_model], self._ids[doi], "CITES", 0, timestamp)
+            self._merge_stats(edge, stats)
+            self._edge_weight[edge] = self._stats_count[edge]
+
+        for name, doi in aggregate.authored:
+            author = self._node(self.author_index.resolve(name), "author")
+            self._set_edge(author, self._ids[doi], "AUTHORED", 1, replace=False)
+
+    def _request_snapshot(self):
+        """Have the snapshot thread take a snapshot once it is free"""
+        self._snapshot_requested.set()
+        if self._snapshot_thread is None:
+            self._snapshot_thread = threading.Thread(target=self._run_snapshots, name='aicif-graph-snapshot',
+                                                     daemon=True)
+            self._snapshot_thread.start()
+
+    def _run_snapshots(self):
+        while True:
+            self._snapshot_requested.wait()
+            self._snapshot_requested.clear()
+            try:
+                # Capturing copies the graph into arrays; the slow write needs no lock
+                with self._lock:
+                    snapshot = self.storage.dump_snapshot(self._snapshot_state())
+                self.storage.save_snapshot(snapshot)
+            except Exception:
+                logger.exception('Writing the graph snapshot failed; the log still holds every citation')
+
+    def close(self):
+        """Write a final snapshot and close the storage"""
+        with self._lock:
+            if self.storage.position > 0:
+                self.storage.write_snapshot(self._snapshot_state())
+            self.storage.close()
+
+    def _snapshot_state(self):
+        """Capture the graph in the snapshot format shared with KnowledgeGraph"""
+        self._merge_pending()
+        # Edge IDs are positions in the snapshot's edge list
+        sources = np.empty(len(self._edge_rel), dtype=np.int32)
+        targets = np.empty(len(self._edge_rel), dtype=np.int32)
+        sources[self._eids] = np.repeat(np.arange(len(self._indptr) - 1, dtype=np.int32), np.diff(self._indptr))
+        targets[self._eids] = self._indices
+
+        names_data, names_offsets = encode_strings(self._names)
+        titles_data, titles_offsets = encode_strings(self._title_pool.values)
+        arrays = {
+            "node_names": names_data,
+            "node_name_offsets": names_offsets,
+            "node_type": np.frombuffer(self._types, dtype=np.int8).copy(),
+            "node_size": np.frombuffer(self._sizes, dtype=np.int8).copy(),
+            "node_title": np.frombuffer(self._titles, dtype=np.int32).copy(),
+            "titles": titles_data,
+            "title_offsets": titles_offsets,
+            "edge_source": sources,
+            "edge_target": targets,
+            "edge_rel": np.frombuffer(self._edge_rel, dtype=np.int8).copy(),
+            "edge_weight": np.frombuffer(self._edge_weight, dtype=np.float32).copy(),
+            "edge_ts": np.frombuffer(self._edge_ts, dtype=np.int64).copy()
+        }
+        arrays.update(self._pack_stats())
+
+        return {
+            "meta": {
+                "version": self.version,
+                "node_types": list(self._node_types.values),
+                "relationships": list(self._relationships.values),
+                "raw_timestamps": {str(edge): raw for edge, raw in self._raw_timestamps.items()},
+                "authors": self.author_index.to_dict()
+            },
+            "arrays": arrays
+        }
+
+    def _load_snapshot_state(self, state):
+        """Replace the graph with the contents of a snapshot"""
+        meta, arrays = state["meta"], state["arrays"]
+        self._reset()
+
+        # Snapshot codes may come from the other backend; map them onto ours
+        type_codes = np.array([self._node_types.encode(t) for t in meta["node_types"]], dtype=np.int8)
+        rel_codes = np.array([self._relationships.encode(r) for r in meta["relationships"]], dtype=np.int8)
+
+        self._names = decode_strings(arrays["node_names"], arrays["node_name_offsets"])
+        self._ids = {node_id: i for i, node_id in enumerate(self._names)}
+        self._types = array('b', type_codes[arrays["node_type"]].tobytes() if len(self._names) else b'')
+        self._sizes = array('b', np.asarray(arrays["node_size"], dtype=np.int8).tobytes())
+        for title in decode_strings(arrays["titles"], arrays["title_offsets"]):
+            self._title_pool.encode(title)
+        self._titles = array('i', np.asarray(arrays["node_title"], dtype=np.int32).tobytes())
+
+        self._edge_rel = array('b', rel_codes[arrays["edge_rel"]].tobytes() if len(arrays["edge_rel"]) else b'')
+        self._edge_weight = array('f', np.asarray(arrays["edge_weight"], dtype=np.float32).tobytes())
+        self._edge_ts = array('q', np.asarray(arrays["edge_ts"], dtype=np.int64).tobytes())
+        self._raw_timestamps = {int(edge): raw for edge, raw in meta["raw_timestamps"].items()}
+        self._unpack_stats(arrays)
+
+        self._build_csr(np.asarray(arrays["edge_source"], dtype=np.int32),
+                        np.asarray(arrays["edge_target"], dtype=np.int32),
+                        np.arange(len(self._edge_rel), dtype=np.int64))
+        self.version = meta["version"]
+        self.author_index.load_dict(meta["authors"])
+
+    def _load_sample_data(self):
+        """Load the same sample data as the networkx backend"""
+        from app.models.knowledge_graph import KnowledgeGraph
+        self.load_networkx(KnowledgeGraph(author_index=self.author_index).graph)
+
+    def load_networkx(self, graph):
+        """
+        Import all nodes and edges of a networkx graph
+
+        Args:
+            graph (nx.DiGraph): Graph in the KnowledgeGraph attribute layout
+        """
+        for node_id, data in graph.nodes(data=True):
+            self._node(node_id, data.get("type", "unknown"), data.get("title"), data.get("size"))
+        for source, target, data in graph.edges(data=True):
+            edge = self._set_edge(self._ids[source], self._ids[target],
+                                  data.get("relationship", ""), data.get("weight", 1),
+                                  data.get("timestamp"))
+            if data.get("stats") is not None:
+                self._merge_stats(edge, data["stats"])
+
+    # Node table
+
+    def _node(self, node_id, node_type, title=None, size=None):
+        """Get the index of a node, creating it if new; the size defaults to the type's"""
+        node = self._ids.get(node_id)
+        if node is None:
+            node = len(self._names)
+            self._ids[node_id] = node
+            self._names.append(node_id)
+            self._types.append(self._node_types.encode(node_type))
+            self._sizes.append(NODE_STYLES.get(node_type, DEFAULT_NODE_STYLE)[0] if size is None else size)
+            self._titles.append(self._title_pool.encode(title) if title is not None else -1)
+        return node
+
+    def has_node(self, node_id):
+        return node_id in self._ids
+
+    def _node_data(self, node):
+        node_type = self._node_types.values[self._types[node]]
+        color = NODE_STYLES.get(node_type, DEFAULT_NODE_STYLE)[1]
+        data = {"type": node_type, "size": self._sizes[node], "color": color}
+        if self._titles[node] >= 0:
+            data["title"] = self._title_pool.values[self._titles[node]]
+        return data
+
+    # Edge storage
+
+    def _find_edge(self, u, v):
+        """ID of edge (u, v), or None"""
+        edge = self._pending.get((u, v))
+        if edge is not None or u + 1 >= len(self._indptr):
+            return edge
+        lo, hi = self._indptr[u], self._indptr[u + 1]
+        i = lo + np.searchsorted(self._indices[lo:hi], v)
+        if i < hi and self._indices[i] == v:
+            return int(self._eids[i])
+        return None
+
+    def has_edge(self, source, target):
+        u, v = self._ids.get(source), self._ids.get(target)
+        return u is not None and v is not None and self._find_edge(u, v) is not None
+
+    def _set_timestamp(self, edge, timestamp):
+        self._edge_ts[edge], raw = encode_timestamp(timestamp)
+        if raw is None:
+            self._raw_timestamps.pop(edge, None)
+        else:
+            self._raw_timestamps[edge] = raw
+
+    def _set_edge(self, u, v, relationship, weight, timestamp=None, replace=True):
+        """
+        Insert edge (u, v), or overwrite its attributes when replace is set
+
+        Returns:
+            int: The edge ID
+        """
+        edge = self._find_edge(u, v)
+        if edge is None:
+            edge = len(self._edge_rel)
+            self._edge_rel.append(0)
+            self._edge_weight.append(0)
+            self._edge_ts.append(-1)
+            self._stats_count.append(0)
+            self._stats_first.append(math.nan)
+            self._stats_last.append(math.nan)
+            self._stats_contribution.append(0.0)
+            self._stats_head.append(-1)
+            self._pending[(u, v)] = edge
+            self._pending_out[u].append(v)
+            self._pending_in[v].append(u)
+        elif not replace:
+            return edge
+
+        self._edge_rel[edge] = self._relationships.encode(relationship)
+        self._edge_weight[edge] = weight
+        self._set_timestamp(edge, timestamp)
+
+        if len(self._pending) >= max(self.MIN_PENDING_EDGES, len(self._indices) // 8):
+            self._merge_pending()
+        return edge
+
+    def _merge_pending(self):
+        """Rebuild the CSR arrays with the pending edges merged in"""
+        if not self._pending:
+            return
+        sources = np.repeat(np.arange(len(self._indptr) - 1, dtype=np.int32), np.diff(self._indptr))
+
+        keys = list(self._pending)
+        sources = np.concatenate([sources, np.fromiter((u for u, _ in keys), np.int32, len(keys))])
+        targets = np.concatenate([self._indices, np.fromiter((v for _, v in keys), np.int32, len(keys))])
+        eids = np.concatenate([self._eids, np.fromiter(self._pending.values(), np.int64, len(keys))])
+        self._build_csr(sources, targets, eids)
+
+        self._pending = {}
+        self._pending_out = defaultdict(list)
+        self._pending_in = defaultdict(list)
+
+    def _build_csr(self, sources, targets, eids):
+        """Build the forward and reverse CSR arrays from an edge list"""
+        n_nodes = len(self._names)
+        order = np.lexsort((targets, sources))
+        sources, self._indices, self._eids = sources[order], targets[order], eids[order]
+        self._indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=self._indptr[1:])
+
+        reverse = np.argsort(self._indices, kind='stable')
+        self._rindices, self._reids = sources[reverse], self._eids[reverse]
+        self._rindptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._indices, minlength=n_nodes), out=self._rindptr[1:])
+
+    # Edge statistics
+
+    def _add_day(self, edge, day, count):
+        slot = self._stats_head[edge]
+        # Citations mostly arrive in time order, so the head is usually the day
+        while slot >= 0 and self._day[slot] != day:
+            slot = self._day_next[slot]
+        if slot >= 0:
+            self._day_count[slot] += count
+            return
+        self._day.append(day)
+        self._day_count.append(count)
+        self._day_next.append(self._stats_head[edge])
+        self._stats_head[edge] = len(self._day) - 1
+
+    def _add_event(self, edge, epoch, contribution):
+        """Fold one citation into an edge's statistics, as EdgeAggregate.add"""
+        self._stats_count[edge] += 1
+        self._stats_contribution[edge] += contribution
+        if epoch is None:
+            return
+        # NaN (no timestamp yet) fails both comparisons
+        if not self._stats_first[edge] <= epoch:
+            self._stats_first[edge] = epoch
+        if not self._stats_last[edge] >= epoch:
+            self._stats_last[edge] = epoch
+        self._add_day(edge, int(epoch // 86400), 1)
+
+    def _merge_stats(self, edge, stats):
+        """Fold an EdgeAggregate into an edge's statistics"""
+        self._stats_count[edge] += stats.count
+        self._stats_contribution[edge] += stats.contribution_sum
+        if stats.first is not None and not self._stats_first[edge] <= stats.first:
+            self._stats_first[edge] = stats.first
+        if stats.last is not None and not self._stats_last[edge] >= stats.last:
+            self._stats_last[edge] = stats.last
+        for day, count in sorted(stats.days.items()):
+            self._add_day(edge, day, count)
+
+    def _edge_days(self, edge):
+        """(day, count) pairs of an edge, in day order"""
+        days = []
+        slot = self._stats_head[edge]
+        while slot >= 0:
+            days.append((self._day[slot], self._day_count[slot]))
+            slot = self._day_next[slot]
+        return sorted(days)
+
+    def _edge_aggregate(self, edge):
+        """EdgeAggregate view of an edge's statistics, for formatting"""
+        stats = EdgeAggregate()
+        stats.count = self._stats_count[edge]
+        stats.contribution_sum = self._stats_contribution[edge]
+        first, last = self._stats_first[edge], self._stats_last[edge]
+        stats.first = None if math.isnan(first) else first
+        stats.last = None if math.isnan(last) else last
+        stats.days = dict(self._edge_days(edge))
+        return stats
+
+    def _pack_stats(self):
+        """Statistics of the edges with citations in the snapshot layout of pack_edge_stats"""
+        edges = np.flatnonzero(np.frombuffer(self._stats_count, dtype=np.int64))
+        days, counts = [], []
+        offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+        for i, edge in enumerate(edges.tolist()):
+            for day, count in self._edge_days(edge):
+                days.append(day)
+                counts.append(count)
+            offsets[i + 1] = len(days)
+        return {
+            'stats_edge': edges.astype(np.int64),
+            'stats_count': np.frombuffer(self._stats_count, dtype=np.int64)[edges],
+            'stats_first': np.frombuffer(self._stats_first, dtype=np.float64)[edges],
+            'stats_last': np.frombuffer(self._stats_last, dtype=np.float64)[edges],
+            'stats_contribution': np.frombuffer(self._stats_contribution, dtype=np.float64)[edges],
+            'stats_hist_offsets': offsets,
+            'stats_hist_day': np.array(days, dtype=np.int32),
+            'stats_hist_count': np.array(counts, dtype=np.int32)
+        }
+
+    def _unpack_stats(self, arrays):
+        """Fill the statistics columns from a snapshot's stats arrays"""
+        n_edges = len(self._edge_rel)
+        edges = np.asarray(arrays['stats_edge'], dtype=np.int64)
+        columns = {}
+        for name, key, fill in (('count', 'stats_count', 0), ('first', 'stats_first', np.nan),
+                                ('last', 'stats_last', np.nan), ('contribution', 'stats_contribution', 0.0)):
+            column = np.full(n_edges, fill, dtype=np.int64 if name == 'count' else np.float64)
+            column[edges] = arrays[key]
+            columns[name] = column
+        self._stats_count = array('q', columns['count'].tobytes())
+        self._stats_first = array('d', columns['first'].tobytes())
+        self._stats_last = array('d', columns['last'].tobytes())
+        self._stats_contribution = array('d', columns['contribution'].tobytes())
+        self._stats_head = array('q', np.full(n_edges, -1, dtype=np.int64).tobytes())
+
+        offsets = arrays['stats_hist_offsets'].tolist()
+        days = arrays['stats_hist_day'].tolist()
+        counts = arrays['stats_hist_count'].tolist()
+        for i, edge in enumerate(edges.tolist()):
+            for day, count in zip(days[offsets[i]:offsets[i + 1]], counts[offsets[i]:offsets[i + 1]]):
+                self._add_day(edge, day, count)
+
+    def _out_edges(self, u):
+        """(target, edge ID) pairs of the out-edges of u"""
+        if u + 1 < len(self._indptr):
+            lo, hi = int(self._indptr[u]), int(self._indptr[u + 1])
+            yield from zip(self._indices[lo:hi].tolist(), self._eids[lo:hi].tolist())
+        for v in self._pending_out.get(u, ()):
+            yield v, self._pending[(u, v)]
+
+    def _in_edges(self, v):
+        """(source, edge ID) pairs of the in-edges of v"""
+        if v + 1 < len(self._rindptr):
+            lo, hi = int(self._rindptr[v]), int(self._rindptr[v + 1])
+            yield from zip(self._rindices[lo:hi].tolist(), self._reids[lo:hi].tolist())
+        for u in self._pending_in.get(v, ()):
+            yield u, self._pending[(u, v)]
+
+    def _degrees(self):
+        degrees = np.zeros(len(self._names), dtype=np.int64)
+        n = len(self._indptr) - 1
+        degrees[:n] += np.diff(self._indptr) + np.diff(self._rindptr)
+        for u, v in self._pending:
+            degrees[u] += 1
+            degrees[v] += 1
+        return degrees
+
+    def _edge_info(self, edge):
+        """(relationship, weight, timestamp) of an edge"""
+        timestamp = decode_timestamp(self._edge_ts[edge], self._raw_timestamps.get(edge))
+        weight = float(self._edge_weight[edge])
+        if weight.is_integer():
+            weight = int(weight)
+        return self._relationships.values[self._edge_rel[edge]], weight, timestamp
+
+    def _iter_edges(self):
+        for u in range(len(self._names)):
+            for v, edge in self._out_edges(u):
+                yield u, v, edge
+
+    @property
+    def succ(self):
+        return _Adjacency(self, incoming=False)
+
+    @property
+    def pred(self):
+        return _Adjacency(self, incoming=True)
+
+    # Public API, mirroring KnowledgeGraph
+
+    def add_citation(self, citation_data):
+        """
+        Add a citation to the knowledge graph
+
+        Args:
+            citation_data (dict): Citation metadata
+                Required keys: doi, ai_model
+                Optional keys: source_title, authors, timestamp
+        """
+        record = graph_record(citation_data, citation_data.get("timestamp", datetime.utcnow().isoformat()))
+        self.storage.append(record)
+        self._add_citation(record)
+
+        if self.storage.snapshot_due():
+            self._request_snapshot()
+
+    def _add_citation(self, citation_data):
+        """Apply one citation record to the graph"""
+        doi = citation_data.get("doi")
+        ai_model = citation_data.get("ai_model")
+        authors = self.author_index.resolve_all(citation_data.get("authors", ""))
+        timestamp = citation_data["timestamp"]
+
+        self.version += 1
+        source = self._node(doi, citation_data.get("source_type", "paper"),
+                            citation_data.get("source_title", "Unknown"))
+        model = self._node(ai_model, "ai_model")
+
+        # One CITES edge per model and source, aggregating all its citations
+        edge = self._set_edge(model, source, "CITES", 0, timestamp)
+        self._add_event(edge, *citation_event(citation_data, timestamp))
+        self._edge_weight[edge] = self._stats_count[edge]
+
+        for author in authors:
+            self._set_edge(self._node(author, "author"), source, "AUTHORED", 1, replace=False)
+
+    def add_citations_bulk(self, citations):
+        """Add a batch of citations to the knowledge graph"""
+        now = datetime.utcnow().isoformat()
+        records = [graph_record(c, c.get("timestamp", now)) for c in citations]
+        self.storage.append_many(records)
+        for record in records:
+            self._add_citation(record)
+
+        if self.storage.snapshot_due():
+            self._request_snapshot()
+
+    def get_version(self):
+        """Get the change counter of the graph"""
+        return self.version
+
+    def get_weighted_adjacency(self):
+        """Snapshot of the graph structure, as KnowledgeGraph.get_weighted_adjacency"""
+        self._merge_pending()
+        sources = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        types = self._node_types.values
+        return {
+            "version": self.version,
+            "nodes": list(self._names),
+            "types": [types[code] for code in self._types],
+            "sources": sources,
+            "targets": self._indices.astype(np.int64),
+            "weights": np.frombuffer(self._edge_weight, dtype=np.float32)[self._eids].astype(np.float64)
+        }
+
+    def _format_node(self, node):
+        data = self._node_data(node)
+        node_id = self._names[node]
+        return {
+            "id": node_id,
+            "label": data.get("title", node_id),
+            "type": data["type"],
+            "size": data["size"],
+            "color": data["color"]
+        }
+
+    def _format_edge(self, u, v, edge):
+        relationship, weight, _ = self._edge_info(edge)
+        return {
+            "source": self._names[u],
+            "target": self._names[v],
+            "label": relationship,
+            "weight": weight
+        }
+
+    def _subgraph_data(self, nodes):
+        nodes = list(nodes)
+        members = set(nodes)
+        return {
+            "nodes": [self._format_node(node) for node in nodes],
+            "edges": [self._format_edge(u, v, edge)
+                      for u in nodes for v, edge in self._out_edges(u) if v in members]
+        }
+
+    def get_visualization_data(self):
+        """Get graph data for visualization"""
+        return {
+            "nodes": [self._format_node(node) for node in range(len(self._names))],
+            "edges": [self._format_edge(u, v, edge) for u, v, edge in self._iter_edges()]
+        }
+
+    def get_entity_connections(self, entity_id):
+        """
+        Get all connections for a specific entity
+
+        Args:
+            entity_id (str): Node ID in the graph
+
+        Returns:
+            dict: Direct connections to the entity
+        """
+        node = self._ids.get(entity_id)
+        if node is None:
+            return {"error": "Entity not found"}
+
+        def connection(other, edge):
+            relationship, _, timestamp = self._edge_info(edge)
+            data = self._node_data(other)
+            connection = {
+                "id": self._names[other],
+                "label": data.get("title", self._names[other]),
+                "type": data["type"],
+                "relationship": relationship,
+                "timestamp": timestamp
+            }
+            if self._stats_count[edge]:
+                connection["citations"] = self._edge_aggregate(edge).to_dict()
+            return connection
+
+        return {
+            "entity": {
+                "id": entity_id,
+                "data": self._node_data(node)
+            },
+            "incoming": [connection(u, edge) for u, edge in self._in_edges(node)],
+            "outgoing": [connection(v, edge) for v, edge in self._out_edges(node)]
+        }
+
+    def get_edge_stats(self, source_id, target_id):
+        """Get the aggregated citation statistics of one edge, as KnowledgeGraph.get_edge_stats"""
+        u, v = self._ids.get(source_id), self._ids.get(target_id)
+        edge = self._find_edge(u, v) if u is not None and v is not None else None
+        if edge is None:
+            return {"error": "Edge not found"}
+
+        relationship, weight, _ = self._edge_info(edge)
+        stats = self._edge_aggregate(edge) if self._stats_count[edge] else None
+        return {
+            "source": source_id,
+            "target": target_id,
+            "relationship": relationship,
+            "weight": weight,
+            "citations": stats.to_dict(histogram=True) if stats is not None else None
+        }
+
+    def get_citation_path(self, source_id, target_id, max_depth=3, max_paths=10,
+                          relationships=None, time_budget=1.0):
+        """Find citation paths between two entities, as KnowledgeGraph.get_citation_path"""
+        return self.find_paths(source_id, target_id, max_depth=max_depth, max_paths=max_paths,
+                               relationships=relationships, time_budget=time_budget)["paths"]
+
+    def find_paths(self, source_id, target_id, max_depth=3, max_paths=10,
+                   relationships=None, time_budget=1.0):
+        """Find citation paths between two entities, reporting truncation"""
+        if not (self.has_node(source_id) and self.has_node(target_id)):
+            return {"paths": [], "truncated": False}
+
+        paths, truncated = PathQueryEngine(self).k_shortest_paths(
+            source_id, target_id, k=max_paths, relationships=relationships,
+            max_depth=max_depth, time_budget=time_budget)
+
+        formatted_paths = []
+        for path in paths:
+            path_info = []
+            for source, target in zip(path, path[1:]):
+                u, v = self._ids[source], self._ids[target]
+                relationship, _, timestamp = self._edge_info(self._find_edge(u, v))
+                path_info.append({
+                    "source": source,
+                    "source_type": self._node_data(u)["type"],
+                    "target": target,
+                    "target_type": self._node_data(v)["type"],
+                    "relationship": relationship,
+                    "timestamp": timestamp
+                })
+            formatted_paths.append(path_info)
+
+        return {"paths": formatted_paths, "truncated": truncated}
+
+    def get_ego_network(self, node_id, depth=1, max_nodes=500):
+        """Get the neighbourhood of a node, as KnowledgeGraph.get_ego_network"""
+        center = self._ids.get(node_id)
+        if center is None:
+            return {"error": "Entity not found"}
+
+        visited = {center: 0}
+        frontier = [center]
+        truncated = False
+        for level in range(1, depth + 1):
+            next_level = []
+            for node in frontier:
+                for neighbor, _ in itertools.chain(self._out_edges(node), self._in_edges(node)):
+                    if neighbor in visited:
+                        continue
+                    if len(visited) >= max_nodes:
+                        truncated = True
+                        break
+                    visited[neighbor] = level
+                    next_level.append(neighbor)
+                if truncated:
+                    break
+            if truncated or not next_level:
+                break
+            frontier = next_level
+
+        data = self._subgraph_data(visited)
+        for node in data["nodes"]:
+            node["depth"] = visited[self._ids[node["id"]]]
+        data["truncated"] = truncated
+        return data
+
+    def get_top_nodes(self, n=100, scores=None, node_type=None):
+        """Get the n most important nodes, as KnowledgeGraph.get_top_nodes"""
+        type_code = self._node_types.lookup(node_type) if node_type else None
+        if scores is None:
+            degrees = self._degrees()
+            if type_code is not None:
+                degrees = np.where(np.frombuffer(self._types, dtype=np.int8) == type_code, degrees, -1)
+            n = min(n, int((degrees >= 0).sum()))
+            top_nodes = np.argsort(-degrees, kind='stable')[:n]
+            top = [(int(node), int(degrees[node])) for node in top_nodes]
+        else:
+            candidates = ((self._ids[node_id], score) for node_id, score in scores.items()
+                          if node_id in self._ids)
+            if type_code is not None:
+                candidates = ((node, score) for node, score in candidates if self._types[node] == type_code)
+            top = heapq.nlargest(n, candidates, key=lambda item: item[1])
+
+        data = self._subgraph_data(node for node, _ in top)
+        for node, (_, score) in zip(data["nodes"], top):
+            node["score"] = score
+        return data
+
+    def get_overview(self):
+        """Get a low-zoom overview with one super-node per entity type"""
+        types = np.frombuffer(self._types, dtype=np.int8).astype(np.int64)
+        type_counts = np.bincount(types, minlength=len(self._node_types))
+
+        edge_counts = Counter()
+        for u, v, edge in self._iter_edges():
+            edge_counts[(self._types[u], self._types[v], self._edge_rel[edge])] += 1
+
+        names = self._node_types.values
+        return {
+            "nodes": [{
+                "id": f"type:{names[code]}",
+                "label": f"{names[code]} ({count})",
+                "type": names[code],
+                "count": int(count),
+                "size": 5 + math.log2(count + 1) * 3,
+                "color": NODE_STYLES.get(names[code], DEFAULT_NODE_STYLE)[1]
+            } for code, count in enumerate(type_counts) if count],
+            "edges": [{
+                "source": f"type:{names[u]}",
+                "target": f"type:{names[v]}",
+                "label": self._relationships.values[rel],
+                "weight": count
+            } for (u, v, rel), count in edge_counts.items()]
+        }
+
+    def get_nodes_page(self, offset=0, limit=100, node_type=None):
+        """Get one page of the node listing"""
+        if node_type:
+            code = self._node_types.lookup(node_type)
+            nodes = np.flatnonzero(np.frombuffer(self._types, dtype=np.int8) == code)
+            total = len(nodes)
+            page = nodes[offset:offset + limit]
+        else:
+            total = len(self._names)
+            page = range(offset, min(offset + limit, total))
+        return {"nodes": [self._format_node(int(node)) for node in page], "offset": offset, "total": total}
+
+    def get_edges_page(self, offset=0, limit=100):
+        """Get one page of the edge listing"""
+        page = [self._format_edge(u, v, edge)
+                for u, v, edge in itertools.islice(self._iter_edges(), offset, offset + limit)]
+        return {"edges": page, "offset": offset, "total": len(self._edge_rel)}
@@ -0,0 +1,220 @@
+import logging
+import math
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _isoformat(epoch):
+    # Naive UTC, like the timestamps add_citation fills in
+    return datetime.utcfromtimestamp(epoch).isoformat()
+
+
+class CreditAccumulator:
+    """Credit of one DOI from one model within one window"""
+
+    __slots__ = ('source', 'credit_sum', 'count')
+
+    def __init__(self, source):
+        self.source = source
+        self.credit_sum = 0.0
+        self.count = 0
+
+
+class CreditPipeline:
+    """
+    Windowed aggregation of per-prediction attribution credit into citations
+
+    Each explained prediction (one row of attributions) hands out one unit
+    of credit, split over its features in proportion to their |attribution|
+    and passed on to the features' source DOIs. Credit is accumulated per
+    (DOI, model, method) over tumbling windows of `window` seconds; once a
+    window has closed, every DOI it credited is logged as one citation to
+    the registry and graph with a single bulk call each. The citation
+    carries the window's credit sum, row count and mean, and the mean as
+    its contribution_score. Ingest load is thus bounded by the number of
+    credited DOIs per window, however many predictions are explained, while
+    the credit_sum fields still add up to the number of credited rows.
+
+    Closed windows are flushed when new rows arrive and by a background
+    thread; close() flushes the open one too. When logging to the registry
+    fails, the windows are put back and retried on the next flush; when
+    only the graph fails, its citations are kept and retried on their own,
+    so the registry never sees a window twice.
+    """
+
+    def __init__(self, registry=None, graph=None, window=60.0, lock=None):
+        """
+        Args:
+            registry (CitationRegistry, optional): Where citations are logged
+            graph (KnowledgeGraph, optional): Where citations are logged
+            window (float): Window length in seconds
+            lock (threading.RLock, optional): Lock other writers hold while
+                logging to both the registry and graph; held likewise, so
+                their logs see citations in the same order
+        """
+        self.registry = registry
+        self.graph = graph
+        self.window = window
+        self._ingest_lock = lock or nullcontext()
+        # Window start -> {(doi, ai_model, method): CreditAccumulator}
+        self._windows = {}
+        # Citations logged to the registry but not yet to the graph
+        self._graph_pending = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def add(self, ai_model, source_map, values, method='shap', now=None):
+        """
+        Credit a batch of explained predictions to the current window
+
+        Args:
+            ai_model (str): ID of the model that made the predictions
+            source_map (SourceMap): Feature x DOI weights of the dataset
+            values (np.ndarray): rows x features attributions
+            method (str): Explanation method the attributions come from
+            now (float, optional): Epoch seconds of the predictions
+
+        Returns:
+            int: Rows credited; rows whose attributions are all zero carry
+                no credit
+        """
+        now = time.time() if now is None else now
+        magnitude = np.abs(np.asarray(values, dtype=np.float64))
+        totals = magnitude.sum(axis=1, keepdims=True)
+        credited = totals[:, 0] > 0
+        shares = np.divide(magnitude[credited], totals[credited])
+        # Credit is linear in the shares, so the rows are summed before the
+        # one sparse product that maps them to the sources
+        credit = source_map.credit(shares.sum(axis=0))
+
+        start = math.floor(now / self.window) * self.window
+        rows = int(credited.sum())
+        with self._lock:
+            window = self._windows.setdefault(start, {})
+            for doi, title, doi_credit in zip(source_map.dois, source_map.titles, credit.tolist()):
+                if doi_credit <= 0:
+                    # None of the DOI's features had any attribution
+                    continue
+                accumulator = window.get((doi, ai_model, method))
+                if accumulator is None:
+                    accumulator = window[(doi, ai_model, method)] = CreditAccumulator(title)
+                accumulator.credit_sum += doi_credit
+                accumulator.count += rows
+        self._start_flusher()
+        self._flush_logged(now)
+        return rows
+
+    def flush(self, now=None, force=False):
+        """
+        Log the citations of closed windows
+
+        Args:
+            now (float, optional): Epoch seconds, defaults to the current time
+            force (bool): Also log the window still open
+
+        Returns:
+            int: Citations logged
+        """
+        now = time.time() if now is None else now
+        with self._ingest_lock:
+            self._flush_graph()
+        with self._lock:
+            closed = sorted(start for start in self._windows if force or start + self.window <= now)
+            windows = [(start, self._windows.pop(start)) for start in closed]
+        if not windows:
+            return 0
+
+        batch = []
+        for start, window in windows:
+            end = min(start + self.window, now)
+            for (doi, ai_model, method), accumulator in window.items():
+                if not accumulator.count or accumulator.credit_sum <= 0:
+                    continue
+                mean = accumulator.credit_sum / accumulator.count
+                batch.append({
+                    'doi': doi,
+                    'source_title': accumulator.source,
+                    'source_type': 'dataset',
+                    'ai_model': ai_model,
+                    'contribution_score': round(mean, 6),
+                    'credit_sum': round(accumulator.credit_sum, 6),
+                    'credit_mean': round(mean, 6),
+                    'credit_count': accumulator.count,
+                    'window_start': _isoformat(start),
+                    'window_end': _isoformat(end),
+                    'context': f'{method.upper()} credit aggregated over {accumulator.count} predictions',
+                    'timestamp': _isoformat(end)
+                })
+        if not batch:
+            return 0
+        with self._ingest_lock:
+            if self.registry is not None:
+                try:
+                    self.registry.add_citations_bulk([dict(citation) for citation in batch])
+                except Exception:
+                    self._requeue(windows)
+                    raise
+            if self.graph is not None:
+                with self._lock:
+                    self._graph_pending.extend(batch)
+                self._flush_graph()
+        return len(batch)
+
+    def _requeue(self, windows):
+        """Put windows that could not be logged back, merged with any credit added since"""
+        with self._lock:
+            for start, window in windows:
+                current = self._windows.setdefault(start, {})
+                for key, accumulator in window.items():
+                    merged = current.get(key)
+                    if merged is None:
+                        current[key] = accumulator
+                    else:
+                        merged.credit_sum += accumulator.credit_sum
+                        merged.count += accumulator.count
+
+    def _flush_graph(self):
+        """Log the citations still owed to the graph"""
+        if self.graph is None:
+            return
+        with self._lock:
+            batch, self._graph_pending = self._graph_pending, []
+        if not batch:
+            return
+        try:
+            self.graph.add_citations_bulk([dict(citation) for citation in batch])
+        except Exception:
+            with self._lock:
+                self._graph_pending[:0] = batch
+            raise
+
+    def _flush_logged(self, now=None, force=False):
+        """flush(), logging a failure instead of raising; the credit is kept for a retry"""
+        try:
+            return self.flush(now, force)
+        except Exception:
+            logger.exception('Logging aggregated credit failed; it will be retried on the next flush')
+            return 0
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None or self._stop.is_set():
+                return
+            self._flusher = threading.Thread(target=self._run, name='aicif-credit', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        # Wake up about once per window, so a closed window waits at most that long
+        while not self._stop.wait(self.window):
+            self._flush_logged()
+
+    def close(self):
+        """Stop the background flusher and log everything still pending"""
+        self._stop.set()
+        self._flush_logged(force=True)
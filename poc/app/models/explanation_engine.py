@@ -0,0 +1,343 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import shap
+from lime.lime_tabular import LimeTabularExplainer
+
+# Estimators TreeExplainer computes exact SHAP values for
+TREE_MODELS = frozenset({
+    'DecisionTreeClassifier', 'DecisionTreeRegressor',
+    'ExtraTreeClassifier', 'ExtraTreeRegressor',
+    'ExtraTreesClassifier', 'ExtraTreesRegressor',
+    'RandomForestClassifier', 'RandomForestRegressor',
+    'GradientBoostingClassifier', 'GradientBoostingRegressor'
+})
+
+
+def input_hash(data):
+    """Content hash of a feature matrix, including its shape and dtype"""
+    data = np.ascontiguousarray(data)
+    digest = hashlib.sha1(f'{data.shape}:{data.dtype.str}'.encode())
+    digest.update(data.tobytes())
+    return digest.hexdigest()
+
+
+class Explanation:
+    """
+    Per-row feature attributions of one model on one input matrix
+
+    Attributes:
+        values (np.ndarray): rows x features attribution matrix; for
+            classifiers, attributions of each row's predicted class
+        base_value (float): Expected model output the attributions start from
+        method (str): One of ExplanationEngine.METHODS
+        interval (np.ndarray): For approximate methods, the half-width of
+            the 95% confidence interval of each feature's mean |attribution|
+        details (dict): For approximate methods, how the estimate was made
+    """
+
+    __slots__ = ('values', 'base_value', 'method', 'interval', 'details')
+
+    def __init__(self, values, base_value, method, interval=None, details=None):
+        self.values = values
+        self.base_value = base_value
+        self.method = method
+        self.interval = interval
+        self.details = details
+
+    def mean_abs(self):
+        """Global importance of each feature: mean |attribution| over rows"""
+        return np.abs(self.values).mean(axis=0) if len(self.values) else np.zeros(self.values.shape[1])
+
+
+class ExplanationEngine:
+    """
+    Batched SHAP and LIME explanations of scikit-learn models
+
+    SHAP uses TreeExplainer for tree ensembles and KernelExplainer for
+    everything else, with the background data summarized by k-means so
+    that the cost of each kernel evaluation does not grow with the
+    dataset. LIME fits one local surrogate per row. Rows are explained in
+    batches of batch_size. Results are cached in an LRU keyed by (model
+    version, dataset version, method, input hash), so repeating an
+    analysis of the same rows costs nothing.
+
+    'permutation' is a fast approximation of SHAP for interactive use: it
+    explains an even subsample of at most approximate_rows rows against a
+    smaller k-means background, estimating Shapley values from antithetic
+    pairs of random feature orderings. Pairs are added until the 95%
+    confidence interval of every feature's mean |attribution| is within
+    tolerance of the total importance, max_permutations is reached or
+    time_budget runs out; the explanation reports the intervals and
+    whether the estimate converged.
+    """
+
+    METHODS = ('shap', 'lime', 'permutation')
+
+    # Model inputs evaluated per predict call by the permutation method
+    PERMUTATION_SAMPLES = 2 ** 22
+
+    def __init__(self, batch_size=256, background_size=20, lime_samples=500, cache_size=64,
+                 approximate_rows=32, approximate_background=10, max_permutations=64,
+                 tolerance=0.02, time_budget=0.5):
+        """
+        Args:
+            batch_size (int): Rows explained per explainer call
+            background_size (int): k-means centroids summarizing the
+                KernelExplainer background
+            lime_samples (int): Perturbed samples per LIME explanation
+            cache_size (int): Explanations kept in the LRU cache
+            approximate_rows (int): Rows the permutation method explains at most
+            approximate_background (int): k-means centroids of its background
+            max_permutations (int): Feature orderings it samples at most
+            tolerance (float): Confidence interval half-width, relative to
+                the total importance, at which it stops sampling
+            time_budget (float): Seconds after which it stops sampling
+        """
+        self.batch_size = batch_size
+        self.background_size = background_size
+        self.lime_samples = lime_samples
+        self.cache_size = cache_size
+        self.approximate_rows = approximate_rows
+        self.approximate_background = approximate_background
+        self.max_permutations = max_permutations
+        self.tolerance = tolerance
+        self.time_budget = time_budget
+        self._cache = OrderedDict()
+        self._backgrounds = {}
+        self._lock = threading.Lock()
+
+    def explain(self, model, data, method, background, model_version, dataset_version):
+        """
+        Explain a model's predictions on some rows
+
+        Args:
+            model (dict): 'estimator' (fitted scikit-learn model) and 'type'
+                ('regression' or 'classification')
+            data (np.ndarray): rows x features matrix to explain
+            method (str): One of METHODS
+            background (np.ndarray): Representative rows of the dataset,
+                used to summarize the SHAP background and fit LIME's sampler
+            model_version (tuple): Identifies the fitted model, e.g. (id, version)
+            dataset_version (tuple): Identifies the dataset, e.g. (id, version)
+
+        Returns:
+            Explanation: Attributions of every row
+
+        Raises:
+            ValueError: For an unsupported method
+        """
+        method = self.check_method(method)
+        data = np.asarray(data, dtype=np.float64)
+        key = self.cache_key(model_version, dataset_version, method, data)
+        explanation = self.cached(key)
+        if explanation is not None:
+            return explanation
+
+        if method == 'shap':
+            explanation = self._shap(model, data, background, dataset_version)
+        elif method == 'permutation':
+            explanation = self._permutation_shap(model, data, background, dataset_version)
+        else:
+            explanation = self._lime(model, data, background)
+
+        self.store(key, explanation)
+        return explanation
+
+    def check_method(self, method):
+        """
+        Normalize an explanation method name
+
+        Raises:
+            ValueError: For an unsupported method
+        """
+        method = method.lower()
+        if method not in self.METHODS:
+            raise ValueError(f'Unsupported explanation method: {method}')
+        return method
+
+    def options(self):
+        """Constructor arguments, to build an equivalent engine in a worker process"""
+        return {
+            'batch_size': self.batch_size,
+            'background_size': self.background_size,
+            'lime_samples': self.lime_samples,
+            'cache_size': self.cache_size,
+            'approximate_rows': self.approximate_rows,
+            'approximate_background': self.approximate_background,
+            'max_permutations': self.max_permutations,
+            'tolerance': self.tolerance,
+            'time_budget': self.time_budget
+        }
+
+    @staticmethod
+    def cache_key(model_version, dataset_version, method, data):
+        return model_version, dataset_version, method, input_hash(data)
+
+    def cached(self, key):
+        """Cached explanation for a cache_key, or None"""
+        with self._lock:
+            explanation = self._cache.get(key)
+            if explanation is not None:
+                self._cache.move_to_end(key)
+            return explanation
+
+    def store(self, key, explanation):
+        """Add an explanation computed elsewhere (e.g. in worker processes) to the cache"""
+        with self._lock:
+            self._cache[key] = explanation
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _predict_fn(self, model):
+        estimator = model['estimator']
+        return estimator.predict_proba if model['type'] == 'classification' else estimator.predict
+
+    def _summarized_background(self, background, dataset_version, size=None):
+        """k-means summary of a dataset's background rows, computed once per dataset version and size"""
+        k = min(size or self.background_size, len(background))
+        summary = self._backgrounds.get((dataset_version, k))
+        if summary is None:
+            summary = self._backgrounds[(dataset_version, k)] = shap.kmeans(background, k)
+        return summary
+
+    def _shap(self, model, data, background, dataset_version):
+        estimator = model['estimator']
+        if type(estimator).__name__ in TREE_MODELS:
+            explainer = shap.TreeExplainer(estimator)
+            explain_batch = explainer.shap_values
+        else:
+            explainer = shap.KernelExplainer(self._predict_fn(model),
+                                             self._summarized_background(background, dataset_version))
+            explain_batch = lambda batch: explainer.shap_values(batch, silent=True)
+
+        batches = [self._select_class(model, batch, explain_batch(batch), explainer.expected_value)
+                   for batch in self._batches(data)]
+        values = np.vstack([values for values, _ in batches]) if batches else np.zeros((0, data.shape[1]))
+        base_value = float(np.mean([base for _, base in batches])) if batches else 0.0
+        return Explanation(values, base_value, 'shap')
+
+    def _select_class(self, model, batch, values, expected_value):
+        """
+        Reduce multi-output SHAP values to each row's predicted class
+
+        Returns:
+            tuple: (rows x features values, mean base value of the batch)
+        """
+        if isinstance(values, list):
+            # Older shap releases return one matrix per class
+            values = np.stack(values, axis=-1)
+        values = np.asarray(values, dtype=np.float64)
+        expected_value = np.atleast_1d(np.asarray(expected_value, dtype=np.float64))
+        if values.ndim == 2:
+            return values, float(expected_value[0])
+
+        classes = np.argmax(model['estimator'].predict_proba(batch), axis=1)
+        rows = np.arange(len(batch))
+        return values[rows, :, classes], float(expected_value[classes].mean())
+
+    def _permutation_shap(self, model, data, background, dataset_version):
+        started = time.monotonic()
+        requested = len(data)
+        rows = data[np.linspace(0, requested - 1, min(requested, self.approximate_rows)).astype(int)]
+        n, n_features = rows.shape
+        if not n:
+            return Explanation(np.zeros((0, n_features)), 0.0, 'permutation')
+
+        summary = self._summarized_background(np.asarray(background, dtype=np.float64), dataset_version,
+                                              self.approximate_background)
+        centroids, weights = summary.data, summary.weights / summary.weights.sum()
+        predict = self._predict_fn(model)
+        classes = np.argmax(predict(rows), axis=1) if model['type'] == 'classification' else None
+        rng = np.random.default_rng(0)
+
+        # Rows evaluated per predict call, so that wide datasets stay within ~32 MB of samples
+        chunk = max(1, self.PERMUTATION_SAMPLES // ((n_features + 1) * len(centroids) * n_features))
+
+        def coalition_values(order):
+            """Expected output as the features in order are switched from background to row values"""
+            values = np.empty((n, n_features + 1))
+            for start in range(0, n, chunk):
+                part = rows[start:start + chunk]
+                # rows x (features + 1) coalitions x centroids samples
+                samples = np.broadcast_to(centroids, (len(part), n_features + 1, len(centroids), n_features)).copy()
+                for position, feature in enumerate(order, 1):
+                    samples[:, position:, :, feature] = part[:, feature, None, None]
+                output = predict(samples.reshape(-1, n_features))
+                if classes is not None:
+                    output = output.reshape(len(part), -1, output.shape[1])
+                    output = np.take_along_axis(output, classes[start:start + chunk, None, None], axis=2)
+                values[start:start + chunk] = output.reshape(len(part), n_features + 1, len(centroids)) @ weights
+            return values
+
+        def marginals(order):
+            values = coalition_values(order)
+            phi = np.empty((n, n_features))
+            phi[:, order] = np.diff(values, axis=1)
+            return phi, values[:, 0]
+
+        # Running sums over antithetic pairs (an ordering and its reverse)
+        total, total_sq, pairs, converged = np.zeros((n, n_features)), np.zeros((n, n_features)), 0, False
+        while True:
+            order = rng.permutation(n_features)
+            forward, base = marginals(order)
+            backward, _ = marginals(order[::-1])
+            pair = (forward + backward) / 2
+            total += pair
+            total_sq += pair ** 2
+            pairs += 1
+
+            # The spread of the estimate needs at least two pairs
+            if pairs >= 2:
+                mean = total / pairs
+                variance = np.maximum(total_sq / pairs - mean ** 2, 0.0) * pairs / (pairs - 1)
+                # Sampling error of each feature's mean |attribution| from the orderings
+                ordering_error = np.sqrt((variance / pairs).mean(axis=0) / n)
+                if 1.96 * ordering_error.max() <= self.tolerance * np.abs(mean).mean(axis=0).sum():
+                    converged = True
+                    break
+                if time.monotonic() - started >= self.time_budget:
+                    break
+            if pairs * 2 >= self.max_permutations:
+                break
+
+        values = total / pairs
+        variance = np.maximum(total_sq / pairs - values ** 2, 0.0) * pairs / max(pairs - 1, 1)
+        # Error from the orderings plus, when rows were subsampled, from the rows
+        row_variance = np.abs(values).var(axis=0, ddof=1) * (1 - n / requested) / n if n > 1 else 0.0
+        interval = 1.96 * np.sqrt((variance / pairs).mean(axis=0) / n + row_variance)
+        details = {
+            'rows': n,
+            'rows_requested': requested,
+            'permutations': pairs * 2,
+            'converged': converged,
+            'seconds': round(time.monotonic() - started, 3)
+        }
+        return Explanation(values, float(base.mean()), 'permutation', interval, details)
+
+    def _lime(self, model, data, background):
+        mode = model['type']
+        explainer = LimeTabularExplainer(np.asarray(background, dtype=np.float64), mode=mode,
+                                         discretize_continuous=True, random_state=0)
+        predict = self._predict_fn(model)
+        n_features = data.shape[1]
+
+        values = np.zeros(data.shape)
+        intercepts = []
+        for start, batch in zip(range(0, len(data), self.batch_size), self._batches(data)):
+            # LIME explains one row at a time; the batch shares one predict call for the labels
+            labels = np.argmax(predict(batch), axis=1) if mode == 'classification' else [1] * len(batch)
+            for offset, (row, label) in enumerate(zip(batch, labels)):
+                explanation = explainer.explain_instance(row, predict, labels=(label,),
+                                                         num_features=n_features,
+                                                         num_samples=self.lime_samples)
+                for feature, weight in explanation.local_exp[label]:
+                    values[start + offset, feature] = weight
+                intercepts.append(explanation.intercept[label])
+        return Explanation(values, float(np.mean(intercepts)) if intercepts else 0.0, 'lime')
+
+    def _batches(self, data):
+        return [data[start:start + self.batch_size] for start in range(0, len(data), self.batch_size)]
@@ -0,0 +1,371 @@
+import json
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+import numpy as np
+from app.models.attribution_store import AttributionSummary
+from app.models.explanation_engine import Explanation, ExplanationEngine
+
+# Job IDs as created by ExplanationJob, checked before they become file names
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Engine of a worker process, kept across tasks so summarized backgrounds are reused
+_engine = None
+
+
+def _explain_chunk(engine_options, model, rows, method, background, model_version, dataset_version):
+    """Process pool task: explain one chunk of rows"""
+    global _engine
+    if _engine is None:
+        _engine = ExplanationEngine(**engine_options)
+    return _engine.explain(model, rows, method, background, model_version, dataset_version)
+
+
+def _isoformat(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat() if epoch is not None else None
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ExplanationJob:
+    """State of one submitted explanation"""
+
+    __slots__ = ('id', 'dataset_id', 'model_id', 'method', 'rows', 'credit', 'cache_key', 'global_summary',
+                 'state', 'submitted_at', 'started_at', 'finished_at',
+                 'chunks', 'chunks_done', 'parts', 'result', 'error')
+
+    def __init__(self, dataset_id, model_id, method, rows, credit):
+        self.id = uuid.uuid4().hex
+        self.dataset_id = dataset_id
+        self.model_id = model_id
+        self.method = method
+        self.rows = rows
+        self.credit = credit
+        self.cache_key = None
+        self.global_summary = False
+        self.state = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.chunks_done = 0
+        self.parts = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        job = {
+            'id': self.id,
+            'state': self.state,
+            'dataset_id': self.dataset_id,
+            'model_id': self.model_id,
+            'method': self.method,
+            'rows': self.rows,
+            'credit': self.credit,
+            'progress': {'chunks_done': self.chunks_done, 'chunks': self.chunks},
+            'submitted_at': _isoformat(self.submitted_at),
+            'started_at': _isoformat(self.started_at),
+            'finished_at': _isoformat(self.finished_at)
+        }
+        if self.state == 'done':
+            job['result'] = self.result
+        elif self.state == 'failed':
+            job['error'] = self.error
+        return job
+
+
+class ExplanationJobQueue:
+    """
+    Asynchronous explanation jobs run in a process pool
+
+    submit() validates the request, returns at once with a job ID and
+    leaves the work to a pool of worker processes sized to the CPU count,
+    so a heavy KernelSHAP or LIME analysis never occupies the web worker
+    that received it. The rows to explain are split into chunks spread
+    over the workers; get_job() reports progress while chunks complete,
+    and the per-feature contributions once all of them have. Analyses of
+    the default dataset sample are served from the interpreter's
+    attribution store when it holds a summary, and stored there when they
+    finish; explanations already in the interpreter's cache also complete
+    without touching the pool.
+
+    Jobs can credit their explained rows to the features' sources when
+    they finish, through a CreditPipeline that logs them as windowed,
+    per-DOI citations. The most recent MAX_JOBS jobs are kept for status
+    queries.
+
+    Jobs run in the process that submitted them. With a directory, their
+    state is also written there as <job ID>.json whenever it changes, so
+    any process sharing the directory can report on them; a job whose
+    process exited before it finished is reported as failed. Without one,
+    only the submitting process knows its jobs.
+
+    The workers are started by a fork server rather than forked from the
+    (multithreaded) web process, so they never inherit a lock some other
+    thread held; tasks are module-level functions that only use their
+    arguments.
+    """
+
+    MAX_JOBS = 1000
+
+    # Chunks per worker, to even out the load
+    CHUNKS_PER_WORKER = 2
+
+    def __init__(self, interpreter, credit=None, workers=None, directory=None):
+        """
+        Args:
+            interpreter (ModelInterpreter): Source of models and datasets
+            credit (CreditPipeline, optional): Where jobs credit their rows
+            workers (int, optional): Worker processes, defaults to the CPU count
+            directory (str, optional): Where job states are shared with
+                other processes; kept in memory only when not set
+        """
+        self.interpreter = interpreter
+        self.credit = credit
+        self.workers = workers or os.cpu_count() or 1
+        self.directory = directory
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _get_pool(self):
+        if self._pool is None:
+            # The fork server imports the task's module once; each worker
+            # forked from it starts with the engine ready to use
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload([__name__])
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def _save(self, job):
+        """Share a job's state; called with the lock held, so writes follow the state changes"""
+        if not self.directory:
+            return
+        path = self._path(job.id)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'pid': os.getpid(), 'job': job.to_dict()}, f)
+        os.replace(tmp_path, path)
+
+    def _discard(self, job):
+        if self.directory:
+            try:
+                os.remove(self._path(job.id))
+            except FileNotFoundError:
+                pass
+
+    def _fail(self, job, error):
+        with self._lock:
+            job.state, job.error, job.finished_at = 'failed', error, time.time()
+            self._save(job)
+
+    def submit(self, dataset_id, model_id, method='shap', input_data=None, credit=False):
+        """
+        Start explaining a model's predictions
+
+        Args:
+            dataset_id (str, optional): ID of the dataset, defaults to the
+                model's first compatible dataset
+            model_id (str): ID of the model
+            method (str): 'shap', 'lime' or 'permutation' (approximate SHAP)
+            input_data (list, optional): Rows to explain, defaults to a
+                sample of the dataset
+            credit (bool): Credit the explained rows to their sources
+                once the job is done
+
+        Returns:
+            dict: The job, as get_job returns it, or None for an unknown
+                or incompatible dataset/model pair
+
+        Raises:
+            ValueError: For an unsupported method or malformed input
+        """
+        if dataset_id is None:
+            compatible = self.interpreter.models.get(model_id, {}).get('compatible_datasets')
+            dataset_id = compatible[0] if compatible else None
+        task = self.interpreter.explanation_task(dataset_id, model_id, method, input_data)
+        if task is None:
+            return None
+
+        engine = self.interpreter.engine
+        job = ExplanationJob(dataset_id, model_id, task['method'], len(task['data']),
+                             credit and self.credit is not None)
+        job.cache_key = engine.cache_key(task['model_version'], task['dataset_version'],
+                                         task['method'], task['data'])
+        job.global_summary = input_data is None
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.MAX_JOBS:
+                self._discard(self._jobs.popitem(last=False)[1])
+            self._save(job)
+
+        # Crediting needs the per-row attributions a stored summary lacks
+        stored = None
+        if job.global_summary and not job.credit:
+            stored = self.interpreter.attribution_store.get(
+                self.interpreter.summary_key(dataset_id, model_id, job.method))
+        cached = engine.cached(job.cache_key) if stored is None else None
+        if stored is not None:
+            self._finish(job, stored)
+        elif cached is not None:
+            self._finish(job, self._summarize(job, cached), cached.values)
+        else:
+            self._dispatch(job, task)
+        return self.get_job(job.id)
+
+    def _summarize(self, job, explanation):
+        """Summary of a job's explanation, stored when it covers the default sample"""
+        if job.global_summary:
+            return self.interpreter.summarize(job.dataset_id, job.model_id, job.method, explanation)
+        return AttributionSummary.from_explanation(explanation)
+
+    def _dispatch(self, job, task):
+        rows = task['data']
+        size = max(1, math.ceil(len(rows) / (self.workers * self.CHUNKS_PER_WORKER)))
+        if task['method'] == 'permutation':
+            # Subsampling and early stopping work on all the rows at once
+            size = len(rows)
+        chunks = [rows[start:start + size] for start in range(0, len(rows), size)]
+        with self._lock:
+            job.chunks = len(chunks)
+            job.parts = [None] * len(chunks)
+            self._save(job)
+        options = self.interpreter.engine.options()
+
+        for attempt in range(2):
+            try:
+                pool = self._get_pool()
+                futures = [pool.submit(_explain_chunk, options, task['model'], chunk, task['method'],
+                                       task['background'], task['model_version'], task['dataset_version'])
+                           for chunk in chunks]
+                break
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool once
+                self._pool = None
+                if attempt:
+                    self._fail(job, 'The worker pool could not be started')
+                    return
+
+        for i, future in enumerate(futures):
+            future.add_done_callback(lambda future, i=i: self._chunk_done(job, i, future))
+
+    def _chunk_done(self, job, index, future):
+        """Runs in the pool's result thread as each chunk completes"""
+        with self._lock:
+            if job.state in ('done', 'failed'):
+                return
+            if future.cancelled():
+                # The pool was shut down before the chunk ran
+                job.state, job.error, job.finished_at = 'failed', 'The job was cancelled', time.time()
+                self._save(job)
+                return
+            error = future.exception()
+            if error is not None:
+                job.state, job.error, job.finished_at = 'failed', str(error) or type(error).__name__, time.time()
+                self._save(job)
+                return
+            job.state = 'running'
+            job.started_at = job.started_at or time.time()
+            job.parts[index] = future.result()
+            job.chunks_done += 1
+            self._save(job)
+            if job.chunks_done < job.chunks:
+                return
+
+        if len(job.parts) == 1:
+            explanation = job.parts[0]
+        else:
+            sizes = [len(part.values) for part in job.parts]
+            base_value = float(np.average([part.base_value for part in job.parts], weights=sizes))
+            explanation = Explanation(np.vstack([part.values for part in job.parts]), base_value, job.method)
+        self.interpreter.engine.store(job.cache_key, explanation)
+        try:
+            summary = self._summarize(job, explanation)
+        except Exception as e:
+            self._fail(job, str(e))
+            return
+        self._finish(job, summary, explanation.values)
+
+    def _finish(self, job, summary, values=None):
+        try:
+            contributions = self.interpreter.contributions(job.dataset_id, summary)
+            sources = self.interpreter.source_contributions(job.dataset_id, summary)
+            if job.credit:
+                self.credit.add(job.model_id, self.interpreter.registry.source_map(job.dataset_id),
+                                values, job.method)
+        except Exception as e:
+            self._fail(job, str(e))
+            return
+
+        with self._lock:
+            job.result = {
+                'contributions': contributions,
+                'sources': sources,
+                'base_value': round(summary.base_value, 6)
+            }
+            if summary.details is not None:
+                job.result['approximation'] = summary.details
+            job.parts = None
+            job.started_at = job.started_at or time.time()
+            job.finished_at = time.time()
+            job.state = 'done'
+            self._save(job)
+
+    def get_job(self, job_id):
+        """
+        Get the state of a job
+
+        Args:
+            job_id (str): ID returned by submit
+
+        Returns:
+            dict: State, progress and, once done, the contributions; None
+                for an unknown (or expired) job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        if not self.directory or not _JOB_ID.match(job_id):
+            return None
+
+        # Submitted by another process
+        try:
+            with open(self._path(job_id)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = saved['job']
+        if job['state'] in ('queued', 'running') and not _process_alive(saved['pid']):
+            job['state'] = 'failed'
+            job['error'] = 'The process running the job exited before it finished'
+        return job
+
+    def shutdown(self):
+        """Stop the worker processes and flush the credit pipeline"""
+        if self.credit is not None:
+            self.credit.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
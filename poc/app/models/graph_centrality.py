@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse as sp
+
+
+def pagerank(transition, dangling, teleport, alpha=0.85, tol=1e-6, max_iter=100, start=None):
+    """
+    PageRank by sparse power iteration
+
+    Args:
+        transition (scipy.sparse.csr_matrix): Transposed row-stochastic
+            transition matrix, so that one step is ``transition @ x``
+        dangling (np.ndarray): Boolean mask of nodes without out-edges
+        teleport (np.ndarray): Teleport distribution (sums to 1); dangling
+            nodes also jump according to it
+        alpha (float): Damping factor
+        tol (float): Convergence threshold on the L1 change per node
+        max_iter (int): Maximum number of iterations
+        start (np.ndarray, optional): Initial vector, e.g. a previous result
+
+    Returns:
+        tuple: (scores, iterations, converged)
+    """
+    n = len(teleport)
+    x = teleport.copy() if start is None or len(start) != n else start / start.sum()
+    for iteration in range(1, max_iter + 1):
+        previous = x
+        x = alpha * (transition @ previous + previous[dangling].sum() * teleport) + (1 - alpha) * teleport
+        if np.abs(x - previous).sum() < n * tol:
+            return x, iteration, True
+    return x, max_iter, False
+
+
+class CentralityIndex:
+    """
+    Background-computed network influence scores of the knowledge graph
+
+    Builds a sparse weighted adjacency matrix from a graph snapshot (edge
+    weights are citation counts for CITES edges) and ranks nodes with:
+    - pagerank: weighted PageRank with uniform teleport
+    - influence: degree-weighted PageRank, teleporting in proportion to
+      each node's weighted in-degree, so heavily cited works seed the walk
+    Results are cached together with the graph version they were computed
+    from. Reads never wait for a computation: when the graph has changed
+    they return the cached scores, marked stale, and start a recompute in
+    a background thread. Personalized PageRank runs on demand against the
+    cached matrix and is memoized per (version, seeds).
+    """
+
+    METRICS = ('pagerank', 'influence', 'weighted_degree')
+
+    # Personalized results kept per graph version
+    MAX_PERSONALIZED = 128
+
+    def __init__(self, graph, alpha=0.85, min_interval=5.0):
+        """
+        Args:
+            graph: KnowledgeGraph or CompactKnowledgeGraph (thread-safe wrapper)
+            alpha (float): PageRank damping factor
+            min_interval (float): Minimum seconds between two recomputes
+        """
+        self.graph = graph
+        self.alpha = alpha
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._worker = None
+        self._state = None
+        self._computed_at = 0.0
+        self._personalized = OrderedDict()
+
+    def _compute(self):
+        """Snapshot the graph and compute every metric"""
+        snapshot = self.graph.get_weighted_adjacency()
+        nodes = snapshot['nodes']
+        n = len(nodes)
+        adjacency = sp.csr_matrix((snapshot['weights'], (snapshot['sources'], snapshot['targets'])),
+                                  shape=(n, n), dtype=np.float64)
+
+        out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+        in_weight = np.asarray(adjacency.sum(axis=0)).ravel()
+        dangling = out_weight == 0
+        inverse = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+        transition = (sp.diags(inverse) @ adjacency).T.tocsr()
+
+        uniform = np.full(n, 1.0 / n) if n else np.zeros(0)
+        scores = {'weighted_degree': in_weight + out_weight}
+        iterations = {}
+        if n:
+            scores['pagerank'], iterations['pagerank'], _ = pagerank(
+                transition, dangling, uniform, self.alpha)
+            degree_teleport = (in_weight + 1.0) / (in_weight + 1.0).sum()
+            scores['influence'], iterations['influence'], _ = pagerank(
+                transition, dangling, degree_teleport, self.alpha, start=scores['pagerank'])
+        else:
+            scores['pagerank'] = scores['influence'] = np.zeros(0)
+
+        return {
+            'version': snapshot['version'],
+            'nodes': nodes,
+            'index': {node_id: i for i, node_id in enumerate(nodes)},
+            'types': np.asarray(snapshot['types'], dtype=object),
+            'transition': transition,
+            'dangling': dangling,
+            'scores': scores,
+            'iterations': iterations
+        }
+
+    def refresh(self):
+        """Recompute the scores now, in the calling thread"""
+        state = self._compute()
+        with self._lock:
+            if self._state is None or state['version'] >= self._state['version']:
+                self._state = state
+                self._computed_at = time.time()
+                self._personalized.clear()
+            self._worker = None
+        return state
+
+    def _schedule(self):
+        """Start a background recompute unless one is running or one ran recently"""
+        with self._lock:
+            if self._worker is not None or time.time() - self._computed_at < self.min_interval:
+                return
+            self._worker = threading.Thread(target=self._run, name='aicif-centrality', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._worker = None
+
+    def _current(self):
+        """Cached state, computing it synchronously only the very first time"""
+        state = self._state
+        if state is None:
+            return self.refresh(), False
+        stale = self.graph.get_version() != state['version']
+        if stale:
+            self._schedule()
+        return state, stale
+
+    def _ranking(self, state, values, node_type=None, limit=20):
+        candidates = np.arange(len(values))
+        if node_type:
+            candidates = candidates[state['types'] == node_type]
+        top = candidates[np.argsort(-values[candidates], kind='stable')[:limit]]
+        return [
+            {'id': state['nodes'][i], 'type': state['types'][i], 'score': float(values[i])}
+            for i in top
+        ]
+
+    def get_scores(self, metric='pagerank'):
+        """
+        Get the cached scores of every node
+
+        Args:
+            metric (str): One of METRICS
+
+        Returns:
+            dict: Node ID -> score
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f'Unsupported metric: {metric}')
+        state, _ = self._current()
+        return dict(zip(state['nodes'], state['scores'][metric].tolist()))
+
+    def get_ranking(self, metric='pagerank', node_type=None, limit=20, seeds=None):
+        """
+        Rank nodes by network influence
+
+        Args:
+            metric (str): One of METRICS; ignored when seeds are given
+            node_type (str, optional): Only rank nodes of this type, e.g. 'paper'
+            limit (int): Number of nodes returned
+            seeds (list, optional): Node IDs for personalized PageRank
+
+        Returns:
+            dict: Ranking plus the graph version it was computed from and
+                whether the graph has changed since
+
+        Raises:
+            ValueError: For an unknown metric or when no seed is in the graph
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f'Unsupported metric: {metric}')
+        state, stale = self._current()
+
+        if seeds:
+            values, iterations = self._personalized_scores(state, seeds)
+            metric = 'personalized_pagerank'
+        else:
+            values, iterations = state['scores'][metric], state['iterations'].get(metric)
+
+        return {
+            'metric': metric,
+            'version': state['version'],
+            'computed_at': self._computed_at,
+            'stale': stale,
+            'iterations': iterations,
+            'ranking': self._ranking(state, values, node_type, limit)
+        }
+
+    def _personalized_scores(self, state, seeds):
+        positions = sorted({state['index'][seed] for seed in seeds if seed in state['index']})
+        if not positions:
+            raise ValueError('None of the seed nodes are in the graph')
+
+        key = (state['version'], tuple(positions))
+        with self._lock:
+            if key in self._personalized:
+                self._personalized.move_to_end(key)
+                return self._personalized[key]
+
+        teleport = np.zeros(len(state['nodes']))
+        teleport[positions] = 1.0 / len(positions)
+        values, iterations, _ = pagerank(state['transition'], state['dangling'], teleport, self.alpha)
+
+        with self._lock:
+            self._personalized[key] = values, iterations
+            while len(self._personalized) > self.MAX_PERSONALIZED:
+                self._personalized.popitem(last=False)
+        return values, iterations
@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import time
+
+
+class PathSearchTimeout(Exception):
+    """Raised when a path query exceeds its time budget"""
+
+
+class PathQueryEngine:
+    """
+    Bounded path queries over the knowledge graph
+
+    Replaces enumeration of all simple paths, which is exponential around
+    hub nodes such as popular AI models, with:
+    - bidirectional BFS for a single shortest path
+    - Yen's k-shortest simple paths with a hard cap on the result count
+    Both honour a maximum path length, an optional set of allowed
+    relationship types and a wall-clock time budget.
+
+    Works on any graph exposing networkx-style ``succ`` and ``pred``
+    adjacency mappings (node -> {neighbor: edge attributes}).
+    """
+
+    # Nodes expanded between two checks of the deadline
+    DEADLINE_CHECK_INTERVAL = 1024
+
+    def __init__(self, graph):
+        """
+        Args:
+            graph: Graph whose edges carry a 'relationship' attribute
+        """
+        self.graph = graph
+
+    def shortest_path(self, source, target, relationships=None, max_depth=None, deadline=None,
+                      ignore_nodes=None, ignore_edges=None):
+        """
+        Find one shortest directed path with bidirectional BFS
+
+        Args:
+            source (str): Source node ID
+            target (str): Target node ID
+            relationships (iterable, optional): Allowed relationship types
+            max_depth (int, optional): Maximum number of edges
+            deadline (float, optional): time.monotonic() value to stop at
+            ignore_nodes (set, optional): Nodes the path may not visit
+            ignore_edges (set, optional): (source, target) edges the path may not use
+
+        Returns:
+            list: Node IDs along the path, or None if there is none
+
+        Raises:
+            PathSearchTimeout: If the deadline passes during the search
+        """
+        if source == target:
+            return [source]
+
+        allowed = set(relationships) if relationships else None
+        ignore_nodes = ignore_nodes or ()
+        ignore_edges = ignore_edges or ()
+        if source in ignore_nodes or target in ignore_nodes:
+            return None
+
+        forward_parents = {source: None}
+        backward_parents = {target: None}
+        forward = [source]
+        backward = [target]
+        depth = 0
+        expanded = 0
+
+        while forward and backward:
+            if max_depth is not None and depth >= max_depth:
+                return None
+            depth += 1
+
+            # Grow the smaller frontier by one level
+            is_forward = len(forward) <= len(backward)
+            if is_forward:
+                frontier, adjacency = forward, self.graph.succ
+                parents, other_parents = forward_parents, backward_parents
+            else:
+                frontier, adjacency = backward, self.graph.pred
+                parents, other_parents = backward_parents, forward_parents
+
+            next_level = []
+            for node in frontier:
+                expanded += 1
+                if deadline is not None and expanded % self.DEADLINE_CHECK_INTERVAL == 0 \
+                        and time.monotonic() > deadline:
+                    raise PathSearchTimeout()
+
+                for neighbor, edge_data in adjacency[node].items():
+                    if allowed is not None and edge_data.get("relationship") not in allowed:
+                        continue
+                    if neighbor in parents or neighbor in ignore_nodes:
+                        continue
+                    if ignore_edges and ((node, neighbor) if is_forward else (neighbor, node)) in ignore_edges:
+                        continue
+                    parents[neighbor] = node
+                    if neighbor in other_parents:
+                        return self._join(neighbor, forward_parents, backward_parents)
+                    next_level.append(neighbor)
+
+            if is_forward:
+                forward = next_level
+            else:
+                backward = next_level
+
+        return None
+
+    def _join(self, meeting, forward_parents, backward_parents):
+        """Stitch the two BFS trees together at the meeting node"""
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = forward_parents[node]
+        path.reverse()
+
+        node = backward_parents[meeting]
+        while node is not None:
+            path.append(node)
+            node = backward_parents[node]
+        return path
+
+    def k_shortest_paths(self, source, target, k=10, relationships=None, max_depth=None, time_budget=None):
+        """
+        Find up to k shortest simple paths, shortest first
+
+        Args:
+            source (str): Source node ID
+            target (str): Target node ID
+            k (int): Hard cap on the number of paths returned
+            relationships (iterable, optional): Allowed relationship types
+            max_depth (int, optional): Maximum number of edges per path
+            time_budget (float, optional): Seconds to spend before returning
+                the paths found so far
+
+        Returns:
+            tuple: (paths, truncated) where paths is a list of node ID lists
+                and truncated tells whether the time budget ran out
+        """
+        if k <= 0:
+            return [], False
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+
+        # Cheap existence check first: no shortest path means no paths at all
+        try:
+            first = self.shortest_path(source, target, relationships, max_depth, deadline)
+        except PathSearchTimeout:
+            return [], True
+        if first is None:
+            return [], False
+        if k == 1:
+            return [first], False
+
+        # Yen's algorithm: each further path deviates from an earlier one at
+        # a spur node, continuing along the shortest path that avoids the
+        # edges already taken from the same root
+        paths = [first]
+        candidates = []
+        seen = {tuple(first)}
+        counter = itertools.count()
+        try:
+            while len(paths) < k:
+                previous = paths[-1]
+                for i in range(len(previous) - 1):
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise PathSearchTimeout()
+                    root = previous[:i + 1]
+                    ignore_edges = {(path[i], path[i + 1]) for path in paths
+                                    if len(path) > i + 1 and path[:i + 1] == root}
+                    spur = self.shortest_path(
+                        previous[i], target, relationships,
+                        max_depth - i if max_depth is not None else None,
+                        deadline,
+                        ignore_nodes=set(root[:-1]),
+                        ignore_edges=ignore_edges
+                    )
+                    if spur is None:
+                        continue
+                    candidate = root[:-1] + spur
+                    if tuple(candidate) not in seen:
+                        seen.add(tuple(candidate))
+                        heapq.heappush(candidates, (len(candidate), next(counter), candidate))
+
+                if not candidates:
+                    break
+                paths.append(heapq.heappop(candidates)[2])
+                if deadline is not None and time.monotonic() > deadline:
+                    return paths, True
+        except PathSearchTimeout:
+            return paths, True
+
+        return paths, False
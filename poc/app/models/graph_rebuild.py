@@ -0,0 +1,199 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from app.models.author_index import split_authors
+from app.models.citation_index import EdgeAggregate, citation_event
+from app.models.citation_storage import SegmentedLogStorage, read_log_range
+
+
+class GraphAggregate:
+    """
+    Node and edge aggregates of a slice of the citation history
+
+    Holds what add_citation would do to the graph for a run of citations:
+    the nodes in order of first appearance, one EdgeAggregate per CITES
+    edge with the timestamp of its latest-logged citation, and the set of
+    AUTHORED edges. Author names are kept as written, in order of first
+    appearance, and resolved by the graph's AuthorIndex when the aggregate
+    is applied, so resolution sees names in log order. Aggregates of consecutive slices merge associatively,
+    so slices can be built independently and combined in log order.
+    """
+
+    __slots__ = ('nodes', 'cites', 'authored', 'citations')
+
+    def __init__(self):
+        # node ID -> (type, title or None), first appearance wins
+        self.nodes = {}
+        # (ai_model, doi) -> [EdgeAggregate, timestamp of the last citation]
+        self.cites = {}
+        # (author name as written, doi) -> None, used as an ordered set
+        self.authored = {}
+        self.citations = 0
+
+    def add(self, citation_data):
+        """Fold one citation, as given to KnowledgeGraph.add_citation"""
+        doi = citation_data.get("doi")
+        ai_model = citation_data.get("ai_model")
+        timestamp = citation_data.get("timestamp")
+        self.citations += 1
+
+        self.nodes.setdefault(doi, (citation_data.get("source_type", "paper"),
+                                    citation_data.get("source_title", "Unknown")))
+        self.nodes.setdefault(ai_model, ("ai_model", None))
+
+        edge = self.cites.get((ai_model, doi))
+        if edge is None:
+            edge = self.cites[(ai_model, doi)] = [EdgeAggregate(), timestamp]
+        edge[0].add(*citation_event(citation_data, timestamp))
+        edge[1] = timestamp
+
+        for author in split_authors(citation_data.get("authors")):
+            self.authored[(author, doi)] = None
+
+    def merge(self, later):
+        """Fold in the aggregate of the slice that follows this one"""
+        self.citations += later.citations
+        for node_id, data in later.nodes.items():
+            self.nodes.setdefault(node_id, data)
+        for key, (stats, timestamp) in later.cites.items():
+            edge = self.cites.get(key)
+            if edge is None:
+                self.cites[key] = [stats, timestamp]
+            else:
+                edge[0].merge(stats)
+                edge[1] = timestamp
+        self.authored.update(later.authored)
+
+
+def _aggregate_records(records):
+    aggregate = GraphAggregate()
+    for citation_data in records:
+        aggregate.add(citation_data)
+    return aggregate
+
+
+def _aggregate_log_range(directory, segment_size, start, end):
+    """Process pool task: aggregate one range of the registry's log"""
+    return _aggregate_records(read_log_range(directory, segment_size, start, end))
+
+
+# History being rebuilt, inherited by forked workers instead of pickled
+_history = None
+
+
+def _aggregate_history_range(start, end):
+    """Process pool task: aggregate one range of the inherited history"""
+    return _aggregate_records(_history[start:end])
+
+
+class GraphRebuilder:
+    """
+    Parallel rebuild of the knowledge graph from the registry's history
+
+    The history is split into contiguous partitions of the log. Each is
+    aggregated in a worker process (nodes, per-edge citation statistics,
+    authorship edges) and the partial aggregates are merged in log order,
+    so the result matches replaying the citations one by one through
+    add_citation. Persistent registries are read straight from their log
+    segments by the workers; forked workers read in-memory ones from the
+    memory they inherit. Small histories are aggregated in-process.
+    """
+
+    # Below this many citations the process pool costs more than it saves
+    PARALLEL_MIN_CITATIONS = 50000
+
+    # Partitions per worker, to even out the load
+    PARTITIONS_PER_WORKER = 4
+
+    def __init__(self, workers=None):
+        """
+        Args:
+            workers (int, optional): Worker processes, defaults to the CPU count
+        """
+        self.workers = workers or os.cpu_count() or 1
+
+    def _partitions(self, total):
+        size = max(1, math.ceil(total / (self.workers * self.PARTITIONS_PER_WORKER)))
+        return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+    def aggregate(self, registry):
+        """
+        Aggregate the full citation history of a registry
+
+        Args:
+            registry (CitationRegistry): Source of the citation history
+
+        Returns:
+            GraphAggregate: Aggregate of every citation, in log order
+        """
+        citations = registry.citations
+        total = len(citations)
+        if self.workers <= 1 or total < self.PARALLEL_MIN_CITATIONS:
+            return _aggregate_records(citations)
+
+        global _history
+        partitions = self._partitions(total)
+        storage = registry.storage
+        if isinstance(storage, SegmentedLogStorage) and storage.position == total:
+            # Workers read their partition of the log themselves
+            task = _aggregate_log_range
+            arguments = [(storage.directory, storage.segment_size, start, end) for start, end in partitions]
+        else:
+            task = _aggregate_history_range
+            arguments = partitions
+            _history = citations
+
+        # Forked workers share the parent's memory; the tasks touch nothing
+        # but the history, so the server's threads do not matter to them
+        context = multiprocessing.get_context('fork')
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+                merged = GraphAggregate()
+                for partial in pool.map(task, *zip(*arguments)):
+                    merged.merge(partial)
+        finally:
+            _history = None
+        return merged
+
+    def rebuild(self, graph, registry, load_sample_data=True):
+        """
+        Replace the graph with one derived from the registry's history
+
+        Args:
+            graph: KnowledgeGraph or CompactKnowledgeGraph
+            registry (CitationRegistry): Source of the citation history
+            load_sample_data (bool): Start from the sample graph
+
+        Returns:
+            dict: Number of citations and seconds spent
+        """
+        started = time.monotonic()
+        aggregate = self.aggregate(registry)
+        graph.rebuild(aggregate, load_sample_data=load_sample_data)
+        return {
+            'citations': aggregate.citations,
+            'workers': self.workers,
+            'seconds': round(time.monotonic() - started, 3)
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import load_config
+    from app.services import build_components
+
+    parser = argparse.ArgumentParser(
+        description='Rebuild the knowledge graph from the citation registry. '
+                    'Run it while the server is stopped.')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    config = load_config()
+    registry, graph, _, _ = build_components(config['AICIF_DATA_DIR'], config['AICIF_GRAPH_BACKEND'])
+    # The rebuild reads the registry's history directly
+    with registry.locked() as history:
+        result = GraphRebuilder(args.workers).rebuild(graph, history)
+    print(f"Rebuilt the knowledge graph from {result['citations']} citations "
+          f"with {result['workers']} workers in {result['seconds']}s")
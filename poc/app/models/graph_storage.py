@@ -0,0 +1,231 @@
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from app.models.citation_index import EdgeAggregate, parse_timestamp
+from app.models.citation_storage import CitationStorage, SegmentedLogStorage
+from app.models.citation_store import ColumnarCitationStore
+
+# Citation fields the knowledge graph uses; only these are logged
+GRAPH_FIELDS = ('doi', 'ai_model', 'source_title', 'source_type', 'authors',
+                'timestamp', 'contribution_score')
+
+SNAPSHOT_FORMAT = 2
+
+
+def graph_record(citation_data, timestamp):
+    """The part of a citation the graph log keeps, with its resolved timestamp"""
+    record = {k: citation_data[k] for k in GRAPH_FIELDS if k in citation_data}
+    record['timestamp'] = timestamp
+    return record
+
+
+def encode_strings(values):
+    """
+    Pack strings into one UTF-8 byte array plus offsets
+
+    Returns:
+        tuple: (uint8 data, int64 offsets) where value i is
+            data[offsets[i]:offsets[i + 1]]
+    """
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(data, offsets):
+    """Inverse of encode_strings"""
+    raw = bytes(data)
+    bounds = offsets.tolist()
+    return [raw[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+
+
+def encode_timestamp(timestamp):
+    """
+    Encode an edge timestamp as epoch microseconds
+
+    Returns:
+        tuple: (micros or -1, the raw string when it does not round-trip)
+    """
+    if not timestamp:
+        return -1, None
+    try:
+        micros = round(parse_timestamp(timestamp) * 1000000)
+    except ValueError:
+        return -1, timestamp
+    return micros, None if ColumnarCitationStore._format_timestamp(micros) == timestamp else timestamp
+
+
+def decode_timestamp(micros, raw=None):
+    if raw is not None:
+        return raw
+    return ColumnarCitationStore._format_timestamp(micros) if micros >= 0 else ""
+
+
+def pack_edge_stats(items):
+    """
+    Columnar form of the EdgeAggregates of some edges
+
+    Args:
+        items (list): (edge index, EdgeAggregate) pairs
+
+    Returns:
+        dict: Arrays, with the per-day histograms in CSR layout
+    """
+    days, counts = [], []
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    for i, (_, stats) in enumerate(items):
+        for day, count in sorted(stats.days.items()):
+            days.append(day)
+            counts.append(count)
+        offsets[i + 1] = len(days)
+    return {
+        'stats_edge': np.array([edge for edge, _ in items], dtype=np.int64),
+        'stats_count': np.array([stats.count for _, stats in items], dtype=np.int64),
+        'stats_first': np.array([np.nan if stats.first is None else stats.first for _, stats in items]),
+        'stats_last': np.array([np.nan if stats.last is None else stats.last for _, stats in items]),
+        'stats_contribution': np.array([stats.contribution_sum for _, stats in items]),
+        'stats_hist_offsets': offsets,
+        'stats_hist_day': np.array(days, dtype=np.int32),
+        'stats_hist_count': np.array(counts, dtype=np.int32)
+    }
+
+
+def unpack_edge_stats(arrays):
+    """
+    Inverse of pack_edge_stats
+
+    Returns:
+        list: (edge index, EdgeAggregate) pairs
+    """
+    offsets = arrays['stats_hist_offsets'].tolist()
+    days = arrays['stats_hist_day'].tolist()
+    counts = arrays['stats_hist_count'].tolist()
+    items = []
+    for i, edge in enumerate(arrays['stats_edge'].tolist()):
+        stats = EdgeAggregate()
+        stats.count = int(arrays['stats_count'][i])
+        first, last = float(arrays['stats_first'][i]), float(arrays['stats_last'][i])
+        stats.first = None if np.isnan(first) else first
+        stats.last = None if np.isnan(last) else last
+        stats.contribution_sum = float(arrays['stats_contribution'][i])
+        stats.days = dict(zip(days[offsets[i]:offsets[i + 1]], counts[offsets[i]:offsets[i + 1]]))
+        items.append((edge, stats))
+    return items
+
+
+class GraphLogStorage(SegmentedLogStorage):
+    """
+    Event log plus binary snapshots for the knowledge graph
+
+    The log is the same segmented NDJSON log the registry uses, holding
+    the graph-relevant fields of every add_citation call. Snapshots are a
+    directory of plain .npy arrays (node table, edge list, edge statistics)
+    and a JSON manifest, so they load with np.load(mmap_mode='r') without
+    unpickling, and are portable between the graph backends. A snapshot is
+    frozen by dump_snapshot while the graph cannot change, then written by
+    save_snapshot, possibly on another thread, to a temporary directory
+    that is swapped in by rename.
+    """
+
+    SNAPSHOT_DIR = 'snapshot'
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(directory, **kwargs)
+        # Snapshots may be saved by a background thread and on close
+        self._save_lock = threading.Lock()
+        self._saved_position = 0
+
+    def _snapshot_path(self, suffix=''):
+        return os.path.join(self.directory, self.SNAPSHOT_DIR + suffix)
+
+    def load_snapshot(self):
+        path = self._snapshot_path()
+        if not os.path.isdir(path) and os.path.isdir(self._snapshot_path('.old')):
+            # Crashed between the two renames of write_snapshot
+            path = self._snapshot_path('.old')
+
+        try:
+            with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+            arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+                      for name in manifest['arrays']}
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if manifest.get('format') != SNAPSHOT_FORMAT or manifest['position'] > self._position:
+            return None
+
+        self._snapshot_position = self._saved_position = manifest['position']
+        return {'meta': manifest['meta'], 'arrays': arrays}, manifest['position']
+
+    def dump_snapshot(self, state):
+        """
+        Freeze a graph snapshot as of the current log position
+
+        Args:
+            state (dict): 'meta' (JSON-serializable) and 'arrays' (name ->
+                ndarray) that the graph no longer modifies
+
+        Returns:
+            dict: The snapshot, for save_snapshot
+        """
+        # Counted from here, so appends made during the write do not
+        # request another snapshot straight away
+        self._snapshot_position = self._position
+        return {
+            'position': self._position,
+            'manifest': json.dumps({
+                'format': SNAPSHOT_FORMAT,
+                'position': self._position,
+                'meta': state['meta'],
+                'arrays': sorted(state['arrays'])
+            }),
+            'arrays': state['arrays']
+        }
+
+    def save_snapshot(self, snapshot):
+        """Write a snapshot made by dump_snapshot, unless a newer one was written meanwhile"""
+        with self._save_lock:
+            if snapshot['position'] < self._saved_position:
+                return
+
+            tmp_path = self._snapshot_path('.tmp')
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            for name, values in snapshot['arrays'].items():
+                with open(os.path.join(tmp_path, name + '.npy'), 'wb') as f:
+                    np.save(f, np.ascontiguousarray(values))
+                    f.flush()
+                    os.fsync(f.fileno())
+            with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+                f.write(snapshot['manifest'])
+                f.flush()
+                os.fsync(f.fileno())
+
+            path, old_path = self._snapshot_path(), self._snapshot_path('.old')
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.isdir(path):
+                os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            self._saved_position = snapshot['position']
+
+
+def open_graph_storage(data_dir=None, **kwargs):
+    """
+    Build the graph storage backend for a data directory
+
+    Args:
+        data_dir (str, optional): Directory for persistent data; the
+            in-memory backend is used when not set
+
+    Returns:
+        CitationStorage: The storage backend
+    """
+    if not data_dir:
+        return CitationStorage()
+    return GraphLogStorage(os.path.join(data_dir, 'graph'), **kwargs)
@@ -1,7 +1,22 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
 import networkx as nx
+import numpy as np
 import json
 import uuid
+from collections import Counter
 from datetime import datetime
+from app.models.author_index import AuthorIndex
+from app.models.citation_index import EdgeAggregate, citation_event, parse_timestamp
+from app.models.citation_storage import CitationStorage
+from app.models.graph_storage import (decode_strings, decode_timestamp, encode_strings, encode_timestamp,
+                                      graph_record, pack_edge_stats, unpack_edge_stats)
+from app.models.graph_paths import PathQueryEngine
+
+logger = logging.getLogger(__name__)
 
 class KnowledgeGraph:
     """
@@ -14,15 +29,230 @@ class KnowledgeGraph:
     
     This simulates a Neo4j graph database with NetworkX for the PoC.
     In production, this would use a proper graph database like Neo4j.
+    
+    With a persistent storage backend every add_citation call is logged
+    and the graph is periodically snapshotted in a binary node table /
+    edge list format, so a restart loads the snapshot and replays only
+    the citations logged after it. Snapshots are captured under the lock
+    and written by a background thread, so requests only wait for the
+    copy; close() writes a final one before closing the storage.
     """
     
-    def __init__(self):
-        """Initialize the knowledge graph"""
+    # Citations applied per batch when replaying the log or rebuilding
+    REPLAY_BATCH_SIZE = 10000
+    
+    def __init__(self, storage=None, load_sample_data=True, author_index=None, lock=None):
+        """
+        Initialize the knowledge graph
+        
+        Args:
+            storage (CitationStorage, optional): Persistence backend, e.g.
+                from open_graph_storage
+            load_sample_data (bool): Seed the sample graph when there is
+                no snapshot to start from
+            author_index (AuthorIndex, optional): Author name resolution;
+                author nodes are keyed by canonical author ID. Its state is
+                saved with the graph snapshots
+            lock (threading.RLock, optional): Lock callers hold while using
+                the graph; snapshots hold it while capturing the graph
+        """
+        self.storage = storage or CitationStorage()
+        self.author_index = AuthorIndex() if author_index is None else author_index
+        self._lock = lock or threading.RLock()
+        self._snapshot_requested = threading.Event()
+        self._snapshot_thread = None
+        
         # Create a directed graph
         self.graph = nx.DiGraph()
         
-        # Load sample data
-        self._load_sample_data()
+        # Bumped on every change, to tell when derived indexes are stale
+        self.version = 0
+        
+        # Restore persisted state, starting from the sample data if needed
+        self.restored = self._restore(load_sample_data)
+    
+    def _restore(self, load_sample_data):
+        """
+        Restore the graph from the latest snapshot plus the log written after it
+        
+        Returns:
+            bool: Whether the storage held a snapshot or logged citations
+        """
+        position = 0
+        snapshot = self.storage.load_snapshot()
+        if snapshot is not None:
+            state, position = snapshot
+            self._load_snapshot_state(state)
+        elif load_sample_data:
+            self._load_sample_data()
+        
+        records = self.storage.replay(position)
+        while True:
+            batch = list(itertools.islice(records, self.REPLAY_BATCH_SIZE))
+            if not batch:
+                break
+            self._add_citations_bulk(batch)
+        
+        return snapshot is not None or self.storage.position > 0
+    
+    def rebuild(self, aggregate, load_sample_data=True):
+        """
+        Replace the graph with one built from a citation history
+        
+        The result is the sample graph (optionally) plus the aggregated
+        citations, as if they had gone through add_citation in log order.
+        It is snapshotted right away.
+        
+        Args:
+            aggregate (GraphAggregate): Aggregated citation history, see
+                GraphRebuilder
+            load_sample_data (bool): Start from the sample graph
+        """
+        self.graph = nx.DiGraph()
+        if load_sample_data:
+            self._load_sample_data()
+        self.merge_aggregate(aggregate)
+        self.storage.write_snapshot(self._snapshot_state())
+    
+    def merge_aggregate(self, aggregate):
+        """
+        Apply the aggregate of a run of citations in one pass
+        
+        Args:
+            aggregate (GraphAggregate): Nodes and edge statistics to add
+        """
+        self.version += 1
+        for node_id, (node_type, title) in aggregate.nodes.items():
+            if not self.graph.has_node(node_id):
+                size = 12 if node_type == "ai_model" else 7 if node_type == "author" else 10
+                self.graph.add_node(node_id, type=node_type, size=size, color=self._node_color(node_type))
+                if title is not None:
+                    self.graph.nodes[node_id]["title"] = title
+        
+        for (ai_model, doi), (stats, timestamp) in aggregate.cites.items():
+            if not self.graph.has_edge(ai_model, doi):
+                self.graph.add_edge(ai_model, doi)
+            edge_data = self.graph.edges[ai_model, doi]
+            if edge_data.get("stats") is not None:
+                edge_data["stats"].merge(stats)
+                stats = edge_data["stats"]
+            edge_data.update(relationship="CITES", weight=stats.count, timestamp=timestamp, stats=stats)
+        
+        for name, doi in aggregate.authored:
+            author = self.author_index.resolve(name)
+            if not self.graph.has_node(author):
+                self.graph.add_node(author, type="author", size=7, color=self._node_color("author"))
+            if not self.graph.has_edge(author, doi):
+                self.graph.add_edge(author, doi, relationship="AUTHORED", weight=1)
+    
+    def _request_snapshot(self):
+        """Have the snapshot thread take a snapshot once it is free"""
+        self._snapshot_requested.set()
+        if self._snapshot_thread is None:
+            self._snapshot_thread = threading.Thread(target=self._run_snapshots, name='aicif-graph-snapshot',
+                                                     daemon=True)
+            self._snapshot_thread.start()
+    
+    def _run_snapshots(self):
+        while True:
+            self._snapshot_requested.wait()
+            self._snapshot_requested.clear()
+            try:
+                # Capturing copies the graph into arrays; the slow write needs no lock
+                with self._lock:
+                    snapshot = self.storage.dump_snapshot(self._snapshot_state())
+                self.storage.save_snapshot(snapshot)
+            except Exception:
+                logger.exception('Writing the graph snapshot failed; the log still holds every citation')
+    
+    def close(self):
+        """Write a final snapshot and close the storage"""
+        with self._lock:
+            if self.storage.position > 0:
+                self.storage.write_snapshot(self._snapshot_state())
+            self.storage.close()
+    
+    def _snapshot_state(self):
+        """
+        Capture the graph as a node table and edge list of flat arrays
+        
+        Returns:
+            dict: 'meta' and 'arrays', as GraphLogStorage.write_snapshot expects
+        """
+        nodes = list(self.graph.nodes(data=True))
+        index = {node_id: i for i, (node_id, _) in enumerate(nodes)}
+        node_types, relationships, titles = {}, {}, {}
+        
+        title_codes = [titles.setdefault(data["title"], len(titles)) if "title" in data else -1
+                       for _, data in nodes]
+        names_data, names_offsets = encode_strings([node_id for node_id, _ in nodes])
+        titles_data, titles_offsets = encode_strings(list(titles))
+        
+        edges = list(self.graph.edges(data=True))
+        timestamps = [encode_timestamp(data.get("timestamp")) for _, _, data in edges]
+        
+        arrays = {
+            "node_names": names_data,
+            "node_name_offsets": names_offsets,
+            "node_type": np.array([node_types.setdefault(data.get("type", "unknown"), len(node_types))
+                                   for _, data in nodes], dtype=np.int8),
+            "node_size": np.array([data.get("size", 10) for _, data in nodes], dtype=np.int8),
+            "node_title": np.array(title_codes, dtype=np.int32),
+            "titles": titles_data,
+            "title_offsets": titles_offsets,
+            "edge_source": np.array([index[u] for u, _, _ in edges], dtype=np.int32),
+            "edge_target": np.array([index[v] for _, v, _ in edges], dtype=np.int32),
+            "edge_rel": np.array([relationships.setdefault(data.get("relationship", ""), len(relationships))
+                                  for _, _, data in edges], dtype=np.int8),
+            "edge_weight": np.array([data.get("weight", 1) for _, _, data in edges], dtype=np.float32),
+            "edge_ts": np.array([micros for micros, _ in timestamps], dtype=np.int64)
+        }
+        arrays.update(pack_edge_stats([(i, data["stats"]) for i, (_, _, data) in enumerate(edges)
+                                       if data.get("stats") is not None]))
+        
+        return {
+            "meta": {
+                "version": self.version,
+                "node_types": list(node_types),
+                "relationships": list(relationships),
+                "raw_timestamps": {str(i): raw for i, (_, raw) in enumerate(timestamps) if raw is not None},
+                "authors": self.author_index.to_dict()
+            },
+            "arrays": arrays
+        }
+    
+    def _load_snapshot_state(self, state):
+        """Replace the graph with the contents of a snapshot"""
+        meta, arrays = state["meta"], state["arrays"]
+        names = decode_strings(arrays["node_names"], arrays["node_name_offsets"])
+        titles = decode_strings(arrays["titles"], arrays["title_offsets"])
+        node_types, relationships = meta["node_types"], meta["relationships"]
+        
+        self.graph = nx.DiGraph()
+        for node_id, type_code, size, title_code in zip(names, arrays["node_type"].tolist(),
+                                                        arrays["node_size"].tolist(),
+                                                        arrays["node_title"].tolist()):
+            node_type = node_types[type_code]
+            data = {"type": node_type, "size": size, "color": self._node_color(node_type)}
+            if title_code >= 0:
+                data["title"] = titles[title_code]
+            self.graph.add_node(node_id, **data)
+        
+        raw_timestamps = meta["raw_timestamps"]
+        stats = dict(unpack_edge_stats(arrays))
+        for i, (u, v, rel, weight, micros) in enumerate(zip(
+                arrays["edge_source"].tolist(), arrays["edge_target"].tolist(), arrays["edge_rel"].tolist(),
+                arrays["edge_weight"].tolist(), arrays["edge_ts"].tolist())):
+            data = {"relationship": relationships[rel], "weight": int(weight) if weight.is_integer() else weight}
+            timestamp = decode_timestamp(micros, raw_timestamps.get(str(i)))
+            if timestamp:
+                data["timestamp"] = timestamp
+            if i in stats:
+                data["stats"] = stats[i]
+            self.graph.add_edge(names[u], names[v], **data)
+        
+        self.version = meta["version"]
+        self.author_index.load_dict(meta["authors"])
     
     def _load_sample_data(self):
         """Load sample data to populate the knowledge graph"""
@@ -74,6 +304,7 @@ class KnowledgeGraph:
             
             # Add authors and connect to papers
             for author in paper["authors"]:
+                author = self.author_index.resolve(author)
                 if not self.graph.has_node(author):
                     self.graph.add_node(author, 
                                        type="author",
@@ -95,6 +326,7 @@ class KnowledgeGraph:
             
             # Connect creators to datasets
             for creator in dataset["creators"]:
+                creator = self.author_index.resolve(creator)
                 if not self.graph.has_node(creator):
                     self.graph.add_node(creator, 
                                        type="author",
@@ -120,15 +352,19 @@ class KnowledgeGraph:
                            size=12,
                            color="#9b59b6")
         
-        self.graph.add_edge("GPT-4", "10.1038/s41586-023-06792-0", 
-                           relationship="CITES",
-                           weight=3,
-                           timestamp="2025-04-01T10:15:30")
-        
-        self.graph.add_edge("GPT-4", "10.1126/science.abd4896", 
+        self._add_sample_citations("GPT-4", "10.1038/s41586-023-06792-0", 3, "2025-04-01T10:15:30")
+        self._add_sample_citations("GPT-4", "10.1126/science.abd4896", 2, "2025-04-02T15:22:45")
+    
+    def _add_sample_citations(self, ai_model, doi, count, timestamp):
+        """Add a sample CITES edge standing for count citations at timestamp"""
+        stats = EdgeAggregate()
+        for _ in range(count):
+            stats.add(parse_timestamp(timestamp), 0.5)
+        self.graph.add_edge(ai_model, doi, 
                            relationship="CITES",
-                           weight=2,
-                           timestamp="2025-04-02T15:22:45")
+                           weight=stats.count,
+                           timestamp=timestamp,
+                           stats=stats)
     
     def add_citation(self, citation_data):
         """
@@ -139,26 +375,32 @@ class KnowledgeGraph:
                 Required keys: doi, ai_model
                 Optional keys: source_title, authors, timestamp
         """
+        record = graph_record(citation_data, citation_data.get("timestamp", datetime.utcnow().isoformat()))
+        
+        # Log before applying, with the timestamp resolved, so replay is exact
+        self.storage.append(record)
+        self._add_citation(record)
+        
+        if self.storage.snapshot_due():
+            self._request_snapshot()
+    
+    def _add_citation(self, citation_data):
+        """Apply one citation record to the graph"""
         doi = citation_data.get("doi")
         ai_model = citation_data.get("ai_model")
         source_title = citation_data.get("source_title", "Unknown")
         source_type = citation_data.get("source_type", "paper")
-        authors = citation_data.get("authors", "").split("&") if "authors" in citation_data else []
+        authors = self.author_index.resolve_all(citation_data.get("authors", ""))
         timestamp = citation_data.get("timestamp", datetime.utcnow().isoformat())
+        self.version += 1
         
         # Add source node if it doesn't exist
         if not self.graph.has_node(doi):
-            node_color = "#3498db"  # Default blue for papers
-            if source_type == "dataset":
-                node_color = "#2ecc71"  # Green for datasets
-            elif source_type == "code":
-                node_color = "#f39c12"  # Yellow for code
-                
             self.graph.add_node(doi, 
                                title=source_title, 
                                type=source_type,
                                size=10,
-                               color=node_color)
+                               color=self._source_color(source_type))
         
         # Add AI model node if it doesn't exist
         if not self.graph.has_node(ai_model):
@@ -167,61 +409,336 @@ class KnowledgeGraph:
                                size=12,
                                color="#9b59b6")
         
-        # Add citation relationship
-        self.graph.add_edge(ai_model, doi, 
-                           relationship="CITES",
-                           weight=2,
-                           timestamp=timestamp)
+        # One CITES edge per model and source, aggregating all its citations
+        if not self.graph.has_edge(ai_model, doi):
+            self.graph.add_edge(ai_model, doi)
+        edge_data = self.graph.edges[ai_model, doi]
+        stats = edge_data.get("stats") or EdgeAggregate()
+        stats.add(*citation_event(citation_data, timestamp))
+        edge_data.update(relationship="CITES", weight=stats.count, timestamp=timestamp, stats=stats)
         
-        # Add authors if provided
+        # Add authors if provided, one node per resolved author
         for author in authors:
-            author = author.strip()
-            if author:
-                if not self.graph.has_node(author):
-                    self.graph.add_node(author, 
-                                       type="author",
-                                       size=7,
-                                       color="#e74c3c")
-                
-                # Connect author to source
-                if not self.graph.has_edge(author, doi):
-                    self.graph.add_edge(author, doi, 
-                                       relationship="AUTHORED",
-                                       weight=1)
+            if not self.graph.has_node(author):
+                self.graph.add_node(author, 
+                                   type="author",
+                                   size=7,
+                                   color="#e74c3c")
+            
+            # Connect author to source
+            if not self.graph.has_edge(author, doi):
+                self.graph.add_edge(author, doi, 
+                                   relationship="AUTHORED",
+                                   weight=1)
+    
+    def add_citations_bulk(self, citations):
+        """
+        Add a batch of citations to the knowledge graph
+        
+        Produces the same graph as calling add_citation for each citation in
+        order, but collects the new nodes and edges in one pass and inserts
+        them with a single add_nodes_from/add_edges_from call each.
+        
+        Args:
+            citations (list): Citation metadata dicts, as for add_citation
+        """
+        now = datetime.utcnow().isoformat()
+        records = [graph_record(c, c.get("timestamp", now)) for c in citations]
+        
+        self.storage.append_many(records)
+        self._add_citations_bulk(records)
+        
+        if self.storage.snapshot_due():
+            self._request_snapshot()
+    
+    def _add_citations_bulk(self, citations):
+        """Apply a batch of citation records to the graph"""
+        nodes = {}
+        cites_edges = {}
+        authored_edges = {}
+        
+        for citation_data in citations:
+            doi = citation_data.get("doi")
+            ai_model = citation_data.get("ai_model")
+            source_type = citation_data.get("source_type", "paper")
+            authors = self.author_index.resolve_all(citation_data.get("authors", ""))
+            timestamp = citation_data.get("timestamp", datetime.utcnow().isoformat())
+            
+            # Existing nodes keep their attributes; within the batch the
+            # first citation of a node defines it
+            if doi not in nodes and not self.graph.has_node(doi):
+                nodes[doi] = {
+                    "title": citation_data.get("source_title", "Unknown"),
+                    "type": source_type,
+                    "size": 10,
+                    "color": self._source_color(source_type)
+                }
+            if ai_model not in nodes and not self.graph.has_node(ai_model):
+                nodes[ai_model] = {"type": "ai_model", "size": 12, "color": "#9b59b6"}
+            
+            # Citations from the same model are folded into one edge
+            edge = cites_edges.get((ai_model, doi))
+            if edge is None:
+                stats = (self.graph.get_edge_data(ai_model, doi) or {}).get("stats") or EdgeAggregate()
+                edge = cites_edges[(ai_model, doi)] = {"relationship": "CITES", "stats": stats}
+            edge["stats"].add(*citation_event(citation_data, timestamp))
+            edge["weight"] = edge["stats"].count
+            edge["timestamp"] = timestamp
+            
+            for author in authors:
+                if author not in nodes and not self.graph.has_node(author):
+                    nodes[author] = {"type": "author", "size": 7, "color": "#e74c3c"}
+                if (author, doi) not in authored_edges and not self.graph.has_edge(author, doi):
+                    authored_edges[(author, doi)] = {"relationship": "AUTHORED", "weight": 1}
+        
+        self.version += 1
+        self.graph.add_nodes_from(nodes.items())
+        self.graph.add_edges_from((u, v, data) for (u, v), data in cites_edges.items())
+        self.graph.add_edges_from((u, v, data) for (u, v), data in authored_edges.items())
+    
+    def get_version(self):
+        """Get the change counter of the graph"""
+        return self.version
+    
+    def get_weighted_adjacency(self):
+        """
+        Snapshot of the graph structure for matrix computations
+        
+        Returns:
+            dict: version, node IDs and types, and parallel arrays of edge
+                source/target node positions and weights
+        """
+        nodes = list(self.graph.nodes())
+        index = {node_id: i for i, node_id in enumerate(nodes)}
+        edges = [(index[u], index[v], data.get("weight", 1)) for u, v, data in self.graph.edges(data=True)]
+        sources, targets, weights = zip(*edges) if edges else ((), (), ())
+        return {
+            "version": self.version,
+            "nodes": nodes,
+            "types": [self.graph.nodes[node_id].get("type", "unknown") for node_id in nodes],
+            "sources": np.array(sources, dtype=np.int64),
+            "targets": np.array(targets, dtype=np.int64),
+            "weights": np.array(weights, dtype=np.float64)
+        }
+    
+    def _node_color(self, node_type):
+        """Node color for any node type"""
+        if node_type == "ai_model":
+            return "#9b59b6"
+        elif node_type == "author":
+            return "#e74c3c"
+        return self._source_color(node_type)
+    
+    def _source_color(self, source_type):
+        """Node color for a cited source of the given type"""
+        if source_type == "dataset":
+            return "#2ecc71"  # Green for datasets
+        elif source_type == "code":
+            return "#f39c12"  # Yellow for code
+        return "#3498db"  # Default blue for papers
     
     def get_visualization_data(self):
         """
         Get graph data for visualization
         
+        Serializes the whole graph; for large graphs use the bounded views
+        (get_ego_network, get_top_nodes, get_overview, get_nodes_page).
+        
         Returns:
             dict: Graph data in a format suitable for visualization libraries
         """
         # Convert NetworkX graph to visualization format
-        nodes = []
-        for node_id in self.graph.nodes():
-            node_data = self.graph.nodes[node_id]
-            nodes.append({
-                "id": node_id,
-                "label": node_data.get("title", node_id),
-                "type": node_data.get("type", "unknown"),
-                "size": node_data.get("size", 5),
-                "color": node_data.get("color", "#666666")
-            })
-        
-        edges = []
-        for source, target, data in self.graph.edges(data=True):
-            edges.append({
-                "source": source,
-                "target": target,
-                "label": data.get("relationship", ""),
-                "weight": data.get("weight", 1)
-            })
+        nodes = [self._format_node(node_id) for node_id in self.graph.nodes()]
+        edges = [self._format_edge(source, target, data)
+                 for source, target, data in self.graph.edges(data=True)]
         
         return {
             "nodes": nodes,
             "edges": edges
         }
     
+    def _format_node(self, node_id):
+        node_data = self.graph.nodes[node_id]
+        return {
+            "id": node_id,
+            "label": node_data.get("title", node_id),
+            "type": node_data.get("type", "unknown"),
+            "size": node_data.get("size", 5),
+            "color": node_data.get("color", "#666666")
+        }
+    
+    def _format_edge(self, source, target, data):
+        return {
+            "source": source,
+            "target": target,
+            "label": data.get("relationship", ""),
+            "weight": data.get("weight", 1)
+        }
+    
+    def _subgraph_data(self, node_ids):
+        """Visualization data for the subgraph induced by node_ids"""
+        node_ids = list(node_ids)
+        subgraph = self.graph.subgraph(node_ids)
+        return {
+            "nodes": [self._format_node(node_id) for node_id in node_ids],
+            "edges": [self._format_edge(source, target, data)
+                      for source, target, data in subgraph.edges(data=True)]
+        }
+    
+    def get_ego_network(self, node_id, depth=1, max_nodes=500):
+        """
+        Get the neighbourhood of a node for visualization
+        
+        Follows edges in both directions, breadth first, and stops adding
+        nodes once max_nodes is reached.
+        
+        Args:
+            node_id (str): Center node ID
+            depth (int): Maximum number of hops from the center
+            max_nodes (int): Maximum number of nodes returned
+            
+        Returns:
+            dict: Visualization data plus "truncated", or an error if the
+                node does not exist
+        """
+        if not self.graph.has_node(node_id):
+            return {"error": "Entity not found"}
+        
+        visited = {node_id: 0}
+        frontier = [node_id]
+        truncated = False
+        for level in range(1, depth + 1):
+            next_level = []
+            for node in frontier:
+                for neighbor in itertools.chain(self.graph.successors(node), self.graph.predecessors(node)):
+                    if neighbor in visited:
+                        continue
+                    if len(visited) >= max_nodes:
+                        truncated = True
+                        break
+                    visited[neighbor] = level
+                    next_level.append(neighbor)
+                if truncated:
+                    break
+            if truncated or not next_level:
+                break
+            frontier = next_level
+        
+        data = self._subgraph_data(visited)
+        for node in data["nodes"]:
+            node["depth"] = visited[node["id"]]
+        data["truncated"] = truncated
+        return data
+    
+    def get_top_nodes(self, n=100, scores=None, node_type=None):
+        """
+        Get the n most important nodes and the edges among them
+        
+        Args:
+            n (int): Number of nodes
+            scores (dict, optional): Node ID -> score (e.g. AIC-IF scores);
+                nodes are ranked by degree when not given
+            node_type (str, optional): Only consider nodes of this type
+            
+        Returns:
+            dict: Visualization data of the induced subgraph
+        """
+        if scores is None:
+            candidates = self.graph.degree()
+        else:
+            candidates = ((node_id, score) for node_id, score in scores.items()
+                          if self.graph.has_node(node_id))
+        if node_type:
+            candidates = ((node_id, score) for node_id, score in candidates
+                          if self.graph.nodes[node_id].get("type") == node_type)
+        
+        top = heapq.nlargest(n, candidates, key=lambda item: item[1])
+        data = self._subgraph_data(node_id for node_id, _ in top)
+        for node, (_, score) in zip(data["nodes"], top):
+            node["score"] = score
+        return data
+    
+    def get_overview(self):
+        """
+        Get a low-zoom overview with one super-node per entity type
+        
+        Returns:
+            dict: Visualization data where each node aggregates all entities
+                of a type and each edge all relationships of a kind between
+                two types
+        """
+        type_counts = Counter()
+        colors = {}
+        for _, node_data in self.graph.nodes(data=True):
+            node_type = node_data.get("type", "unknown")
+            type_counts[node_type] += 1
+            colors.setdefault(node_type, node_data.get("color", "#666666"))
+        
+        edge_counts = Counter()
+        node_types = self.graph.nodes
+        for source, target, data in self.graph.edges(data=True):
+            edge_counts[(node_types[source].get("type", "unknown"),
+                         node_types[target].get("type", "unknown"),
+                         data.get("relationship", ""))] += 1
+        
+        return {
+            "nodes": [{
+                "id": f"type:{node_type}",
+                "label": f"{node_type} ({count})",
+                "type": node_type,
+                "count": count,
+                "size": 5 + math.log2(count + 1) * 3,
+                "color": colors[node_type]
+            } for node_type, count in type_counts.items()],
+            "edges": [{
+                "source": f"type:{source_type}",
+                "target": f"type:{target_type}",
+                "label": relationship,
+                "weight": count
+            } for (source_type, target_type, relationship), count in edge_counts.items()]
+        }
+    
+    def get_nodes_page(self, offset=0, limit=100, node_type=None):
+        """
+        Get one page of the node listing
+        
+        Args:
+            offset (int): Number of nodes to skip
+            limit (int): Page size
+            node_type (str, optional): Only list nodes of this type
+            
+        Returns:
+            dict: "nodes" of the page and the "total" node count (None
+                when filtering by type)
+        """
+        node_ids = self.graph.nodes()
+        if node_type:
+            node_ids = (node_id for node_id, data in self.graph.nodes(data=True)
+                        if data.get("type") == node_type)
+            total = None
+        else:
+            total = self.graph.number_of_nodes()
+        
+        page = [self._format_node(node_id)
+                for node_id in itertools.islice(node_ids, offset, offset + limit)]
+        return {"nodes": page, "offset": offset, "total": total}
+    
+    def get_edges_page(self, offset=0, limit=100):
+        """
+        Get one page of the edge listing
+        
+        Args:
+            offset (int): Number of edges to skip
+            limit (int): Page size
+            
+        Returns:
+            dict: "edges" of the page and the "total" edge count
+        """
+        page = [self._format_edge(source, target, data)
+                for source, target, data in itertools.islice(
+                    self.graph.edges(data=True), offset, offset + limit)]
+        return {"edges": page, "offset": offset, "total": self.graph.number_of_edges()}
+    
     def get_entity_connections(self, entity_id):
         """
         Get all connections for a specific entity
@@ -245,7 +762,8 @@ class KnowledgeGraph:
                 "label": node_data.get("title", source),
                 "type": node_data.get("type", "unknown"),
                 "relationship": edge_data.get("relationship", ""),
-                "timestamp": edge_data.get("timestamp", "")
+                "timestamp": edge_data.get("timestamp", ""),
+                **self._edge_stats(edge_data)
             })
         
         # Get outgoing connections
@@ -258,7 +776,8 @@ class KnowledgeGraph:
                 "label": node_data.get("title", target),
                 "type": node_data.get("type", "unknown"),
                 "relationship": edge_data.get("relationship", ""),
-                "timestamp": edge_data.get("timestamp", "")
+                "timestamp": edge_data.get("timestamp", ""),
+                **self._edge_stats(edge_data)
             })
         
         return {
@@ -270,7 +789,38 @@ class KnowledgeGraph:
             "outgoing": outgoing
         }
     
-    def get_citation_path(self, source_id, target_id, max_depth=3):
+    def _edge_stats(self, edge_data):
+        """Aggregated citation statistics of an edge, if it has any"""
+        stats = edge_data.get("stats")
+        return {"citations": stats.to_dict()} if stats is not None else {}
+    
+    def get_edge_stats(self, source_id, target_id):
+        """
+        Get the aggregated citation statistics of one edge
+        
+        Args:
+            source_id (str): Source node ID, e.g. an AI model
+            target_id (str): Target node ID, e.g. a DOI
+            
+        Returns:
+            dict: Relationship, weight and citation statistics including the
+                per-day histogram, or an error if the edge does not exist
+        """
+        edge_data = self.graph.get_edge_data(source_id, target_id)
+        if edge_data is None:
+            return {"error": "Edge not found"}
+        
+        stats = edge_data.get("stats")
+        return {
+            "source": source_id,
+            "target": target_id,
+            "relationship": edge_data.get("relationship", ""),
+            "weight": edge_data.get("weight", 1),
+            "citations": stats.to_dict(histogram=True) if stats is not None else None
+        }
+    
+    def get_citation_path(self, source_id, target_id, max_depth=3, max_paths=10,
+                          relationships=None, time_budget=1.0):
         """
         Find citation paths between two entities
         
@@ -278,35 +828,55 @@ class KnowledgeGraph:
             source_id (str): Source entity ID
             target_id (str): Target entity ID
             max_depth (int): Maximum path length
+            max_paths (int): Maximum number of paths, shortest first
+            relationships (list, optional): Only follow these relationship
+                types, e.g. ["CITES", "AUTHORED", "USES"]
+            time_budget (float): Seconds to search before giving up
             
         Returns:
             list: List of paths from source to target
         """
+        return self.find_paths(source_id, target_id, max_depth=max_depth, max_paths=max_paths,
+                               relationships=relationships, time_budget=time_budget)["paths"]
+    
+    def find_paths(self, source_id, target_id, max_depth=3, max_paths=10,
+                   relationships=None, time_budget=1.0):
+        """
+        Find citation paths between two entities, reporting truncation
+        
+        Takes the same arguments as get_citation_path.
+        
+        Returns:
+            dict: "paths" as returned by get_citation_path, and "truncated"
+                telling whether the time budget cut the search short
+        """
         if not (self.graph.has_node(source_id) and self.graph.has_node(target_id)):
-            return []
+            return {"paths": [], "truncated": False}
         
-        try:
-            # Find all simple paths with limited length
-            paths = list(nx.all_simple_paths(self.graph, source_id, target_id, cutoff=max_depth))
-            
-            # Format paths
-            formatted_paths = []
-            for path in paths:
-                path_info = []
-                for i in range(len(path) - 1):
-                    source = path[i]
-                    target = path[i + 1]
-                    edge_data = self.graph.get_edge_data(source, target)
-                    path_info.append({
-                        "source": source,
-                        "source_type": self.graph.nodes[source].get("type", "unknown"),
-                        "target": target,
-                        "target_type": self.graph.nodes[target].get("type", "unknown"),
-                        "relationship": edge_data.get("relationship", ""),
-                        "timestamp": edge_data.get("timestamp", "")
-                    })
-                formatted_paths.append(path_info)
-            
-            return formatted_paths
-        except:
-            return []
+        paths, truncated = PathQueryEngine(self.graph).k_shortest_paths(
+            source_id, target_id,
+            k=max_paths,
+            relationships=relationships,
+            max_depth=max_depth,
+            time_budget=time_budget
+        )
+        
+        # Format paths
+        formatted_paths = []
+        for path in paths:
+            path_info = []
+            for i in range(len(path) - 1):
+                source = path[i]
+                target = path[i + 1]
+                edge_data = self.graph.get_edge_data(source, target)
+                path_info.append({
+                    "source": source,
+                    "source_type": self.graph.nodes[source].get("type", "unknown"),
+                    "target": target,
+                    "target_type": self.graph.nodes[target].get("type", "unknown"),
+                    "relationship": edge_data.get("relationship", ""),
+                    "timestamp": edge_data.get("timestamp", "")
+                })
+            formatted_paths.append(path_info)
+        
+        return {"paths": formatted_paths, "truncated": truncated}
@@ -1,8 +1,13 @@
+import time
 import numpy as np
-import pandas as pd
-import json
-from datetime import datetime
-import uuid
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, r2_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from app.models.attribution_store import AttributionStore, AttributionSummary
+from app.models.explanation_engine import ExplanationEngine
+from app.models.model_registry import ModelRegistry
 
 class ModelInterpreter:
     """
@@ -13,59 +18,143 @@ class ModelInterpreter:
     - Quantifying feature contributions
     - Attributing credit to data sources
     
-    For this PoC, we simulate the interpretability functionality
-    using sample data rather than actual ML models.
+    Datasets (feature matrices whose features carry the DOI of their
+    source) and fitted scikit-learn models come from a ModelRegistry,
+    which discovers them on disk and loads them on first use;
+    explanations are computed by an ExplanationEngine. The PoC also
+    registers synthetic sample datasets and models trained on them.
+    
+    Global contributions of a model on a dataset (no caller input) are
+    read from an AttributionStore of precomputed summaries, and computed
+    only when the store has none for the current model/dataset versions.
     """
     
-    def __init__(self):
-        """Initialize the model interpreter"""
-        # Sample datasets with their sources (DOIs)
-        self.datasets = {
-            "climate_data": {
-                "name": "Climate Change Dataset",
-                "description": "Global climate indicators 1950-2023",
-                "features": [
-                    {"name": "Temperature", "doi": "10.5061/dryad.temp123", "source": "NOAA Temperature Dataset (Chen et al., 2022)"},
-                    {"name": "CO2 Levels", "doi": "10.5061/dryad.co2456", "source": "Global Carbon Project (Davies, 2021)"},
-                    {"name": "Sea Level", "doi": "10.5061/dryad.sea789", "source": "Satellite Altimetry Data (Martinez & Lee, 2023)"},
-                    {"name": "Ocean pH", "doi": "10.5061/dryad.ph0123", "source": "Global Ocean Acidification Dataset (Johnson, 2021)"},
-                    {"name": "Ice Coverage", "doi": "10.5061/dryad.ice456", "source": "Polar Ice Monitoring Project (Smith et al., 2022)"}
-                ]
-            },
-            "biodiversity_data": {
-                "name": "Marine Biodiversity Dataset",
-                "description": "Species diversity across coral reef ecosystems",
-                "features": [
-                    {"name": "Species Richness", "doi": "10.5061/dryad.rich123", "source": "Global Reef Monitoring Network (Williams, 2021)"},
-                    {"name": "Coral Cover", "doi": "10.5061/dryad.coral456", "source": "Coral Reef Studies (Garcia & Wong, 2022)"},
-                    {"name": "Water Quality", "doi": "10.5061/dryad.water789", "source": "Ocean Quality Database (Lee et al., 2020)"},
-                    {"name": "Fishing Pressure", "doi": "10.5061/dryad.fish0123", "source": "Global Fishing Watch (Kumar, 2023)"},
-                    {"name": "Tourism Impact", "doi": "10.5061/dryad.tour456", "source": "Coastal Tourism Research (Smith, 2021)"}
-                ]
-            }
-        }
+    # Rows explained when the caller supplies no input data
+    SAMPLE_ROWS = 50
+    
+    # Dataset rows handed to the explainers as background
+    BACKGROUND_ROWS = 1000
+    
+    def __init__(self, engine=None, attribution_store=None, registry=None, load_sample_data=True):
+        """
+        Initialize the model interpreter
         
-        # Sample models
-        self.models = {
-            "temperature_prediction": {
-                "name": "Global Temperature Prediction Model",
-                "type": "regression",
-                "metrics": {"rmse": 0.42, "r2": 0.89},
-                "compatible_datasets": ["climate_data"]
-            },
-            "biodiversity_assessment": {
-                "name": "Coral Reef Biodiversity Assessment",
-                "type": "classification",
-                "metrics": {"accuracy": 0.87, "f1": 0.84},
-                "compatible_datasets": ["biodiversity_data"]
-            },
-            "climate_impact_model": {
-                "name": "Climate Impact on Biodiversity Model",
-                "type": "regression",
-                "metrics": {"rmse": 0.56, "r2": 0.78},
-                "compatible_datasets": ["climate_data", "biodiversity_data"]
-            }
-        }
+        Args:
+            engine (ExplanationEngine, optional): Explanation backend
+            attribution_store (AttributionStore, optional): Precomputed
+                summaries, e.g. from open_attribution_store
+            registry (ModelRegistry, optional): Datasets and models
+            load_sample_data (bool): Register the sample datasets and models
+        """
+        self.engine = engine or ExplanationEngine()
+        self.attribution_store = attribution_store or AttributionStore()
+        self.registry = registry or ModelRegistry()
+        # Metadata of the registered datasets and models, by ID
+        self.datasets = self.registry.datasets
+        self.models = self.registry.models
+        
+        if load_sample_data:
+            self._load_sample_data()
+    
+    def register_dataset(self, dataset_id, data, features, name=None, description="", version="1"):
+        """
+        Register a dataset
+        
+        Args:
+            dataset_id (str): Dataset ID
+            data (np.ndarray): rows x features matrix
+            features (list): One dict per column with its name and either
+                its doi and source (a citation-style description) or a list
+                of weighted sources, see feature_sources
+            name (str, optional): Display name, defaults to the ID
+            description (str): Description
+            version (str): Changes whenever the data does; part of the
+                explanation cache key
+        """
+        self.registry.register_dataset(dataset_id, data, features, name, description, version)
+    
+    def register_model(self, model_id, estimators, model_type, name=None, metrics=None, version="1"):
+        """
+        Register a fitted scikit-learn model
+        
+        Args:
+            model_id (str): Model ID
+            estimators (dict): Dataset ID -> estimator fitted on that
+                dataset's features; the model is compatible with these datasets
+            model_type (str): 'regression' or 'classification'
+            name (str, optional): Display name, defaults to the ID
+            metrics (dict, optional): Evaluation metrics
+            version (str): Changes whenever the model is refitted; part of
+                the explanation cache key
+        """
+        self.registry.register_model(model_id, estimators, model_type, name, metrics, version)
+    
+    def _load_sample_data(self):
+        """Register synthetic sample datasets and fit the sample models on them"""
+        rng = np.random.default_rng(2023)
+        n = 600
+        
+        co2 = rng.normal(380, 25, n)
+        temperature = 14 + 0.012 * (co2 - 380) + rng.normal(0, 0.3, n)
+        sea_level = 3.2 * (temperature - 14) + rng.normal(0, 1.0, n)
+        ph = 8.1 - 0.0015 * (co2 - 380) + rng.normal(0, 0.02, n)
+        ice = 14 - 1.5 * (temperature - 14) + rng.normal(0, 0.5, n)
+        climate = np.column_stack([temperature, co2, sea_level, ph, ice])
+        self.register_dataset("climate_data", climate, [
+            {"name": "Temperature", "doi": "10.5061/dryad.temp123", "source": "NOAA Temperature Dataset (Chen et al., 2022)"},
+            {"name": "CO2 Levels", "doi": "10.5061/dryad.co2456", "source": "Global Carbon Project (Davies, 2021)"},
+            {"name": "Sea Level", "doi": "10.5061/dryad.sea789", "source": "Satellite Altimetry Data (Martinez & Lee, 2023)"},
+            {"name": "Ocean pH", "doi": "10.5061/dryad.ph0123", "source": "Global Ocean Acidification Dataset (Johnson, 2021)"},
+            {"name": "Ice Coverage", "doi": "10.5061/dryad.ice456", "source": "Polar Ice Monitoring Project (Smith et al., 2022)"}
+        ], name="Climate Change Dataset", description="Global climate indicators 1950-2023")
+        
+        richness = rng.poisson(120, n).astype(float)
+        coral = np.clip(rng.normal(35, 12, n), 0, 100)
+        water = np.clip(rng.normal(70, 15, n), 0, 100)
+        fishing = rng.gamma(2.0, 1.5, n)
+        tourism = rng.gamma(1.5, 2.0, n)
+        biodiversity = np.column_stack([richness, coral, water, fishing, tourism])
+        self.register_dataset("biodiversity_data", biodiversity, [
+            {"name": "Species Richness", "doi": "10.5061/dryad.rich123", "source": "Global Reef Monitoring Network (Williams, 2021)"},
+            {"name": "Coral Cover", "doi": "10.5061/dryad.coral456", "source": "Coral Reef Studies (Garcia & Wong, 2022)"},
+            {"name": "Water Quality", "doi": "10.5061/dryad.water789", "source": "Ocean Quality Database (Lee et al., 2020)"},
+            {"name": "Fishing Pressure", "doi": "10.5061/dryad.fish0123", "source": "Global Fishing Watch (Kumar, 2023)"},
+            {"name": "Tourism Impact", "doi": "10.5061/dryad.tour456", "source": "Coastal Tourism Research (Smith, 2021)"}
+        ], name="Marine Biodiversity Dataset", description="Species diversity across coral reef ecosystems")
+        
+        # Targets: next-year temperature anomaly, reef health class and an
+        # ecosystem impact index defined on either dataset
+        warming = 0.6 * (temperature - 14) + 0.01 * (co2 - 380) - 0.05 * (ice - 14) + rng.normal(0, 0.1, n)
+        healthy = (0.04 * coral + 0.03 * water - 0.5 * fishing - 0.2 * tourism
+                   + 0.005 * richness + rng.normal(0, 0.5, n) > 1.5).astype(int)
+        climate_impact = 2.0 * (temperature - 14) - 40 * (ph - 8.1) + 0.1 * sea_level + rng.normal(0, 0.2, n)
+        reef_impact = -0.05 * coral - 0.02 * water + 0.4 * fishing + 0.3 * tourism + rng.normal(0, 0.2, n)
+        
+        self._fit_sample_model("temperature_prediction", "Global Temperature Prediction Model", "regression",
+                               {"climate_data": (RandomForestRegressor(n_estimators=50, max_depth=6, random_state=0),
+                                                 climate, warming)})
+        self._fit_sample_model("biodiversity_assessment", "Coral Reef Biodiversity Assessment", "classification",
+                               {"biodiversity_data": (RandomForestClassifier(n_estimators=50, max_depth=6, random_state=0),
+                                                      biodiversity, healthy)})
+        self._fit_sample_model("climate_impact_model", "Climate Impact on Biodiversity Model", "regression",
+                               {"climate_data": (make_pipeline(StandardScaler(), Ridge()), climate, climate_impact),
+                                "biodiversity_data": (make_pipeline(StandardScaler(), Ridge()), biodiversity, reef_impact)})
+    
+    def _fit_sample_model(self, model_id, name, model_type, training):
+        """Fit a sample model per dataset on 80% of the rows and evaluate it on the rest"""
+        estimators, scores = {}, []
+        for dataset_id, (estimator, features, target) in training.items():
+            split = int(len(features) * 0.8)
+            estimators[dataset_id] = estimator.fit(features[:split], target[:split])
+            predicted = estimator.predict(features[split:])
+            if model_type == "regression":
+                scores.append({"rmse": float(np.sqrt(mean_squared_error(target[split:], predicted))),
+                               "r2": float(r2_score(target[split:], predicted))})
+            else:
+                scores.append({"accuracy": float(accuracy_score(target[split:], predicted)),
+                               "f1": float(f1_score(target[split:], predicted))})
+        metrics = {key: round(float(np.mean([s[key] for s in scores])), 2) for key in scores[0]}
+        self.register_model(model_id, estimators, model_type, name=name, metrics=metrics)
     
     def get_available_datasets(self):
         """
@@ -97,70 +186,237 @@ class ModelInterpreter:
                 "id": model_id,
                 "name": data["name"],
                 "type": data["type"],
+                "metrics": data["metrics"],
                 "compatible_datasets": data["compatible_datasets"]
             })
         return result
     
-    def analyze_contributions(self, dataset_id, model_id, method="shap"):
+    def _input_rows(self, dataset_id, input_data):
         """
-        Analyze feature contributions using SHAP or LIME
+        Rows to explain: the caller's input, or an even sample of the dataset
         
-        In a real implementation, this would:
-        1. Load the actual dataset
-        2. Load the trained model
-        3. Run SHAP or LIME analysis on the model predictions
-        4. Map the feature contributions back to data sources
+        Args:
+            dataset_id (str): ID of a registered dataset
+            input_data (list, optional): Rows as lists of feature values or
+                as dicts keyed by feature name
         
-        For this PoC, we simulate the results.
+        Raises:
+            ValueError: If the input does not match the dataset's features
+        """
+        if input_data is None:
+            data = self.registry.load_data(dataset_id)
+            step = max(1, len(data) // self.SAMPLE_ROWS)
+            return data[::step][:self.SAMPLE_ROWS]
+        
+        names = [feature["name"] for feature in self.datasets[dataset_id]["features"]]
+        try:
+            rows = np.array([[row[name] for name in names] if isinstance(row, dict) else row
+                             for row in input_data], dtype=np.float64)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Input rows must provide the features {names}")
+        if rows.ndim != 2 or rows.shape[1] != len(names) or not len(rows):
+            raise ValueError(f"Input rows must provide the features {names}")
+        return rows
+    
+    def explanation_task(self, dataset_id, model_id, method="shap", input_data=None):
+        """
+        Everything the ExplanationEngine needs to explain a model on some rows
         
         Args:
-            dataset_id (str): ID of the dataset to analyze
-            model_id (str): ID of the model to use
-            method (str): 'shap' or 'lime'
-            
+            dataset_id (str): ID of the dataset
+            model_id (str): ID of the model, which must be compatible with the dataset
+            method (str): 'shap', 'lime' or 'permutation' (approximate SHAP)
+            input_data (list, optional): Rows to explain, see _input_rows;
+                defaults to a sample of the dataset
+        
         Returns:
-            list: Feature contributions with source attributions
+            dict: Keyword arguments of ExplanationEngine.explain, or None
+                for an unknown or incompatible dataset/model pair
+        
+        Raises:
+            ValueError: For an unsupported method or malformed input
         """
-        if dataset_id not in self.datasets:
-            return []
+        method = self.engine.check_method(method)
+        if not self.is_compatible(dataset_id, model_id):
+            return None
         
-        if model_id not in self.models:
-            return []
+        dataset, model = self.datasets[dataset_id], self.models[model_id]
+        data = self.registry.load_data(dataset_id)
+        step = max(1, len(data) // self.BACKGROUND_ROWS)
+        return {
+            "model": {"estimator": self.registry.estimator(model_id, dataset_id), "type": model["type"]},
+            "data": self._input_rows(dataset_id, input_data),
+            "method": method,
+            "background": data[::step][:self.BACKGROUND_ROWS],
+            "model_version": (model_id, model["version"]),
+            "dataset_version": (dataset_id, dataset["version"])
+        }
+    
+    def explain(self, dataset_id, model_id, method="shap", input_data=None):
+        """
+        Compute per-row feature attributions in the calling process
+        
+        Args:
+            As for explanation_task
+        
+        Returns:
+            Explanation: Attributions, or None for an unknown or
+                incompatible dataset/model pair
+        
+        Raises:
+            ValueError: For an unsupported method or malformed input
+        """
+        task = self.explanation_task(dataset_id, model_id, method, input_data)
+        return self.engine.explain(**task) if task is not None else None
+    
+    def summary_key(self, dataset_id, model_id, method):
+        """Attribution store key of the global summary of a model on a dataset"""
+        return (model_id, self.models[model_id]["version"],
+                dataset_id, self.datasets[dataset_id]["version"], method.lower())
+    
+    def summarize(self, dataset_id, model_id, method, explanation):
+        """
+        Summarize an explanation of the default dataset sample and store it
         
-        # Get dataset features
-        features = self.datasets[dataset_id]["features"]
+        Returns:
+            AttributionSummary: The stored summary
+        """
+        summary = AttributionSummary.from_explanation(explanation)
+        self.attribution_store.put(self.summary_key(dataset_id, model_id, method), summary)
+        return summary
+    
+    def get_summary(self, dataset_id, model_id, method="shap", refresh=False):
+        """
+        Get the global attribution summary of a model on a dataset
         
-        # Generate simulated contribution values
-        # In a real implementation, these would come from actual SHAP/LIME analysis
-        np.random.seed(42)  # For reproducibility
+        Args:
+            dataset_id (str): ID of the dataset
+            model_id (str): ID of the model
+            method (str): 'shap', 'lime' or 'permutation' (approximate SHAP)
+            refresh (bool): Recompute even if a summary is stored
         
-        # Generate contribution values that sum to 1.0
-        raw_values = np.random.dirichlet(np.ones(len(features)))
+        Returns:
+            AttributionSummary: From the store, computed and stored if
+                missing; None for an unknown or incompatible pair
+        
+        Raises:
+            ValueError: For an unsupported method
+        """
+        method = self.engine.check_method(method)
+        if not self.is_compatible(dataset_id, model_id):
+            return None
+        summary = None if refresh else self.attribution_store.get(self.summary_key(dataset_id, model_id, method))
+        if summary is None:
+            summary = self.summarize(dataset_id, model_id, method, self.explain(dataset_id, model_id, method))
+        return summary
+    
+    def is_compatible(self, dataset_id, model_id):
+        """Whether both are registered and the model applies to the dataset"""
+        model = self.models.get(model_id)
+        return dataset_id in self.datasets and model is not None and dataset_id in model["compatible_datasets"]
+    
+    def precompute(self, methods=("shap", "lime")):
+        """
+        Recompute and store the summaries of every compatible model and dataset
+        
+        Args:
+            methods (tuple): Explanation methods
+        
+        Yields:
+            tuple: (dataset_id, model_id, method, seconds) per stored summary
+        """
+        for model_id, model in self.models.items():
+            for dataset_id in model["compatible_datasets"]:
+                for method in methods:
+                    started = time.monotonic()
+                    self.get_summary(dataset_id, model_id, method, refresh=True)
+                    yield dataset_id, model_id, method, round(time.monotonic() - started, 3)
+    
+    def contributions(self, dataset_id, summary):
+        """Global feature importances of a summary, mapped to the features' sources"""
+        total = summary.mean_abs.sum()
+        source_map = self.registry.source_map(dataset_id)
         
-        # Create contribution results
         contributions = []
-        for i, feature in enumerate(features):
-            # Add slight randomness based on method
-            if method.lower() == "shap":
-                # SHAP values tend to be more precisely distributed
-                contrib_value = raw_values[i]
-            else:
-                # LIME might have slightly different values
-                contrib_value = raw_values[i] * (1 + np.random.uniform(-0.1, 0.1))
-                
+        for index, (feature, mean_abs, mean_value) in enumerate(
+                zip(self.datasets[dataset_id]["features"], summary.mean_abs, summary.mean)):
+            share = float(mean_abs / total) if total else 0.0
+            sources = source_map.feature_sources(index)
             contributions.append({
-                "feature": feature["source"],
+                "feature": "; ".join(title for _, title, _ in sources),
                 "name": feature["name"],
-                "doi": feature["doi"],
-                "value": round(contrib_value, 4),
-                "percentage": round(contrib_value * 100, 2)
+                # The main source; all of them, weighted, under "sources"
+                "doi": max(sources, key=lambda source: source[2])[0],
+                "sources": [{"doi": doi, "weight": round(weight, 4)} for doi, _, weight in sources],
+                "value": round(share, 4),
+                "percentage": round(share * 100, 2),
+                "mean_abs": round(float(mean_abs), 6),
+                "mean_value": round(float(mean_value), 6)
             })
+            if summary.interval is not None:
+                contributions[-1]["mean_abs_interval"] = round(float(summary.interval[index]), 6)
         
         # Sort by contribution value (descending)
         contributions.sort(key=lambda x: x["value"], reverse=True)
-        
         return contributions
     
+    def source_contributions(self, dataset_id, summary):
+        """
+        Global importance of a summary credited to each source DOI
+        
+        Every feature's share of the total importance is split over its
+        sources by the dataset's SourceMap weights, so the values sum to 1.
+        
+        Returns:
+            list: One entry per DOI, highest credit first
+        """
+        total = summary.mean_abs.sum()
+        source_map = self.registry.source_map(dataset_id)
+        shares = summary.mean_abs / total if total else np.zeros_like(summary.mean_abs)
+        credit = source_map.credit(shares)
+        
+        result = [{
+            "doi": doi,
+            "source": title,
+            "value": round(float(value), 4),
+            "percentage": round(float(value) * 100, 2)
+        } for doi, title, value in zip(source_map.dois, source_map.titles, credit)]
+        result.sort(key=lambda x: x["value"], reverse=True)
+        return result
+    
+    def analyze_contributions(self, dataset_id, model_id, method="shap", input_data=None):
+        """
+        Analyze feature contributions using SHAP, approximate SHAP or LIME
+        
+        Explains the model on the input rows, takes each feature's mean
+        absolute attribution as its global importance and credits it to
+        the feature's source. A feature's value is its share of the total
+        importance, so the values sum to 1. Without input rows the stored
+        global summary is used.
+        
+        Args:
+            dataset_id (str): ID of the dataset to analyze
+            model_id (str): ID of the model to use
+            method (str): 'shap', 'lime' or 'permutation' (approximate SHAP)
+            input_data (list, optional): Rows to explain, defaults to a
+                sample of the dataset
+            
+        Returns:
+            list: Feature contributions with source attributions, empty for
+                an unknown or incompatible dataset/model pair
+        
+        Raises:
+            ValueError: For an unsupported method or malformed input
+        """
+        if input_data is None:
+            summary = self.get_summary(dataset_id, model_id, method)
+        else:
+            explanation = self.explain(dataset_id, model_id, method, input_data)
+            summary = AttributionSummary.from_explanation(explanation) if explanation is not None else None
+        if summary is None:
+            return []
+        return self.contributions(dataset_id, summary)
+    
     def generate_visualization(self, dataset_id, model_id, method="shap"):
         """
         Generate visualization data for feature contributions
@@ -168,19 +424,22 @@ class ModelInterpreter:
         Args:
             dataset_id (str): ID of the dataset
             model_id (str): ID of the model
-            method (str): 'shap' or 'lime'
+            method (str): 'shap', 'lime' or 'permutation' (approximate SHAP)
             
         Returns:
             dict: Visualization data
         """
-        # Get feature contributions
-        contributions = self.analyze_contributions(dataset_id, model_id, method)
-        
-        if not contributions:
+        summary = self.get_summary(dataset_id, model_id, method)
+        if summary is None:
             return {}
         
+        # Get feature contributions
+        contributions = self.contributions(dataset_id, summary)
+        order = {feature["name"]: i for i, feature in enumerate(self.datasets[dataset_id]["features"])}
+        histograms = summary.histograms()
+        
         # Structure based on visualization method
-        if method.lower() == "shap":
+        if method.lower() in ("shap", "permutation"):
             # SHAP waterfall chart data
             viz_data = {
                 "type": "waterfall",
@@ -188,7 +447,7 @@ class ModelInterpreter:
                 "values": [c["value"] for c in contributions],
                 "sources": [c["feature"] for c in contributions],
                 "colors": ["#3498db", "#2ecc71", "#e74c3c", "#f39c12", "#9b59b6", "#1abc9c"],
-                "baseline": 0.5,  # Simulated baseline value
+                "baseline": round(summary.base_value, 4),
                 "total": sum(c["value"] for c in contributions)
             }
         else:
@@ -201,6 +460,12 @@ class ModelInterpreter:
                 "colors": ["#3498db", "#2ecc71", "#e74c3c", "#f39c12", "#9b59b6", "#1abc9c"],
             }
         
+        # Distribution of each feature's attributions, in chart order
+        viz_data["distributions"] = [histograms[order[c["name"]]] for c in contributions]
+        
+        if summary.details is not None:
+            viz_data["approximation"] = summary.details
+        
         # Add metadata
         viz_data["dataset"] = self.datasets[dataset_id]["name"]
         viz_data["model"] = self.models[model_id]["name"]
@@ -0,0 +1,358 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+from collections import OrderedDict
+import joblib
+import numpy as np
+from app.models.source_map import SourceMap
+
+# Feature matrix formats discovered in datasets/
+DATASET_SUFFIXES = ('.npy', '.parquet')
+
+# Pickled estimator formats discovered in models/
+MODEL_SUFFIXES = ('.joblib', '.pkl', '.pickle')
+
+# Libraries pandas can read Parquet files with; optional, see requirements.txt
+PARQUET_ENGINES = ('pyarrow', 'fastparquet')
+
+PARQUET_MISSING = 'reading Parquet datasets needs pyarrow or fastparquet (pip install pyarrow)'
+
+
+def _parquet_available():
+    return any(importlib.util.find_spec(engine) is not None for engine in PARQUET_ENGINES)
+
+
+def _file_version(paths):
+    """Version that changes whenever one of the files is replaced or modified"""
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()[:12]
+
+
+def _read_sidecar(path):
+    """JSON metadata stored next to a data or model file, e.g. climate.json for climate.npy"""
+    with open(os.path.splitext(path)[0] + '.json') as f:
+        return json.load(f)
+
+
+def _discover_files(directory, suffixes):
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith(suffixes)]
+
+
+class ModelRegistry:
+    """
+    Registry of datasets and fitted models, loaded on first use
+
+    Datasets and models are either registered in memory or discovered in a
+    directory laid out as:
+
+        datasets/<dataset_id>.npy or .parquet   rows x features matrix
+        datasets/<dataset_id>.json              {"features": [{"name", "doi", "source"}, ...],
+                                                 "name", "description", "version"}
+        models/<file>.joblib, .pkl or .pickle   estimator fitted on one dataset
+        models/<file>.json                      {"dataset", "type", "model", "name",
+                                                 "metrics", "version"}
+
+    Only the JSON sidecars are read at discovery. Several model files
+    naming the same "model" (default: the file name) form one model with
+    an estimator per dataset. A feature may name several sources instead
+    of one "doi" (see feature_sources). A Parquet column is selected by
+    the feature's "column", defaulting to its name.
+
+    Feature matrices are memory-mapped read-only when first used, so
+    processes sharing the files share their pages in the OS page cache;
+    Parquet files are converted once to .npy under .cache/ for this.
+    Estimators are unpickled when first used and kept in an LRU: once the
+    estimators loaded from disk exceed memory_budget bytes (estimated from
+    their file sizes), the least recently used are dropped, to be loaded
+    again on their next use. Versions default to a hash of the files' sizes
+    and modification times, so replacing a file invalidates the cached
+    explanations and attribution summaries built from it.
+
+    Model files are unpickled, so the directory must only hold trusted files.
+    """
+
+    def __init__(self, directory=None, memory_budget=512 * 2 ** 20):
+        """
+        Args:
+            directory (str, optional): Directory to discover datasets and
+                models in; only in-memory registrations when not set
+            memory_budget (int): Bytes of estimators loaded from disk to
+                keep before evicting the least recently used
+        """
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.datasets = {}
+        self.models = {}
+        # File -> reason it was not registered
+        self.skipped = {}
+        # Dataset ID -> feature matrix, in memory or memory-mapped
+        self._arrays = {}
+        # Dataset ID -> SourceMap of its features
+        self._source_maps = {}
+        # (model ID, dataset ID) -> estimator registered in memory, never evicted
+        self._pinned = {}
+        # (model ID, dataset ID) -> (estimator, estimated bytes) loaded from disk, in LRU order
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+
+        if directory:
+            self.discover()
+
+    def register_dataset(self, dataset_id, data, features, name=None, description='', version='1'):
+        """
+        Register a dataset held in memory
+
+        Args:
+            dataset_id (str): Dataset ID
+            data (np.ndarray): rows x features matrix
+            features (list): One dict per column with its name and its
+                source DOIs, see feature_sources
+            name (str, optional): Display name, defaults to the ID
+            description (str): Description
+            version (str): Changes whenever the data does; part of the
+                explanation cache key
+
+        Raises:
+            ValueError: If the data does not match the features or a
+                feature has no valid source
+        """
+        data = np.asarray(data, dtype=np.float64)
+        self._check_shape(dataset_id, data, features)
+        source_map = SourceMap.from_features(features)
+        with self._lock:
+            self._arrays[dataset_id] = data
+            self._source_maps[dataset_id] = source_map
+            self.datasets[dataset_id] = self._dataset_entry(name or dataset_id, description, features,
+                                                            version, None)
+
+    def register_model(self, model_id, estimators, model_type, name=None, metrics=None, version='1'):
+        """
+        Register fitted scikit-learn estimators held in memory
+
+        Args:
+            model_id (str): Model ID
+            estimators (dict): Dataset ID -> estimator fitted on that
+                dataset's features; the model is compatible with these datasets
+            model_type (str): 'regression' or 'classification'
+            name (str, optional): Display name, defaults to the ID
+            metrics (dict, optional): Evaluation metrics
+            version (str): Changes whenever the model is refitted; part of
+                the explanation cache key
+
+        Raises:
+            ValueError: For an unsupported model type
+        """
+        self._check_type(model_type)
+        with self._lock:
+            for dataset_id, estimator in estimators.items():
+                self._pinned[(model_id, dataset_id)] = estimator
+            self.models[model_id] = self._model_entry(name or model_id, model_type, metrics,
+                                                      list(estimators), version, {})
+
+    def discover(self):
+        """
+        Register the datasets and models in the directory that are not registered yet
+
+        Files that cannot be registered (no or invalid sidecar, unknown
+        dataset, Parquet without pyarrow or fastparquet installed) are
+        recorded in skipped.
+
+        Returns:
+            int: Datasets and models added
+        """
+        added = 0
+        for path in _discover_files(os.path.join(self.directory, 'datasets'), DATASET_SUFFIXES):
+            dataset_id = os.path.splitext(os.path.basename(path))[0]
+            if dataset_id in self.datasets:
+                continue
+            try:
+                if path.endswith('.parquet') and not _parquet_available():
+                    raise ValueError(PARQUET_MISSING)
+                sidecar = _read_sidecar(path)
+                features = sidecar['features']
+                if not features or not all('name' in f for f in features):
+                    raise ValueError('every feature needs a name')
+                source_map = SourceMap.from_features(features)
+                entry = self._dataset_entry(sidecar.get('name', dataset_id), sidecar.get('description', ''),
+                                            features, str(sidecar.get('version') or _file_version([path])), path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.skipped[path] = str(e)
+                continue
+            with self._lock:
+                self.datasets[dataset_id] = entry
+                self._source_maps[dataset_id] = source_map
+            added += 1
+
+        # Model ID -> [(dataset ID, path, sidecar)]
+        grouped = OrderedDict()
+        for path in _discover_files(os.path.join(self.directory, 'models'), MODEL_SUFFIXES):
+            try:
+                sidecar = _read_sidecar(path)
+                dataset_id = sidecar['dataset']
+                self._check_type(sidecar['type'])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.skipped[path] = str(e)
+                continue
+            model_id = sidecar.get('model') or os.path.splitext(os.path.basename(path))[0]
+            if dataset_id not in self.datasets:
+                self.skipped[path] = f'unknown dataset {dataset_id}'
+            elif model_id not in self.models:
+                grouped.setdefault(model_id, []).append((dataset_id, path, sidecar))
+
+        for model_id, files in grouped.items():
+            first = files[0][2]
+            paths = {dataset_id: path for dataset_id, path, _ in files}
+            version = str(first.get('version') or _file_version(paths.values()))
+            with self._lock:
+                self.models[model_id] = self._model_entry(first.get('name', model_id), first['type'],
+                                                          first.get('metrics'), list(paths), version, paths)
+            added += 1
+        return added
+
+    @staticmethod
+    def _dataset_entry(name, description, features, version, path):
+        return {
+            'name': name,
+            'description': description,
+            'features': features,
+            'version': version,
+            'path': path
+        }
+
+    @staticmethod
+    def _model_entry(name, model_type, metrics, compatible_datasets, version, paths):
+        return {
+            'name': name,
+            'type': model_type,
+            'metrics': metrics or {},
+            'compatible_datasets': compatible_datasets,
+            'version': version,
+            'paths': paths
+        }
+
+    @staticmethod
+    def _check_type(model_type):
+        if model_type not in ('regression', 'classification'):
+            raise ValueError(f'Unsupported model type: {model_type}')
+
+    @staticmethod
+    def _check_shape(dataset_id, data, features):
+        if data.ndim != 2 or data.shape[1] != len(features):
+            raise ValueError(f'Dataset {dataset_id} has {len(features)} features but data of shape {data.shape}')
+
+    def source_map(self, dataset_id):
+        """
+        Get the feature x DOI credit weights of a dataset
+
+        Raises:
+            KeyError: For an unknown dataset
+        """
+        return self._source_maps[dataset_id]
+
+    def load_data(self, dataset_id):
+        """
+        Get a dataset's feature matrix, memory-mapping it on first use
+
+        Args:
+            dataset_id (str): ID of a registered dataset
+
+        Returns:
+            np.ndarray: rows x features matrix, read-only when memory-mapped
+
+        Raises:
+            KeyError: For an unknown dataset
+            ValueError: If the file does not match the dataset's features, or
+                is Parquet and neither pyarrow nor fastparquet is installed
+        """
+        data = self._arrays.get(dataset_id)
+        if data is not None:
+            return data
+
+        with self._lock:
+            data = self._arrays.get(dataset_id)
+            if data is None:
+                dataset = self.datasets[dataset_id]
+                path = dataset['path']
+                if path.endswith('.parquet'):
+                    path = self._convert_parquet(dataset_id, dataset)
+                data = np.load(path, mmap_mode='r', allow_pickle=False)
+                self._check_shape(dataset_id, data, dataset['features'])
+                self._arrays[dataset_id] = data
+        return data
+
+    def _convert_parquet(self, dataset_id, dataset):
+        """Write a Parquet dataset's feature columns to an .npy file that can be memory-mapped"""
+        cache_dir = os.path.join(self.directory, '.cache')
+        path = os.path.join(cache_dir, f"{dataset_id}-{dataset['version']}.npy")
+        if os.path.exists(path):
+            return path
+
+        # Only imported for Parquet datasets
+        import pandas as pd
+        if not _parquet_available():
+            raise ValueError(PARQUET_MISSING)
+        columns = [feature.get('column', feature['name']) for feature in dataset['features']]
+        data = pd.read_parquet(dataset['path'], columns=columns).to_numpy(dtype=np.float64)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def estimator(self, model_id, dataset_id):
+        """
+        Get a model's estimator for a dataset, loading it on first use
+
+        Args:
+            model_id (str): ID of a registered model
+            dataset_id (str): ID of a dataset the model is compatible with
+
+        Returns:
+            The fitted scikit-learn estimator
+
+        Raises:
+            KeyError: For an unknown model or incompatible dataset
+        """
+        key = (model_id, dataset_id)
+        with self._lock:
+            estimator = self._pinned.get(key)
+            if estimator is not None:
+                return estimator
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                self._loaded.move_to_end(key)
+                return loaded[0]
+
+            path = self.models[model_id]['paths'][dataset_id]
+            estimator = joblib.load(path)
+            self._loaded[key] = (estimator, os.path.getsize(path))
+            self._evict()
+        return estimator
+
+    def _evict(self):
+        """Drop the least recently used estimators over the memory budget, keeping the newest"""
+        used = self.memory_used()
+        while used > self.memory_budget and len(self._loaded) > 1:
+            _, (_, size) = self._loaded.popitem(last=False)
+            used -= size
+
+    def memory_used(self):
+        """Estimated bytes of the estimators currently loaded from disk"""
+        with self._lock:
+            return sum(size for _, size in self._loaded.values())
+
+    def is_loaded(self, model_id, dataset_id):
+        """Whether a model's estimator for a dataset is in memory"""
+        key = (model_id, dataset_id)
+        return key in self._pinned or key in self._loaded
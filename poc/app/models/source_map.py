@@ -0,0 +1,111 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def feature_sources(feature):
+    """
+    Sources of one dataset feature as (doi, title, weight) tuples
+
+    A feature either names its sources, each with an optional relative
+    weight (default 1):
+
+        {"name": "Heat Index", "sources": [{"doi": "10.1/a", "source": "...", "weight": 2},
+                                           {"doi": "10.1/b", "source": "..."}]}
+
+    or carries a single source as "doi" and "source".
+
+    Raises:
+        ValueError: If the feature has no source or a weight is not positive
+    """
+    sources = feature.get('sources')
+    if sources is None:
+        sources = [feature] if 'doi' in feature else []
+    if not sources:
+        raise ValueError(f"Feature {feature.get('name')!r} has no source DOI")
+
+    result = []
+    for source in sources:
+        try:
+            doi, weight = source['doi'], float(source.get('weight', 1.0))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid source of feature {feature.get('name')!r}: {source!r}")
+        if not isinstance(doi, str) or not weight > 0:
+            raise ValueError(f"Invalid source of feature {feature.get('name')!r}: {source!r}")
+        result.append((doi, source.get('source', doi), weight))
+    return result
+
+
+class SourceMap:
+    """
+    Sparse feature x DOI credit weights of one dataset
+
+    Row i of the weight matrix spreads feature i's credit over its sources
+    and sums to 1, so mapping attributions to DOIs preserves their total.
+    Credit for any number of rows is then a single sparse product,
+    attributions @ weights.
+
+    Attributes:
+        dois (list): DOI of each weight matrix column
+        titles (list): Source description of each DOI
+        weights (scipy.sparse.csr_matrix): features x DOIs weights
+    """
+
+    __slots__ = ('dois', 'titles', 'weights')
+
+    def __init__(self, dois, titles, weights):
+        self.dois = dois
+        self.titles = titles
+        self.weights = weights
+
+    @classmethod
+    def from_features(cls, features):
+        """
+        Build the map of a dataset's features
+
+        Args:
+            features (list): Feature dicts, see feature_sources
+
+        Returns:
+            SourceMap: The map
+
+        Raises:
+            ValueError: For a feature without a valid source
+        """
+        index, titles = {}, []
+        rows, columns, data = [], [], []
+        for row, feature in enumerate(features):
+            sources = feature_sources(feature)
+            total = sum(weight for _, _, weight in sources)
+            for doi, title, weight in sources:
+                column = index.get(doi)
+                if column is None:
+                    column = index[doi] = len(titles)
+                    titles.append(title)
+                rows.append(row)
+                columns.append(column)
+                data.append(weight / total)
+        # Duplicate (feature, DOI) pairs are summed by the constructor
+        weights = sp.csr_matrix((data, (rows, columns)), shape=(len(features), len(titles)), dtype=np.float64)
+        return cls(list(index), titles, weights)
+
+    def credit(self, values):
+        """
+        Map per-feature attributions to DOIs
+
+        Args:
+            values (np.ndarray): rows x features attributions, or one row
+                as a vector
+
+        Returns:
+            np.ndarray: rows x DOIs credit (a vector for a vector input)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            return self.weights.T @ values
+        return (self.weights.T @ values.T).T
+
+    def feature_sources(self, feature):
+        """(doi, title, weight) of each source of one feature, by feature index"""
+        start, end = self.weights.indptr[feature], self.weights.indptr[feature + 1]
+        return [(self.dois[column], self.titles[column], float(weight))
+                for column, weight in zip(self.weights.indices[start:end], self.weights.data[start:end])]
@@ -0,0 +1,343 @@
+import atexit
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+
+class Synchronized:
+    """
+    Serialize calls to a component's public methods with a lock
+
+    The registry and graph are plain in-memory structures; Flask's threaded
+    server and the shared store's per-connection threads both call into
+    them concurrently. Only methods are exposed: public attributes such as
+    the registry's citations are live internal state, reachable through
+    locked() by code that holds the lock meanwhile.
+    """
+
+    def __init__(self, target, lock=None):
+        """
+        Args:
+            target: Component to wrap
+            lock (threading.RLock, optional): Lock shared with other
+                components, so calls to all of them are serialized together
+        """
+        self._target = target
+        self.lock = lock or threading.RLock()
+
+    def __dir__(self):
+        # Lets the shared store discover the wrapped component's methods
+        methods = {name for name in dir(self._target) if callable(getattr(type(self._target), name, None))}
+        return sorted(methods | set(super().__dir__()))
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith('_'):
+            return attr
+        if not callable(attr):
+            raise AttributeError(f'{type(self._target).__name__}.{name} is internal state; '
+                                 f'use locked() to read it')
+
+        def locked(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+    @contextmanager
+    def locked(self):
+        """Hold the lock and give access to the wrapped component itself"""
+        with self.lock:
+            yield self._target
+
+
+class CitationIngest:
+    """
+    Log citations to the registry and the knowledge graph as one step
+
+    Both components log every citation, the registry first. Holding their
+    common lock across the pair keeps concurrent requests from reaching the
+    two logs in different orders.
+    """
+
+    def __init__(self, registry, graph):
+        """
+        Args:
+            registry (Synchronized): Citation registry
+            graph (Synchronized): Knowledge graph, sharing the registry's lock
+        """
+        self.registry = registry
+        self.graph = graph
+
+    def add_citation(self, citation_data):
+        """
+        Log one citation
+
+        Returns:
+            str: Citation ID
+
+        Raises:
+            ValueError: If the registry rejects the citation; the graph is
+                left untouched
+        """
+        with self.registry.lock:
+            citation_id = self.registry.add_citation(citation_data)
+            self.graph.add_citation(citation_data)
+        return citation_id
+
+    def add_citations_bulk(self, citations):
+        """
+        Log a batch of citations, adding those the registry accepts to the graph
+
+        Returns:
+            list: The registry's result for each citation
+        """
+        with self.registry.lock:
+            results = self.registry.add_citations_bulk(citations)
+            accepted = [citation_data for citation_data, result in zip(citations, results)
+                        if result['status'] == 'success']
+            if accepted:
+                self.graph.add_citations_bulk(accepted)
+        return results
+
+
+class Services:
+    """
+    Application-scoped container for the AIC-IF components
+
+    Created once in create_app and stored in ``app.extensions``, so every
+    blueprint works on the same registry, graph and interpreter. close()
+    stops the jobs and closes the components this process owns; containers
+    still open when the process exits are closed then.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._pid = None
+        self._registry = None
+        self._graph = None
+        self._centrality = None
+        self._ingest = None
+        self._interpreter = None
+        self._jobs = None
+        _open_services.add(self)
+
+    def _connect(self):
+        """Create (or, after a fork, re-create) the shared components"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+
+        if self.config['AICIF_SHARING'] == 'shared':
+            from app.shared_store import connect
+            manager = connect(self.config['AICIF_SHARED_ADDRESS'],
+                              self.config['AICIF_SHARED_AUTHKEY'])
+            self._registry = manager.citation_registry()
+            self._graph = manager.knowledge_graph()
+            self._centrality = manager.centrality_index()
+            self._ingest = manager.citation_ingest()
+            self._jobs = manager.explanation_jobs()
+        else:
+            self._registry, self._graph, self._centrality, self._ingest = build_components(
+                self.config['AICIF_DATA_DIR'], self.config.get('AICIF_GRAPH_BACKEND', 'networkx'))
+            self._jobs = None
+
+    def close(self):
+        """Stop the explanation jobs, flushing their credit, and close the registry and graph"""
+        if self._pid == os.getpid() and self.config['AICIF_SHARING'] != 'shared':
+            # In shared mode the store process owns all of them
+            if self._jobs is not None:
+                self._jobs.shutdown()
+            close_components(self._registry, self._graph)
+        self._pid = None
+        self._registry = self._graph = self._centrality = self._ingest = self._jobs = None
+        _open_services.discard(self)
+
+    @property
+    def citation_registry(self):
+        self._connect()
+        return self._registry
+
+    @property
+    def knowledge_graph(self):
+        self._connect()
+        return self._graph
+
+    @property
+    def centrality_index(self):
+        self._connect()
+        return self._centrality
+
+    @property
+    def citation_ingest(self):
+        self._connect()
+        return self._ingest
+
+    @property
+    def model_interpreter(self):
+        # Each process keeps its own interpreter; precomputed attribution
+        # summaries are shared through the data directory
+        if self._interpreter is None:
+            self._interpreter = build_interpreter(self.config['AICIF_DATA_DIR'], self.config.get('AICIF_MODEL_DIR'),
+                                                  self.config.get('AICIF_MODEL_MEMORY_MB', 512))
+        return self._interpreter
+
+    @property
+    def explanation_jobs(self):
+        # In shared mode the store runs the jobs, so any worker can report on
+        # them; otherwise workers share job states through the data directory
+        self._connect()
+        if self._jobs is None:
+            self._jobs = build_explanation_jobs(self.model_interpreter, self._registry, self._graph,
+                                                self.config.get('AICIF_CREDIT_WINDOW', 60.0),
+                                                self.config['AICIF_DATA_DIR'])
+        return self._jobs
+
+
+def build_components(data_dir=None, graph_backend='networkx'):
+    """
+    Build the citation registry and knowledge graph
+
+    Args:
+        data_dir (str, optional): Directory for persistent registry and graph data
+        graph_backend (str): 'networkx' or 'compact'
+
+    Returns:
+        tuple: (registry, graph, centrality index, ingest); the registry
+            and graph are wrapped for thread-safe use with one common lock,
+            which the ingest holds while logging a citation to both
+
+    Raises:
+        StorageLockedError: If another process already has the data
+            directory open; processes can only share it through the
+            shared store (AICIF_SHARING=shared)
+    """
+    from app.models.author_index import AuthorIndex
+    from app.models.citation_registry import CitationRegistry
+    from app.models.citation_storage import StorageLockedError, open_storage
+    from app.models.graph_centrality import CentralityIndex
+    from app.models.graph_rebuild import GraphRebuilder
+    from app.models.graph_storage import open_graph_storage
+    from app.models.knowledge_graph import KnowledgeGraph
+
+    if graph_backend == 'compact':
+        from app.models.compact_graph import CompactKnowledgeGraph
+        graph_class = CompactKnowledgeGraph
+    elif graph_backend == 'networkx':
+        graph_class = KnowledgeGraph
+    else:
+        raise ValueError(f'Unknown graph backend: {graph_backend}')
+
+    # Both logs are opened, and locked against other writers, before either
+    # is read
+    graph_storage = open_graph_storage(data_dir)
+    try:
+        registry_storage = open_storage(data_dir)
+    except StorageLockedError:
+        graph_storage.close()
+        raise
+
+    # The registry and graph are used under one lock (see CitationIngest),
+    # which both also hold while capturing their snapshots
+    lock = threading.RLock()
+
+    # Both components resolve author names through one index. The graph
+    # persists it and restores first, so the registry's replay resolves
+    # names exactly as before the restart
+    author_index = AuthorIndex()
+    graph = graph_class(storage=graph_storage, author_index=author_index, lock=lock)
+
+    had_history = registry_storage.position > 0
+    registry = CitationRegistry(storage=registry_storage, author_index=author_index, lock=lock)
+
+    # Data directories from before the graph was persisted only hold the
+    # registry's history; derive the graph from it once
+    if had_history and not graph.restored:
+        GraphRebuilder().rebuild(graph, registry)
+
+    registry, graph = Synchronized(registry, lock), Synchronized(graph, lock)
+    return registry, graph, CentralityIndex(graph), CitationIngest(registry, graph)
+
+
+def close_components(registry, graph):
+    """Close a registry and graph from build_components, writing the graph's final snapshot"""
+    graph.close()
+    registry.close()
+
+
+def build_interpreter(data_dir=None, model_dir=None, model_memory_mb=512):
+    """
+    Build the model interpreter
+
+    Args:
+        data_dir (str, optional): Directory for persistent attribution summaries
+        model_dir (str, optional): Directory of datasets and models to discover
+        model_memory_mb (int): Memory budget for models loaded from model_dir
+
+    Returns:
+        ModelInterpreter: The interpreter, with the sample datasets and models
+    """
+    from app.models.attribution_store import open_attribution_store
+    from app.models.model_interpreter import ModelInterpreter
+    from app.models.model_registry import ModelRegistry
+
+    return ModelInterpreter(attribution_store=open_attribution_store(data_dir),
+                            registry=ModelRegistry(model_dir, memory_budget=model_memory_mb * 2 ** 20))
+
+
+def build_explanation_jobs(interpreter, registry=None, graph=None, credit_window=60.0, data_dir=None):
+    """
+    Build the explanation job queue, crediting explained rows to the registry and graph
+
+    Args:
+        interpreter (ModelInterpreter): Source of models and datasets
+        registry (CitationRegistry, optional): Where credit is logged
+        graph (KnowledgeGraph, optional): Where credit is logged
+        credit_window (float): Seconds of credit aggregated into one citation per DOI
+        data_dir (str, optional): Directory where job states are shared
+            between processes
+
+    Returns:
+        ExplanationJobQueue: The queue
+    """
+    from app.models.credit_pipeline import CreditPipeline
+    from app.models.explanation_jobs import ExplanationJobQueue
+
+    credit = CreditPipeline(registry, graph, window=credit_window,
+                            lock=registry.lock if isinstance(registry, Synchronized) else None)
+    # The queue's shutdown() logs the credit of the open window
+    return ExplanationJobQueue(interpreter, credit,
+                               directory=os.path.join(data_dir, 'jobs') if data_dir else None)
+
+
+# Containers not closed yet, closed at exit so the open credit window is
+# logged and the graph's final snapshot written
+_open_services = weakref.WeakSet()
+
+
+@atexit.register
+def _close_services():
+    for services in list(_open_services):
+        services.close()
+
+
+def init_services(app):
+    """Attach the service container to the application"""
+    app.extensions['aicif'] = Services(app.config)
+
+
+def get_services():
+    """Get the service container of the current application"""
+    return current_app.extensions['aicif']
+
+
+# Request-time handles used by the blueprints
+citation_registry = LocalProxy(lambda: get_services().citation_registry)
+knowledge_graph = LocalProxy(lambda: get_services().knowledge_graph)
+citation_ingest = LocalProxy(lambda: get_services().citation_ingest)
+centrality_index = LocalProxy(lambda: get_services().centrality_index)
+model_interpreter = LocalProxy(lambda: get_services().model_interpreter)
+explanation_jobs = LocalProxy(lambda: get_services().explanation_jobs)
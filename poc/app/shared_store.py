@@ -0,0 +1,160 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+_components = {}
+_jobs_lock = threading.Lock()
+
+
+def _init_store(config):
+    """Build the shared components inside the store process"""
+    from app.services import build_components
+    _components['config'] = config
+    _components['registry'], _components['graph'], _components['centrality'], _components['ingest'] = \
+        build_components(config['AICIF_DATA_DIR'], config['AICIF_GRAPH_BACKEND'])
+
+
+def _close_store():
+    """Stop the jobs and close the registry and graph of the store process"""
+    from app.services import close_components
+    if 'jobs' in _components:
+        _components['jobs'].shutdown()
+    close_components(_components['registry'], _components['graph'])
+
+
+def _get_registry():
+    return _components['registry']
+
+
+def _get_graph():
+    return _components['graph']
+
+
+def _get_centrality():
+    return _components['centrality']
+
+
+def _get_ingest():
+    return _components['ingest']
+
+
+def _get_explanation_jobs():
+    # Built on first use: loading the models is only worth it once someone asks
+    with _jobs_lock:
+        if 'jobs' not in _components:
+            from app.services import build_explanation_jobs, build_interpreter
+            config = _components['config']
+            interpreter = build_interpreter(config['AICIF_DATA_DIR'], config['AICIF_MODEL_DIR'],
+                                            config['AICIF_MODEL_MEMORY_MB'])
+            _components['jobs'] = build_explanation_jobs(interpreter, _components['registry'],
+                                                         _components['graph'], config['AICIF_CREDIT_WINDOW'],
+                                                         config['AICIF_DATA_DIR'])
+    return _components['jobs']
+
+
+class SharedStoreManager(BaseManager):
+    """
+    Manager serving the shared registry, graph, centrality index, citation
+    ingest and explanation job queue
+
+    Gunicorn workers are separate processes, so per-process components
+    would each hold their own copy of the data and diverge. In shared mode
+    a single store process owns the registry and graph, and workers reach
+    them through manager proxies over a local socket.
+
+    Run the store standalone with ``python -m app.shared_store``; under
+    gunicorn the hooks in gunicorn.conf.py start it in the master process.
+    """
+
+
+def _register():
+    # Proxies discover the exposed methods from the served objects, so the
+    # same registration works for every graph backend
+    SharedStoreManager.register('citation_registry', callable=_get_registry)
+    SharedStoreManager.register('knowledge_graph', callable=_get_graph)
+    SharedStoreManager.register('centrality_index', callable=_get_centrality)
+    SharedStoreManager.register('citation_ingest', callable=_get_ingest)
+    SharedStoreManager.register('explanation_jobs', callable=_get_explanation_jobs)
+
+
+def _address(address):
+    """Accept 'host:port' for TCP, anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host, int(port))
+    return address
+
+
+def start_server(address, authkey, data_dir=None):
+    """
+    Launch the store as a separate process
+
+    The store runs in its own interpreter rather than as a multiprocessing
+    child, so processes forked afterwards (gunicorn workers) do not inherit
+    ownership of it.
+
+    Args:
+        address (str): Unix socket path or 'host:port'
+        authkey (str): Shared secret for connecting workers
+        data_dir (str, optional): Directory for persistent registry data
+
+    Returns:
+        subprocess.Popen: The store process; terminate() it on exit
+    """
+    env = dict(os.environ, AICIF_SHARED_ADDRESS=address, AICIF_SHARED_AUTHKEY=authkey)
+    if data_dir:
+        env['AICIF_DATA_DIR'] = data_dir
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen([sys.executable, '-m', 'app.shared_store'], cwd=root, env=env)
+
+
+def connect(address, authkey, timeout=10.0):
+    """
+    Connect to a running store, waiting for it to come up
+
+    Args:
+        address (str): Unix socket path or 'host:port'
+        authkey (str): Shared secret of the store
+        timeout (float): Seconds to keep retrying
+
+    Returns:
+        SharedStoreManager: A connected manager
+    """
+    _register()
+    manager = SharedStoreManager(address=_address(address), authkey=authkey.encode())
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            manager.connect()
+            return manager
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() >= deadline:
+                raise RuntimeError(
+                    f'No shared AIC-IF store at {address}; start one with '
+                    f'`python -m app.shared_store`')
+            time.sleep(0.1)
+
+
+if __name__ == '__main__':
+    from app import load_config
+
+    config = load_config()
+    _register()
+    _init_store(config)
+    address = _address(config['AICIF_SHARED_ADDRESS'])
+    if isinstance(address, str) and os.path.exists(address):
+        os.unlink(address)
+    server = SharedStoreManager(
+        address=address, authkey=config['AICIF_SHARED_AUTHKEY'].encode()).get_server()
+    print(f"AIC-IF shared store listening on {config['AICIF_SHARED_ADDRESS']}", flush=True)
+    # Exit cleanly on SIGTERM so the listener removes its socket file
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        _close_store()
@@ -0,0 +1,21 @@
+# Gunicorn hooks for the AIC-IF proof of concept.
+#
+# With AICIF_SHARING=shared the master process starts one shared store
+# before forking workers, so every worker serves the same registry and graph.
+from app import load_config
+
+_store = None
+
+def on_starting(server):
+    global _store
+    config = load_config()
+    if config['AICIF_SHARING'] == 'shared':
+        from app.shared_store import start_server
+        _store = start_server(config['AICIF_SHARED_ADDRESS'],
+                              config['AICIF_SHARED_AUTHKEY'],
+                              config['AICIF_DATA_DIR'])
+
+def on_exit(server):
+    if _store is not None:
+        _store.terminate()
+        _store.wait()
@@ -1,5 +1,30 @@
 // Main JavaScript file for AIC-IF Framework
 
+// Poll a contribution analysis job until it finishes; resolves to the
+// response data with the job's contributions filled in
+function waitForExplanationJob(data, interval = 500) {
+    if (data.status !== 'success' || !data.job) {
+        return Promise.resolve(data);
+    }
+    return new Promise((resolve, reject) => {
+        const check = job => {
+            if (job.state === 'done') {
+                resolve({...data, job: job, contributions: job.result.contributions});
+            } else if (job.state === 'failed') {
+                resolve({...data, job: job, status: 'error', message: job.error});
+            } else {
+                setTimeout(() => {
+                    fetch(data.job_url)
+                        .then(response => response.json())
+                        .then(update => update.status === 'success' ? check(update.job) : resolve(update))
+                        .catch(reject);
+                }, interval);
+            }
+        };
+        check(data.job);
+    });
+}
+
 // Add smooth scrolling to all links
 document.addEventListener('DOMContentLoaded', function() {
     const smoothScrollLinks = document.querySelectorAll('a.smooth-scroll');
@@ -246,6 +271,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify(formData)
             })
             .then(response => response.json())
+            .then(data => waitForExplanationJob(data))
             .then(data => {
                 // Hide loading state
                 document.getElementById('loading-indicator').classList.add('d-none');
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from app.models.attribution_store import AttributionSummary, DiskAttributionStore
+from app.models.explanation_engine import Explanation
+
+KEY = ('temperature_prediction', 'v1', 'climate_data', 'v2', 'permutation')
+
+
+def _summary():
+    values = np.random.default_rng(0).normal(size=(30, 3))
+    explanation = Explanation(values, 0.25, 'permutation', interval=np.array([0.01, 0.02, 0.03]),
+                              details={'rows': 30, 'permutations': 8, 'converged': True})
+    return AttributionSummary.from_explanation(explanation)
+
+
+def _assert_same(loaded, summary):
+    for field in ('mean_abs', 'mean', 'hist_counts', 'hist_edges', 'interval'):
+        np.testing.assert_array_equal(getattr(loaded, field), getattr(summary, field))
+    assert (loaded.rows, loaded.base_value, loaded.computed_at, loaded.details) == \
+        (summary.rows, summary.base_value, summary.computed_at, summary.details)
+
+
+def test_summaries_round_trip_through_the_directory(tmp_path):
+    summary = _summary()
+    DiskAttributionStore(str(tmp_path)).put(KEY, summary)
+
+    reopened = DiskAttributionStore(str(tmp_path))
+    assert reopened.keys() == [KEY]
+    _assert_same(reopened.get(KEY), summary)
+    assert [name for name in os.listdir(tmp_path) if not name.endswith('.npz')] == []
+
+
+def test_summaries_written_by_another_process_are_found_by_key(tmp_path):
+    reader = DiskAttributionStore(str(tmp_path))
+    assert reader.get(KEY) is None
+
+    # Another process shares the directory
+    summary = _summary()
+    DiskAttributionStore(str(tmp_path)).put(KEY, summary)
+    _assert_same(reader.get(KEY), summary)
+    assert reader.get(KEY[:4] + ('shap',)) is None
+
+
+def test_exact_summaries_have_no_interval(tmp_path):
+    summary = AttributionSummary.from_explanation(Explanation(np.ones((4, 2)), 0.0, 'shap'))
+    DiskAttributionStore(str(tmp_path)).put(KEY, summary)
+
+    loaded = DiskAttributionStore(str(tmp_path)).get(KEY)
+    assert loaded.interval is None and loaded.details is None
+    np.testing.assert_array_equal(loaded.mean_abs, [1, 1])
+
+
+def test_unreadable_files_are_ignored(tmp_path):
+    (tmp_path / 'broken.npz').write_bytes(b'not a zip')
+    assert DiskAttributionStore(str(tmp_path)).keys() == []
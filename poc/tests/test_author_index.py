@@ -0,0 +1,61 @@
+import pytest
+from app.models.author_index import AuthorIndex, parse_author, split_authors
+
+
+@pytest.mark.parametrize('authors, expected', [
+    ('Johnson & Williams', ['Johnson', 'Williams']),
+    ('Smith; Doe', ['Smith', 'Doe']),
+    ('Smith and Jones', ['Smith', 'Jones']),
+    ('Smith, J.', ['Smith, J.']),
+    ('Smith, John', ['Smith, John']),
+    ('Smith, J., Doe, A.', ['Smith, J.', 'Doe, A.']),
+    ('Smith, J. and Doe, A.', ['Smith, J.', 'Doe, A.']),
+    ('Smith J, Doe A', ['Smith J', 'Doe A']),
+    ('Smith J, Doe A, and Lee K', ['Smith J', 'Doe A', 'Lee K']),
+    ('John Smith, Jane Doe', ['John Smith', 'Jane Doe']),
+    ('van der Berg, J. and de Vries, K.', ['van der Berg, J.', 'de Vries, K.']),
+    ('Smith et al.', ['Smith']),
+    ('Smith and others', ['Smith']),
+    ('', []),
+    (None, []),
+])
+def test_split_authors(authors, expected):
+    assert split_authors(authors) == expected
+
+
+@pytest.mark.parametrize('authors', [
+    'Food and Agriculture Organization',
+    'Marine Biology Institute and NOAA',
+])
+def test_split_authors_keeps_organizations_whole(authors):
+    assert split_authors(authors) == [authors]
+
+
+def test_split_authors_mixed_separators():
+    assert split_authors('Food and Agriculture Organization; Smith J') == [
+        'Food and Agriculture Organization', 'Smith J']
+
+
+@pytest.mark.parametrize('name, surname, initials', [
+    ('Smith, J.', 'Smith', ('J',)),
+    ('Smith JA', 'Smith', ('J', 'A')),
+    ('J. Smith', 'Smith', ('J',)),
+    ('John A. Smith', 'Smith', ('J', 'A')),
+    ('Smith, J.-P.', 'Smith', ('J', 'P')),
+    ('van der Berg J', 'van der Berg', ('J',)),
+])
+def test_parse_author(name, surname, initials):
+    _, parsed_surname, parsed_initials, is_organization = parse_author(name)
+    assert (parsed_surname, parsed_initials, is_organization) == (surname, initials, False)
+
+
+def test_parse_author_organization():
+    assert parse_author('NOAA')[3]
+    assert parse_author('Food and Agriculture Organization')[3]
+
+
+def test_resolve_all_merges_name_forms():
+    index = AuthorIndex()
+    assert index.resolve_all('Smith J, Smith, J., John Smith, Doe A') == ['Smith, J.', 'Doe, A.']
+    assert index.resolve('J. Smith') == 'Smith, J.'
+    assert len(index) == 2
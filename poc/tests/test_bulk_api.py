@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from app import create_app
+from app.api import routes
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app
+    app.extensions['aicif'].close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _citations_for(client, doi):
+    return client.get('/api/citations', query_string={'doi': doi}).json['citations']
+
+
+def test_json_array_reports_every_event_by_position(client):
+    response = client.post('/api/citations/bulk', json=[
+        {'doi': '10.1/a', 'ai_model': 'GPT-4'},
+        {'doi': '10.1/b'},
+        {'doi': '10.1/c', 'ai_model': 'Claude', 'timestamp': '2024-01-02T00:00:00'},
+    ])
+    assert response.status_code == 200
+    assert response.json['status'] == 'partial'
+    assert response.json['accepted'] == 2
+    assert response.json['rejected'] == 1
+    results = response.json['results']
+    assert [r['index'] for r in results] == [0, 1, 2]
+    assert [r['status'] for r in results] == ['success', 'error', 'success']
+    assert 'ai_model' in results[1]['message']
+
+    assert len(_citations_for(client, '10.1/a')) == 1
+    assert _citations_for(client, '10.1/b') == []
+    assert _citations_for(client, '10.1/c')[0]['timestamp'] == '2024-01-02T00:00:00'
+
+
+def test_ndjson_skips_blank_lines_and_reports_invalid_json(client):
+    body = '\n'.join([
+        json.dumps({'doi': '10.1/a', 'ai_model': 'GPT-4'}),
+        '',
+        '{not json',
+        json.dumps({'doi': '10.1/b', 'ai_model': 'GPT-4'}),
+    ])
+    response = client.post('/api/citations/bulk', data=body,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.json['status'] == 'partial'
+    results = response.json['results']
+    assert [(r['index'], r['status']) for r in results] == [
+        (0, 'success'), (1, 'error'), (2, 'success')]
+    assert results[1]['message'].startswith('Invalid JSON')
+    assert len(_citations_for(client, '10.1/b')) == 1
+
+
+def test_batch_with_nothing_accepted_is_an_error(client):
+    response = client.post('/api/citations/bulk', json=[{'doi': '10.1/a'}, 'not an object'])
+    assert response.status_code == 400
+    assert response.json['status'] == 'error'
+    assert response.json['accepted'] == 0
+    assert response.json['rejected'] == 2
+
+
+def test_fully_accepted_and_empty_batches_succeed(client):
+    response = client.post('/api/citations/bulk', json=[{'doi': '10.1/a', 'ai_model': 'GPT-4'}])
+    assert response.status_code == 200
+    assert response.json['status'] == 'success'
+
+    empty = client.post('/api/citations/bulk', json=[])
+    assert empty.status_code == 200
+    assert empty.json['accepted'] == 0
+
+
+def test_body_must_be_an_array_or_ndjson(client):
+    response = client.post('/api/citations/bulk', json={'doi': '10.1/a', 'ai_model': 'GPT-4'})
+    assert response.status_code == 400
+    assert response.json['status'] == 'error'
+
+
+def test_oversized_batch_is_refused_before_ingest(client, monkeypatch):
+    monkeypatch.setattr(routes, 'MAX_BULK_CITATIONS', 2)
+    batch = [{'doi': f'10.1/{i}', 'ai_model': 'GPT-4'} for i in range(3)]
+    response = client.post('/api/citations/bulk', json=batch)
+    assert response.status_code == 413
+
+    ndjson = '\n'.join(json.dumps(c) for c in batch)
+    response = client.post('/api/citations/bulk', data=ndjson,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 413
+    assert _citations_for(client, '10.1/0') == []
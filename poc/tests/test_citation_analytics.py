@@ -0,0 +1,145 @@
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import pytest
+from app import create_app
+from app.models.citation_index import parse_timestamp
+from app.models.citation_registry import CitationRegistry
+
+MODELS = ['GPT-4', 'Claude', 'Llama', 'Gemini', 'Mistral', 'Phi']
+SOURCE_TYPES = ['journal_article', 'preprint', 'book']
+AUTHORS = ['Smith, J.', 'J. Smith', 'Doe, A.; Smith, J.', 'Lee, K.']
+
+
+def _registry(count=300, seed=0):
+    # Random events with missing source types and contribution scores mixed in
+    rng = random.Random(seed)
+    registry = CitationRegistry(load_sample_data=False)
+    for _ in range(count):
+        citation = {
+            'doi': f'10.1/{rng.randint(0, 11)}',
+            'ai_model': rng.choice(MODELS),
+            'timestamp': f'2024-01-{rng.randint(1, 9):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00'
+        }
+        if rng.random() < 0.8:
+            citation['source_type'] = rng.choice(SOURCE_TYPES)
+        if rng.random() < 0.8:
+            citation['contribution_score'] = rng.choice([0.1, 0.25, 0.5, 0.75, 1.0])
+        if rng.random() < 0.5:
+            citation['authors'] = rng.choice(AUTHORS)
+        registry.add_citation(citation)
+    return registry
+
+
+def _contribution(citation):
+    return citation.get('contribution_score', 0.5)
+
+
+def test_summary_stats_match_naive_counts():
+    registry = _registry()
+    citations = list(registry.citations)
+    stats = registry.get_summary_stats()
+
+    assert stats['total_citations'] == len(citations)
+    assert stats['unique_sources'] == len({c['doi'] for c in citations})
+    assert sorted(stats['ai_models']) == sorted({c['ai_model'] for c in citations})
+    assert stats['source_types'] == Counter(c.get('source_type', 'unknown') for c in citations)
+    authors = {author for c in citations if 'authors' in c
+               for author in registry.author_index.resolve_all(c['authors'])}
+    assert stats['total_authors'] == len(authors)
+
+
+@pytest.mark.parametrize('by', ['ai_model', 'source_type'])
+def test_breakdown_matches_naive_grouping(by):
+    registry = _registry()
+    groups = defaultdict(list)
+    for citation in registry.citations:
+        groups[citation.get(by, 'unknown')].append(citation)
+
+    breakdown = registry.get_breakdown(by=by)
+    counts = [row['citations'] for row in breakdown]
+    assert counts == sorted(counts, reverse=True)
+    assert {row[by]: row for row in breakdown} == {
+        group: {
+            by: group,
+            'citations': len(rows),
+            'unique_sources': len({c['doi'] for c in rows}),
+            'mean_contribution': pytest.approx(sum(map(_contribution, rows)) / len(rows), abs=1e-4)
+        }
+        for group, rows in groups.items()
+    }
+
+
+def test_breakdown_rejects_other_fields():
+    with pytest.raises(ValueError):
+        _registry(10).get_breakdown(by='doi')
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'doi': '10.1/3'},
+    {'ai_model': 'Claude', 'start_date': '2024-01-03T12:00:00', 'end_date': '2024-01-07T00:00:00'},
+    {'doi': '10.1/missing'},
+])
+def test_daily_series_matches_naive_grouping(filters):
+    registry = _registry()
+    start = filters.get('start_date')
+    end = filters.get('end_date')
+    days = defaultdict(list)
+    for citation in registry.citations:
+        if (filters.get('doi', citation['doi']) == citation['doi']
+                and filters.get('ai_model', citation['ai_model']) == citation['ai_model']
+                and (start is None or citation['timestamp'] >= start)
+                and (end is None or citation['timestamp'] <= end)):
+            days[citation['timestamp'][:10]].append(_contribution(citation))
+
+    series = registry.get_time_series(**filters)
+    assert [row['date'] for row in series] == sorted(days)
+    for row in series:
+        contributions = days[row['date']]
+        assert row['citations'] == len(contributions)
+        assert row['mean_contribution'] == pytest.approx(sum(contributions) / len(contributions), abs=1e-4)
+
+
+def test_aicif_scores_match_running_aggregates():
+    registry = _registry()
+    now = datetime(2024, 1, 20, tzinfo=timezone.utc).timestamp()
+    scores = registry.analytics.aicif_scores(now=now)
+    assert set(scores) == set(registry.doi_aggregates)
+    for doi, aggregate in registry.doi_aggregates.items():
+        assert scores[doi] == pytest.approx(aggregate.score(now), abs=0.011)
+
+
+def test_aicif_scores_of_a_single_event():
+    registry = CitationRegistry(load_sample_data=False)
+    registry.add_citation({'doi': '10.1/a', 'ai_model': 'GPT-4', 'contribution_score': 1.0,
+                           'timestamp': '2024-01-01T00:00:00'})
+    now = parse_timestamp('2024-01-01T00:00:00')
+    # One citation, full contribution, no decay, one of five models
+    assert registry.analytics.aicif_scores(now=now) == {'10.1/a': pytest.approx((0.4 + 0.3 + 0.2 + 0.02) * 10)}
+    assert CitationRegistry(load_sample_data=False).analytics.aicif_scores() == {}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app.test_client()
+    app.extensions['aicif'].close()
+
+
+def test_analytics_endpoints(client):
+    breakdown = client.get('/api/analytics/breakdown', query_string={'by': 'source_type'})
+    assert breakdown.status_code == 200
+    assert breakdown.json['by'] == 'source_type'
+    assert breakdown.json['breakdown']
+    assert client.get('/api/analytics/breakdown', query_string={'by': 'doi'}).status_code == 400
+
+    assert client.get('/api/analytics/timeseries').json['series']
+    bad_date = client.get('/api/analytics/timeseries', query_string={'start_date': 'soon'})
+    assert bad_date.status_code == 400
+
+    scores = client.get('/api/analytics/aicif-scores', query_string={'limit': 2}).json['scores']
+    assert len(scores) == 2
+    assert scores[0]['aicif_score'] >= scores[1]['aicif_score']
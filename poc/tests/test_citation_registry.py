@@ -0,0 +1,83 @@
+import random
+import pytest
+from app.models.citation_index import TimeIndex
+from app.models.citation_registry import CitationRegistry
+
+
+def _registry(count, seed=0):
+    # Timestamps arrive out of order, with ties
+    rng = random.Random(seed)
+    registry = CitationRegistry(load_sample_data=False)
+    for i in range(count):
+        registry.add_citation({'doi': f'10.1/{i % 4}', 'ai_model': f'model-{i % 3}', 'citation_id': str(i),
+                               'timestamp': f'2024-01-{rng.randint(1, 20):02d}T{rng.randint(0, 2):02d}:00:00'})
+    return registry
+
+
+def _expected(registry, doi=None, ai_model=None, start_date=None, end_date=None):
+    matches = [(c['timestamp'], position, c['citation_id']) for position, c in enumerate(registry.citations)
+               if (doi is None or c['doi'] == doi) and (ai_model is None or c['ai_model'] == ai_model)
+               and (start_date is None or c['timestamp'] >= start_date)
+               and (end_date is None or c['timestamp'] <= end_date)]
+    return [citation_id for _, _, citation_id in sorted(matches, reverse=True)]
+
+
+def _paged(registry, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        citations, cursor = registry.get_citations_page(cursor=cursor, limit=limit, **filters)
+        assert len(citations) <= limit
+        ids.extend(c['citation_id'] for c in citations)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'doi': '10.1/1'},
+    {'ai_model': 'model-2'},
+    {'doi': '10.1/3', 'ai_model': 'model-0'},
+    {'start_date': '2024-01-05T00:00:00', 'end_date': '2024-01-12T01:00:00'},
+    {'doi': '10.1/2', 'start_date': '2024-01-10T00:00:00'}
+])
+def test_pages_cover_every_match_once_newest_first(filters):
+    registry = _registry(300)
+    expected = _expected(registry, **filters)
+    assert expected
+    for limit in (1, 7, 1000):
+        assert _paged(registry, limit, **filters) == expected
+
+
+def test_cursor_stays_valid_while_citations_are_added():
+    registry = _registry(50)
+    first, cursor = registry.get_citations_page(limit=10)
+    expected = _expected(registry)[10:]
+    registry.add_citation({'doi': '10.1/0', 'ai_model': 'model-0', 'timestamp': '2024-02-01T00:00:00'})
+
+    rest = []
+    while cursor is not None:
+        citations, cursor = registry.get_citations_page(cursor=cursor, limit=10)
+        rest.extend(c['citation_id'] for c in citations)
+    assert rest == expected
+
+
+def test_unknown_filters_and_bad_cursor():
+    registry = _registry(10)
+    assert registry.get_citations_page(doi='10.1/missing') == ([], None)
+    with pytest.raises(ValueError):
+        registry.get_citations_page(cursor='not a cursor')
+
+
+def test_time_index_merges_late_events():
+    rng = random.Random(1)
+    index = TimeIndex()
+    events = []
+    for position in range(2000):
+        epoch = float(rng.randint(0, 500))
+        index.add(epoch, position)
+        events.append((epoch, position))
+        if position % 97 == 0:
+            assert list(zip(index.epochs, index.positions)) == sorted(events)
+    assert list(zip(index.epochs, index.positions)) == sorted(events)
+    assert index.bounds(100.0, 200.0) == (
+        sum(epoch < 100 for epoch, _ in events), sum(epoch <= 200 for epoch, _ in events))
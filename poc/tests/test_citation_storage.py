@@ -0,0 +1,118 @@
+import os
+import time
+import pytest
+from app.models.citation_registry import CitationRegistry
+from app.models.citation_storage import SegmentedLogStorage, StorageLockedError, read_log_range
+
+
+def _records(count, start=0):
+    return [{'doi': f'10.1/{i % 5}', 'ai_model': 'GPT-4', 'citation_id': str(i),
+             'timestamp': f'2024-01-{1 + i % 28:02d}T00:00:00'} for i in range(start, start + count)]
+
+
+def _registry(directory, **kwargs):
+    return CitationRegistry(storage=SegmentedLogStorage(str(directory), **kwargs), load_sample_data=False)
+
+
+def _state(registry):
+    citations, _ = registry.get_citations_page(limit=1000)
+    return [c['citation_id'] for c in citations], registry.get_summary_stats(), registry.get_top_cited()
+
+
+def test_log_reopens_at_its_end(tmp_path):
+    storage = SegmentedLogStorage(str(tmp_path), segment_size=4)
+    storage.append_many(_records(10))
+    storage.close()
+
+    storage = SegmentedLogStorage(str(tmp_path), segment_size=4)
+    assert storage.position == 10
+    assert list(storage.replay()) == _records(10)
+    assert list(read_log_range(str(tmp_path), 4, 3, 9)) == _records(10)[3:9]
+
+
+def test_torn_final_line_is_dropped(tmp_path):
+    storage = SegmentedLogStorage(str(tmp_path), segment_size=4)
+    storage.append_many(_records(6))
+    storage.close()
+    # A crash in the middle of an append
+    with open(os.path.join(tmp_path, SegmentedLogStorage.SEGMENT_PATTERN.format(1)), 'a') as f:
+        f.write('{"doi": "10.1/torn", "ai_mo')
+
+    storage = SegmentedLogStorage(str(tmp_path), segment_size=4)
+    assert storage.position == 6
+    storage.append_many(_records(2, start=6))
+    assert list(storage.replay()) == _records(8)
+
+
+def test_registry_recovers_from_torn_log(tmp_path):
+    registry = _registry(tmp_path)
+    for record in _records(20):
+        registry.add_citation(dict(record))
+    expected = _state(registry)
+    registry.storage.close()
+    with open(os.path.join(tmp_path, SegmentedLogStorage.SEGMENT_PATTERN.format(0)), 'a') as f:
+        f.write('{"doi": "10.1/torn"')
+
+    assert _state(_registry(tmp_path)) == expected
+
+
+def test_registry_restores_snapshot_plus_log_tail(tmp_path):
+    registry = _registry(tmp_path, snapshot_interval=10 ** 6)
+    for record in _records(15):
+        registry.add_citation(dict(record))
+    registry.storage.write_snapshot(registry._snapshot_state())
+    for record in _records(7, start=15):
+        registry.add_citation(dict(record))
+    expected = _state(registry)
+    registry.storage.close()
+
+    restored = _registry(tmp_path)
+    assert restored.storage.load_snapshot()[1] == 15
+    assert _state(restored) == expected
+
+
+def test_snapshot_ahead_of_log_is_ignored(tmp_path):
+    registry = _registry(tmp_path, snapshot_interval=10 ** 6)
+    for record in _records(10):
+        registry.add_citation(dict(record))
+    registry.storage.write_snapshot(registry._snapshot_state())
+    registry.storage.close()
+    # Lose the last records of the log
+    path = os.path.join(tmp_path, SegmentedLogStorage.SEGMENT_PATTERN.format(0))
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, 'w') as f:
+        f.writelines(lines[:6])
+
+    restored = _registry(tmp_path)
+    assert restored.storage.load_snapshot() is None
+    assert _state(restored)[1]['total_citations'] == 6
+
+
+def test_snapshots_are_written_in_the_background(tmp_path):
+    registry = _registry(tmp_path, snapshot_interval=5)
+    for record in _records(12):
+        registry.add_citation(dict(record))
+    expected = _state(registry)
+
+    snapshot = os.path.join(tmp_path, SegmentedLogStorage.SNAPSHOT_FILE)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(snapshot) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert os.path.exists(snapshot)
+    registry.storage.close()
+    assert _state(_registry(tmp_path)) == expected
+
+
+def test_second_writer_is_refused(tmp_path):
+    storage = SegmentedLogStorage(str(tmp_path))
+    storage.append_many(_records(3))
+    with pytest.raises(StorageLockedError):
+        SegmentedLogStorage(str(tmp_path))
+    # Refusing it left the open log alone
+    storage.append_many(_records(2, start=3))
+    storage.close()
+
+    storage = SegmentedLogStorage(str(tmp_path))
+    assert list(storage.replay()) == _records(5)
+    storage.close()
@@ -0,0 +1,97 @@
+import uuid
+import numpy as np
+import pytest
+from app.models.citation_index import parse_timestamp
+from app.models.citation_registry import CitationRegistry
+from app.models.citation_store import ChunkedColumn, ColumnarCitationStore, StringPool
+
+
+def _append(store, citation):
+    return store.append(dict(citation), parse_timestamp(citation['timestamp']))
+
+
+def test_string_pool_codes_are_stable():
+    pool = StringPool()
+    assert pool.encode('GPT-4') == 0
+    assert pool.encode('Claude') == 1
+    assert pool.encode('GPT-4') == 0
+    assert len(pool) == 2
+    assert pool.lookup('Claude') == 1
+    assert pool.lookup('missing') == -1
+    assert len(pool) == 2
+    assert pool.decode(1) == 'Claude'
+
+
+def test_chunked_column_grows_without_copying():
+    column = ChunkedColumn(np.int64, chunk_size=3)
+    for value in range(7):
+        column.append(value * 10)
+    assert len(column) == 7
+    assert len(column.chunks) == 3
+    assert column[4] == 40
+    assert column.to_numpy().tolist() == [0, 10, 20, 30, 40, 50, 60]
+    assert ChunkedColumn(np.float32).to_numpy().shape == (0,)
+
+
+@pytest.mark.parametrize('citation', [
+    # Canonical values go entirely into the columns
+    {'doi': '10.1/a', 'ai_model': 'GPT-4', 'source_title': 'T', 'source_type': 'journal_article',
+     'authors': 'A. Author', 'user_id': 'u1', 'context': 'c', 'citation_id': str(uuid.uuid4()),
+     'timestamp': '2024-01-02T03:04:05.123456', 'contribution_score': 0.89},
+    # Values that need the override maps
+    {'doi': '10.1/b', 'ai_model': 'GPT-4', 'citation_id': 'not-a-uuid',
+     'timestamp': '2024-01-02T03:04:05Z', 'contribution_score': 1},
+    {'doi': '10.1/c', 'ai_model': 'GPT-4', 'citation_id': str(uuid.uuid4()).upper(),
+     'timestamp': '2024-01-02T03:04:05+00:00', 'contribution_score': None},
+    {'doi': '10.1/d', 'ai_model': 'GPT-4', 'authors': ['A', 'B'], 'user_id': None,
+     'citation_id': str(uuid.uuid4()), 'timestamp': '2024-01-02T00:00:00', 'session': {'id': 7}},
+])
+def test_events_round_trip(citation):
+    store = ColumnarCitationStore(chunk_size=2)
+    _append(store, {'doi': '10.1/x', 'ai_model': 'Claude', 'citation_id': str(uuid.uuid4()),
+                    'timestamp': '2023-12-31T00:00:00'})
+    position = _append(store, citation)
+    assert position == 1
+    assert store.get(position) == citation
+
+
+def test_canonical_events_use_no_overrides():
+    store = ColumnarCitationStore()
+    _append(store, {'doi': '10.1/a', 'ai_model': 'GPT-4', 'citation_id': str(uuid.uuid4()),
+                    'timestamp': '2024-01-02T03:04:05', 'contribution_score': 0.5})
+    assert not (store.raw_timestamps or store.raw_citation_ids
+                or store.raw_contributions or store.extras)
+    assert store.columns['source_title'][0] == -1
+    assert store.field_code('ai_model', 0) == store.pools['ai_model'].lookup('GPT-4')
+
+
+def test_registry_views_rebuild_dicts():
+    registry = CitationRegistry(load_sample_data=False)
+    ids = [registry.add_citation({'doi': f'10.1/{i % 2}', 'ai_model': 'GPT-4',
+                                  'timestamp': f'2024-01-0{i + 1}T00:00:00'}) for i in range(4)]
+    citations = registry.citations
+    assert len(citations) == 4
+    assert [c['citation_id'] for c in citations] == ids
+    assert citations[-1]['citation_id'] == ids[-1]
+    assert [c['citation_id'] for c in citations[1:3]] == ids[1:3]
+    with pytest.raises(IndexError):
+        citations[4]
+
+    # Views hand out copies, so editing one leaves the store alone
+    citations[0]['doi'] = 'changed'
+    assert registry.citations[0]['doi'] == '10.1/0'
+
+    by_doi = registry.citation_by_doi
+    assert sorted(by_doi) == ['10.1/0', '10.1/1']
+    assert [c['citation_id'] for c in by_doi['10.1/1']] == [ids[1], ids[3]]
+    with pytest.raises(KeyError):
+        by_doi['10.1/missing']
+
+
+def test_registry_requires_string_keys():
+    registry = CitationRegistry(load_sample_data=False)
+    with pytest.raises(ValueError):
+        registry.add_citation({'doi': 5, 'ai_model': 'GPT-4'})
+    with pytest.raises(ValueError):
+        registry.add_citation({'doi': '10.1/a', 'ai_model': None})
+    assert len(registry.citations) == 0
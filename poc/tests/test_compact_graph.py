@@ -0,0 +1,86 @@
+import random
+import pytest
+from app.models.author_index import AuthorIndex
+from app.models.compact_graph import CompactKnowledgeGraph
+from app.models.graph_storage import open_graph_storage
+from app.models.knowledge_graph import KnowledgeGraph
+
+AUTHORS = ['Smith, J. and Doe, A.', 'J. Smith; A Doe', 'Ann Lee', 'Smith J, Lee A', 'NOAA', '']
+
+
+def _citations(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        'doi': f'10.1/{rng.randint(0, 40)}',
+        'ai_model': rng.choice(['GPT-4', 'Claude-3', 'Llama']),
+        'source_title': f'Title {i}',
+        'source_type': rng.choice(['paper', 'dataset', 'code']),
+        'authors': rng.choice(AUTHORS),
+        'contribution_score': round(rng.random(), 3),
+        # Out of time order on purpose
+        'timestamp': f'2024-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00'
+    } for i in range(count)]
+
+
+def _nodes(graph):
+    data = graph.get_visualization_data()
+    return sorted((node['id'], node['label'], node['type'], node['size'], node['color']) for node in data['nodes'])
+
+
+def _edges(graph):
+    data = graph.get_visualization_data()
+    edges = sorted((edge['source'], edge['target'], edge['label'], edge['weight']) for edge in data['edges'])
+    stats = {(source, target): graph.get_edge_stats(source, target)
+             for source, target, relationship, _ in edges if relationship == 'CITES'}
+    return edges, stats
+
+
+def _connections(graph, node_id):
+    # The backends list neighbours in different orders
+    connections = graph.get_entity_connections(node_id)
+    for direction in ('incoming', 'outgoing'):
+        connections.get(direction, []).sort(key=lambda connection: connection['id'])
+    return connections
+
+
+def _assert_equivalent(a, b):
+    assert _nodes(a) == _nodes(b)
+    assert _edges(a) == _edges(b)
+    for node_id in ('GPT-4', '10.1/3', 'Smith, J.'):
+        assert _connections(a, node_id) == _connections(b, node_id)
+
+
+def _build(graph_class, citations, bulk, **kwargs):
+    graph = graph_class(author_index=AuthorIndex(), **kwargs)
+    if bulk:
+        graph.add_citations_bulk([dict(c) for c in citations])
+    else:
+        for citation in citations:
+            graph.add_citation(dict(citation))
+    return graph
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+def test_compact_matches_networkx(bulk):
+    citations = _citations(500)
+    _assert_equivalent(_build(KnowledgeGraph, citations, bulk), _build(CompactKnowledgeGraph, citations, bulk))
+
+
+def test_sample_graph_matches_networkx():
+    _assert_equivalent(KnowledgeGraph(author_index=AuthorIndex()),
+                       CompactKnowledgeGraph(author_index=AuthorIndex()))
+
+
+def test_compact_snapshot_round_trip(tmp_path):
+    citations = _citations(300)
+    expected = _build(KnowledgeGraph, citations, False)
+    graph = _build(CompactKnowledgeGraph, citations, False, storage=open_graph_storage(str(tmp_path)))
+    graph.storage.write_snapshot(graph._snapshot_state())
+    graph.storage.close()
+
+    restored = CompactKnowledgeGraph(storage=open_graph_storage(str(tmp_path)), author_index=AuthorIndex())
+    _assert_equivalent(expected, restored)
+    restored.storage.close()
+    # Snapshots are shared between the backends
+    _assert_equivalent(expected, KnowledgeGraph(storage=open_graph_storage(str(tmp_path)),
+                                                author_index=AuthorIndex()))
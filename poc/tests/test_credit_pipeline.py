@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from app.models.citation_registry import CitationRegistry
+from app.models.credit_pipeline import CreditPipeline
+from app.models.source_map import SourceMap
+
+FEATURES = [
+    {'name': 'a', 'doi': '10.1/a', 'source': 'A'},
+    {'name': 'b', 'sources': [{'doi': '10.1/a', 'source': 'A'}, {'doi': '10.1/b', 'source': 'B', 'weight': 3}]},
+    {'name': 'c', 'doi': '10.1/c', 'source': 'C'}
+]
+
+
+class FailingGraph:
+    """Graph whose bulk logging fails a set number of times"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.citations = []
+
+    def add_citations_bulk(self, citations):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('graph unavailable')
+        self.citations.extend(citations)
+
+
+class FailingRegistry(CitationRegistry):
+    """Registry whose bulk logging fails a set number of times"""
+
+    def __init__(self, failures):
+        super().__init__(load_sample_data=False)
+        self.failures = failures
+
+    def add_citations_bulk(self, citations):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('registry unavailable')
+        return super().add_citations_bulk(citations)
+
+
+@pytest.fixture
+def source_map():
+    return SourceMap.from_features(FEATURES)
+
+
+def _pipeline(registry, graph=None):
+    pipeline = CreditPipeline(registry, graph, window=60)
+    # The tests pass their own clock; keep the background flusher from using the real one
+    pipeline._stop.set()
+    return pipeline
+
+
+def _by_doi(citations):
+    return {c['doi']: c for c in citations}
+
+
+def test_closed_windows_flush_as_one_citation_per_doi(source_map):
+    registry = CitationRegistry(load_sample_data=False)
+    pipeline = _pipeline(registry)
+    values = np.array([[1.0, 0.0, 1.0], [0.0, 4.0, 0.0], [0.0, 0.0, 0.0]])
+
+    assert pipeline.add('m1', source_map, values, now=10) == 2
+    assert pipeline.add('m1', source_map, values[:1], now=50) == 1
+    assert len(registry.citations) == 0
+
+    # The first window closed at 60
+    assert pipeline.add('m1', source_map, values[:1], now=70) == 1
+    citations = _by_doi(registry.citations)
+    assert set(citations) == {'10.1/a', '10.1/b', '10.1/c'}
+    assert citations['10.1/a']['credit_count'] == 3
+    assert citations['10.1/a']['credit_sum'] == pytest.approx(0.5 + 0.25 + 0.5)
+    assert citations['10.1/b']['credit_sum'] == pytest.approx(0.75)
+    assert sum(c['credit_sum'] for c in citations.values()) == pytest.approx(3)
+    assert citations['10.1/a']['window_start'] == '1970-01-01T00:00:00'
+    assert citations['10.1/a']['window_end'] == '1970-01-01T00:01:00'
+
+    pipeline.close()
+    assert len(registry.citations) == 5
+
+
+def test_dois_without_credit_are_skipped(source_map):
+    registry = CitationRegistry(load_sample_data=False)
+    pipeline = _pipeline(registry)
+
+    assert pipeline.add('m1', source_map, np.array([[0.0, 0.0, 2.0]]), now=0) == 1
+    assert pipeline.add('m1', source_map, np.zeros((2, 3)), now=0) == 0
+    assert pipeline.flush(now=60) == 1
+    assert [c['doi'] for c in registry.citations] == ['10.1/c']
+
+
+def test_registry_failure_puts_the_window_back(source_map):
+    registry = FailingRegistry(failures=1)
+    pipeline = _pipeline(registry)
+    pipeline.add('m1', source_map, np.array([[1.0, 0.0, 1.0]]), now=0)
+
+    with pytest.raises(RuntimeError):
+        pipeline.flush(now=60)
+    # Credit added meanwhile to the same window is merged in
+    pipeline.add('m1', source_map, np.array([[1.0, 0.0, 0.0]]), now=30)
+    assert pipeline.flush(now=60) == 2
+    citations = _by_doi(registry.citations)
+    assert citations['10.1/a']['credit_count'] == 2
+    assert citations['10.1/a']['credit_sum'] == pytest.approx(1.5)
+
+
+def test_graph_failure_is_retried_without_logging_to_the_registry_again(source_map):
+    registry = CitationRegistry(load_sample_data=False)
+    graph = FailingGraph(failures=2)
+    pipeline = _pipeline(registry, graph)
+    pipeline.add('m1', source_map, np.array([[1.0, 0.0, 1.0]]), now=0)
+
+    # Failures are logged, not raised, when new rows arrive
+    pipeline.add('m1', source_map, np.array([[1.0, 0.0, 0.0]]), now=70)
+    assert len(registry.citations) == 2 and graph.citations == []
+    with pytest.raises(RuntimeError):
+        pipeline.flush(now=70)
+
+    assert pipeline.flush(now=70) == 0
+    assert len(registry.citations) == 2
+    assert sorted(c['doi'] for c in graph.citations) == ['10.1/a', '10.1/c']
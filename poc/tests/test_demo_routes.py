@@ -0,0 +1,26 @@
+import pytest
+from app import create_app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app.test_client()
+    app.extensions['aicif'].close()
+
+
+def test_simulated_citations_are_logged(client):
+    response = client.post('/demo/simulate-citations', json={'count': 3, 'ai_model': 'Claude-3'})
+    assert response.status_code == 200
+    assert response.json['status'] == 'success' and response.json['count'] == 3
+    assert all(c['citation_id'] and c['ai_model'] == 'Claude-3' for c in response.json['citations'])
+
+
+def test_rejected_simulated_citations_are_reported(client):
+    response = client.post('/demo/simulate-citations', json={'count': 2, 'ai_model': 42})
+    assert response.status_code == 400
+    assert response.json['count'] == 0
+    assert [r['index'] for r in response.json['rejected']] == [0, 1]
+    assert 'ai_model' in response.json['rejected'][0]['message']
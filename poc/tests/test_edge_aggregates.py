@@ -0,0 +1,116 @@
+import random
+from collections import Counter, defaultdict
+import pytest
+from app import create_app
+from app.models.author_index import AuthorIndex
+from app.models.citation_index import EdgeAggregate, citation_event, parse_timestamp
+from app.models.compact_graph import CompactKnowledgeGraph
+from app.models.knowledge_graph import KnowledgeGraph
+
+
+def _citations(count, seed=5):
+    rng = random.Random(seed)
+    citations = []
+    for _ in range(count):
+        citation = {
+            'doi': f'10.1/{rng.randint(0, 5)}',
+            'ai_model': rng.choice(['GPT-4', 'Claude-3']),
+            'source_title': 'Title',
+            'timestamp': f'2024-01-{rng.randint(1, 6):02d}T{rng.randint(0, 23):02d}:00:00'
+        }
+        if rng.random() < 0.7:
+            citation['contribution_score'] = rng.choice([0.2, 0.4, 0.9])
+        citations.append(citation)
+    return citations
+
+
+def test_edge_aggregate_counts_and_histogram():
+    aggregate = EdgeAggregate()
+    for timestamp, contribution in [('2024-01-02T10:00:00', 0.2), ('2024-01-01T23:00:00', 0.4),
+                                    ('2024-01-02T01:00:00', 0.9)]:
+        aggregate.add(parse_timestamp(timestamp), contribution)
+    aggregate.add(None, 0.5)
+
+    stats = aggregate.to_dict(histogram=True)
+    assert stats['count'] == 4
+    assert stats['first_timestamp'] == '2024-01-01T23:00:00+00:00'
+    assert stats['last_timestamp'] == '2024-01-02T10:00:00+00:00'
+    assert stats['contribution_sum'] == pytest.approx(2.0)
+    assert stats['mean_contribution'] == pytest.approx(0.5)
+    assert stats['daily'] == [{'date': '2024-01-01', 'citations': 1},
+                              {'date': '2024-01-02', 'citations': 2}]
+    assert 'daily' not in aggregate.to_dict()
+    assert EdgeAggregate().to_dict()['first_timestamp'] is None
+
+
+def test_merge_matches_adding_every_event():
+    events = [citation_event(c, c['timestamp']) for c in _citations(40)]
+    whole, left, right = EdgeAggregate(), EdgeAggregate(), EdgeAggregate()
+    for i, (epoch, contribution) in enumerate(events):
+        whole.add(epoch, contribution)
+        (left if i % 3 else right).add(epoch, contribution)
+    left.merge(right)
+    assert left.to_dict(histogram=True) == whole.to_dict(histogram=True)
+
+
+def test_citation_event_defaults():
+    assert citation_event({}, 'not a time') == (None, 0.5)
+    assert citation_event({'contribution_score': 1}, '1970-01-02T00:00:00') == (86400.0, 1.0)
+
+
+@pytest.mark.parametrize('graph_class', [KnowledgeGraph, CompactKnowledgeGraph])
+@pytest.mark.parametrize('bulk', [False, True])
+def test_graph_edges_aggregate_repeated_citations(graph_class, bulk):
+    citations = _citations(120)
+    graph = graph_class(load_sample_data=False, author_index=AuthorIndex())
+    if bulk:
+        # Split the batch so later batches land on existing edges
+        graph.add_citations_bulk([dict(c) for c in citations[:50]])
+        graph.add_citations_bulk([dict(c) for c in citations[50:]])
+    else:
+        for citation in citations:
+            graph.add_citation(dict(citation))
+
+    expected = defaultdict(list)
+    for citation in citations:
+        expected[(citation['ai_model'], citation['doi'])].append(citation)
+
+    cites = [edge for edge in graph.get_visualization_data()['edges'] if edge['label'] == 'CITES']
+    assert len(cites) == len(expected)
+    for (model, doi), rows in expected.items():
+        edge = graph.get_edge_stats(model, doi)
+        stats = edge['citations']
+        assert edge['relationship'] == 'CITES'
+        assert edge['weight'] == stats['count'] == len(rows)
+        timestamps = sorted(c['timestamp'] for c in rows)
+        assert stats['first_timestamp'] == timestamps[0] + '+00:00'
+        assert stats['last_timestamp'] == timestamps[-1] + '+00:00'
+        assert stats['contribution_sum'] == pytest.approx(sum(c.get('contribution_score', 0.5) for c in rows))
+        days = Counter(t[:10] for t in timestamps)
+        assert stats['daily'] == [{'date': day, 'citations': n} for day, n in sorted(days.items())]
+
+    assert graph.get_edge_stats('10.1/0', 'GPT-4') == {'error': 'Edge not found'}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app.test_client()
+    app.extensions['aicif'].close()
+
+
+def test_edge_endpoint(client):
+    for day in (1, 1, 3):
+        client.post('/api/citations', json={'doi': '10.1/edge', 'ai_model': 'Edge-Model',
+                                            'timestamp': f'2024-02-0{day}T12:00:00'})
+    response = client.get('/api/graph/edge', query_string={'source': 'Edge-Model', 'target': '10.1/edge'})
+    assert response.status_code == 200
+    edge = response.json['edge']
+    assert edge['weight'] == 3
+    assert [d['citations'] for d in edge['citations']['daily']] == [2, 1]
+
+    assert client.get('/api/graph/edge', query_string={'source': 'Edge-Model'}).status_code == 400
+    missing = client.get('/api/graph/edge', query_string={'source': 'Edge-Model', 'target': '10.1/none'})
+    assert missing.status_code == 404
@@ -0,0 +1,108 @@
+import json
+import subprocess
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from app.models.citation_registry import CitationRegistry
+from app.models.credit_pipeline import CreditPipeline
+from app.models.explanation_jobs import ExplanationJob, ExplanationJobQueue
+from app.models.model_interpreter import ModelInterpreter
+
+
+@pytest.fixture(scope='module')
+def interpreter():
+    return ModelInterpreter()
+
+
+@pytest.fixture
+def queue(interpreter, tmp_path):
+    registry = CitationRegistry(load_sample_data=False)
+    queue = ExplanationJobQueue(interpreter, CreditPipeline(registry, window=3600), workers=2,
+                                directory=str(tmp_path))
+    yield queue
+    queue.shutdown()
+
+
+def _wait(queue, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get_job(job_id)
+        if job['state'] in ('done', 'failed') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_job_runs_to_completion_and_is_visible_to_other_queues(queue, interpreter, tmp_path):
+    rows = interpreter.registry.load_data('climate_data')[:12].tolist()
+    submitted = queue.submit('climate_data', 'temperature_prediction', 'lime', input_data=rows, credit=True)
+    assert submitted['state'] in ('queued', 'running', 'done')
+    assert submitted['rows'] == 12 and submitted['credit']
+
+    job = _wait(queue, submitted['id'])
+    assert job['state'] == 'done', job.get('error')
+    assert job['progress']['chunks_done'] == job['progress']['chunks'] > 1
+    assert job['result']['contributions'] and job['result']['sources']
+
+    # Another process sharing the directory sees the same job
+    other = ExplanationJobQueue(interpreter, directory=str(tmp_path))
+    assert other.get_job(submitted['id']) == job
+
+    # Its credit is logged once the window is flushed
+    queue.credit.close()
+    assert len(queue.credit.registry.citations) == len(job['result']['sources'])
+
+
+def test_cached_explanation_completes_without_the_pool(queue, interpreter):
+    rows = interpreter.registry.load_data('climate_data')[:4].tolist()
+    first = _wait(queue, queue.submit('climate_data', 'temperature_prediction', 'lime', input_data=rows)['id'])
+    queue.shutdown()
+
+    again = queue.submit('climate_data', 'temperature_prediction', 'lime', input_data=rows)
+    assert again['state'] == 'done'
+    assert again['result'] == first['result']
+    assert queue._pool is None
+
+
+def test_job_of_an_exited_process_is_reported_failed(queue, tmp_path):
+    process = subprocess.Popen(['true'])
+    process.wait()
+    job_id = 'ab' * 16
+    with open(tmp_path / f'{job_id}.json', 'w') as f:
+        json.dump({'pid': process.pid, 'job': {'id': job_id, 'state': 'running'}}, f)
+
+    job = queue.get_job(job_id)
+    assert job['state'] == 'failed' and 'exited' in job['error']
+
+
+def test_unknown_and_invalid_jobs(queue):
+    assert queue.get_job('cd' * 16) is None
+    assert queue.get_job('../../etc/passwd') is None
+    assert queue.submit('climate_data', 'no_such_model') is None
+    with pytest.raises(ValueError):
+        queue.submit('climate_data', 'temperature_prediction', 'no_such_method')
+
+
+def test_job_fails_when_the_pool_keeps_breaking(queue, interpreter, monkeypatch):
+    def broken_pool():
+        raise BrokenProcessPool('worker died')
+
+    monkeypatch.setattr(queue, '_get_pool', broken_pool)
+    rows = interpreter.registry.load_data('climate_data')[20:24].tolist()
+    job = queue.submit('climate_data', 'temperature_prediction', 'lime', input_data=rows)
+
+    assert job['state'] == 'failed' and job['error']
+    assert queue.get_job(job['id'])['state'] == 'failed'
+
+
+
+def test_chunk_cancelled_by_a_shutdown_fails_the_job(queue):
+    job = ExplanationJob('climate_data', 'temperature_prediction', 'lime', 4, False)
+    job.chunks, job.parts = 2, [None, None]
+    queue._jobs[job.id] = job
+    cancelled = Future()
+    cancelled.cancel()
+
+    queue._chunk_done(job, 0, cancelled)
+    assert queue.get_job(job.id)['state'] == 'failed'
+    assert queue.get_job(job.id)['error'] == 'The job was cancelled'
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+import pytest
+from app import create_app
+from app.api import routes
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app
+    app.extensions['aicif'].close()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    # Several events share a timestamp so pages have to split on log position
+    batch = [{'doi': f'10.1/{i}', 'ai_model': 'Export-Test', 'source_title': f'Title, {i}',
+              'timestamp': f'2024-01-{1 + i // 3:02d}T00:00:00'} for i in range(10)]
+    assert client.post('/api/citations/bulk', json=batch).json['accepted'] == 10
+    return client
+
+
+def _expected_dois():
+    # Newest first, later log positions first within a timestamp
+    return [f'10.1/{i}' for i in reversed(range(10))]
+
+
+def test_cursor_pages_through_the_api(client):
+    dois, cursor = [], None
+    while True:
+        query = {'ai_model': 'Export-Test', 'limit': 3}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/citations', query_string=query)
+        assert response.status_code == 200
+        assert response.json['count'] <= 3
+        dois.extend(c['doi'] for c in response.json['citations'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+    assert dois == _expected_dois()
+
+
+def test_bad_cursor_is_rejected(client):
+    response = client.get('/api/citations', query_string={'cursor': 'garbage'})
+    assert response.status_code == 400
+    export = client.get('/api/citations/export', query_string={'cursor': 'garbage'})
+    assert export.status_code == 400
+
+
+def test_ndjson_export_streams_every_page(client, monkeypatch):
+    monkeypatch.setattr(routes, 'EXPORT_PAGE_SIZE', 4)
+    response = client.get('/api/citations/export', query_string={'ai_model': 'Export-Test'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['doi'] for row in rows] == _expected_dois()
+
+
+def test_csv_export_has_one_header_and_quotes_fields(client, monkeypatch):
+    monkeypatch.setattr(routes, 'EXPORT_PAGE_SIZE', 4)
+    response = client.get('/api/citations/export',
+                          query_string={'ai_model': 'Export-Test', 'format': 'csv'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['doi'] for row in rows] == _expected_dois()
+    assert rows[0]['source_title'] == 'Title, 9'
+    assert list(rows[0]) == routes.EXPORT_CSV_FIELDS
+
+
+def test_export_rejects_unknown_format_and_bad_dates(client):
+    assert client.get('/api/citations/export', query_string={'format': 'xml'}).status_code == 400
+    response = client.get('/api/citations/export', query_string={'start_date': 'yesterday'})
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+import random
+import networkx as nx
+import pytest
+from app.models.graph_paths import PathQueryEngine
+
+
+@pytest.fixture
+def graph():
+    rng = random.Random(0)
+    graph = nx.gnp_random_graph(40, 0.12, seed=0, directed=True)
+    for u, v in graph.edges:
+        graph.edges[u, v]['relationship'] = rng.choice(['CITES', 'AUTHORED'])
+    return graph
+
+
+def _valid(graph, path, relationships=None):
+    return (len(set(path)) == len(path) and
+            all(graph.has_edge(u, v) and (relationships is None or graph.edges[u, v]['relationship'] in relationships)
+                for u, v in zip(path, path[1:])))
+
+
+@pytest.mark.parametrize('source, target', [(0, 5), (3, 17), (12, 30)])
+def test_k_shortest_paths_match_networkx(graph, source, target):
+    expected = [len(p) for _, p in zip(range(8), nx.shortest_simple_paths(graph, source, target))]
+    paths, truncated = PathQueryEngine(graph).k_shortest_paths(source, target, k=8)
+
+    assert not truncated
+    assert [len(p) for p in paths] == expected
+    assert len({tuple(p) for p in paths}) == len(paths)
+    assert all(_valid(graph, p) and p[0] == source and p[-1] == target for p in paths)
+
+
+def test_depth_and_relationship_limits(graph):
+    engine = PathQueryEngine(graph)
+    paths, _ = engine.k_shortest_paths(3, 19, k=20, max_depth=4, relationships=['CITES'])
+    cites = graph.edge_subgraph([(u, v) for u, v, r in graph.edges(data='relationship') if r == 'CITES'])
+    expected = sorted(len(p) for p in nx.all_simple_paths(cites, 3, 19, cutoff=4))
+
+    assert [len(p) for p in paths] == expected[:20]
+    assert all(len(p) <= 5 and _valid(graph, p, {'CITES'}) for p in paths)
+
+
+def test_missing_path_and_exhausted_budget(graph):
+    graph.add_node('isolated')
+    engine = PathQueryEngine(graph)
+    assert engine.k_shortest_paths(0, 'isolated') == ([], False)
+    assert engine.shortest_path(0, 0) == [0]
+    # The deadline is checked between searches, after the first path at most
+    paths, truncated = engine.k_shortest_paths(0, 5, k=50, time_budget=0)
+    assert truncated and len(paths) <= 1
@@ -0,0 +1,56 @@
+import pytest
+from app.models.author_index import AuthorIndex
+from app.models.citation_registry import CitationRegistry
+from app.models.citation_storage import SegmentedLogStorage
+from app.models.compact_graph import CompactKnowledgeGraph
+from app.models.graph_rebuild import GraphRebuilder
+from app.models.knowledge_graph import KnowledgeGraph
+
+AUTHORS = ['Smith, J. and Doe, A.', 'J. Smith; A Doe', 'Lee K, Smith J', '']
+
+
+def _citations(count):
+    return [{'doi': f'10.1/{i % 7}', 'source_title': f'Paper {i % 7}', 'ai_model': f'model-{i % 3}',
+             'authors': AUTHORS[i % len(AUTHORS)], 'contribution_score': (i % 10) / 10,
+             'timestamp': f'2024-03-{1 + (i * 5) % 28:02d}T{i % 24:02d}:00:00'} for i in range(count)]
+
+
+def _state(graph):
+    data = graph.get_visualization_data()
+    nodes = sorted((n['id'], n['type'], n['size']) for n in data['nodes'])
+    edges = sorted((e['source'], e['target'], e['label'], e['weight']) for e in data['edges'])
+    stats = [graph.get_edge_stats(f'model-{m}', f'10.1/{d}') for m in range(3) for d in range(7)]
+    return nodes, edges, stats
+
+
+def _replayed(graph_class, citations):
+    graph = graph_class(author_index=AuthorIndex())
+    for citation in citations:
+        graph.add_citation(dict(citation))
+    return graph
+
+
+@pytest.fixture(params=['log', 'memory'])
+def registry(request, tmp_path):
+    # Workers read a persistent registry's log, and inherit an in-memory one's history
+    storage = SegmentedLogStorage(str(tmp_path), segment_size=16) if request.param == 'log' else None
+    registry = CitationRegistry(storage=storage, load_sample_data=False)
+    registry.add_citations_bulk(_citations(120))
+    return registry
+
+
+@pytest.mark.parametrize('graph_class', [KnowledgeGraph, CompactKnowledgeGraph])
+def test_rebuild_matches_replay(registry, graph_class):
+    graph = graph_class(author_index=AuthorIndex())
+    result = GraphRebuilder(workers=1).rebuild(graph, registry)
+
+    assert result['citations'] == 120
+    assert _state(graph) == _state(_replayed(graph_class, registry.citations))
+
+
+def test_parallel_rebuild_matches_replay(registry, monkeypatch):
+    monkeypatch.setattr(GraphRebuilder, 'PARALLEL_MIN_CITATIONS', 1)
+    graph = KnowledgeGraph(author_index=AuthorIndex())
+    GraphRebuilder(workers=3).rebuild(graph, registry)
+
+    assert _state(graph) == _state(_replayed(KnowledgeGraph, registry.citations))
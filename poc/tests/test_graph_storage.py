@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+import pytest
+from app.models.author_index import AuthorIndex
+from app.models.compact_graph import CompactKnowledgeGraph
+from app.models.graph_storage import GraphLogStorage, open_graph_storage
+from app.models.knowledge_graph import KnowledgeGraph
+
+
+def _citations(count, start=0):
+    return [{'doi': f'10.1/{i % 6}', 'ai_model': f'model-{i % 3}', 'authors': 'Smith, J. and Doe, A.',
+             'contribution_score': 0.5, 'timestamp': f'2024-02-{1 + i % 28:02d}T12:00:00'}
+            for i in range(start, start + count)]
+
+
+def _graph(graph_class, directory, **kwargs):
+    return graph_class(storage=open_graph_storage(str(directory), **kwargs), author_index=AuthorIndex())
+
+
+def _state(graph):
+    data = graph.get_visualization_data()
+    return (sorted((n['id'], n['type'], n['size']) for n in data['nodes']),
+            sorted((e['source'], e['target'], e['label'], e['weight']) for e in data['edges']),
+            graph.get_edge_stats('model-1', '10.1/1'))
+
+
+@pytest.mark.parametrize('graph_class', [KnowledgeGraph, CompactKnowledgeGraph])
+def test_graph_restores_snapshot_plus_log_tail(tmp_path, graph_class):
+    graph = _graph(graph_class, tmp_path)
+    graph.add_citations_bulk(_citations(20))
+    graph.storage.write_snapshot(graph._snapshot_state())
+    for citation in _citations(9, start=20):
+        graph.add_citation(citation)
+    expected = _state(graph)
+    graph.storage.close()
+
+    restored = _graph(graph_class, tmp_path)
+    assert restored.restored
+    assert _state(restored) == expected
+
+
+@pytest.mark.parametrize('graph_class', [KnowledgeGraph, CompactKnowledgeGraph])
+def test_graph_drops_torn_log_line(tmp_path, graph_class):
+    graph = _graph(graph_class, tmp_path)
+    for citation in _citations(12):
+        graph.add_citation(citation)
+    expected = _state(graph)
+    graph.storage.close()
+    with open(os.path.join(tmp_path, 'graph', GraphLogStorage.SEGMENT_PATTERN.format(0)), 'a') as f:
+        f.write('{"doi": "10.1/torn", "ai_model": "mo')
+
+    assert _state(_graph(graph_class, tmp_path)) == expected
+
+
+def test_interrupted_snapshot_swap_falls_back_to_old_snapshot(tmp_path):
+    graph = _graph(KnowledgeGraph, tmp_path)
+    graph.add_citations_bulk(_citations(10))
+    graph.storage.write_snapshot(graph._snapshot_state())
+    expected = _state(graph)
+    graph.storage.close()
+    # Crash between the two renames of write_snapshot
+    os.replace(os.path.join(tmp_path, 'graph', 'snapshot'), os.path.join(tmp_path, 'graph', 'snapshot.old'))
+
+    assert _state(_graph(KnowledgeGraph, tmp_path)) == expected
+
+
+def _snapshot_position(directory):
+    try:
+        with open(os.path.join(directory, 'graph', 'snapshot', 'manifest.json')) as f:
+            return json.load(f)['position']
+    except FileNotFoundError:
+        return None
+
+
+@pytest.mark.parametrize('graph_class', [KnowledgeGraph, CompactKnowledgeGraph])
+def test_due_snapshots_are_written_in_the_background(tmp_path, graph_class, monkeypatch):
+    graph = _graph(graph_class, tmp_path, snapshot_interval=5)
+    writers = []
+    save_snapshot = graph.storage.save_snapshot
+    monkeypatch.setattr(graph.storage, 'save_snapshot',
+                        lambda snapshot: writers.append(threading.current_thread().name) or save_snapshot(snapshot))
+    for citation in _citations(8):
+        graph.add_citation(citation)
+
+    deadline = time.monotonic() + 10
+    while _snapshot_position(tmp_path) is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert _snapshot_position(tmp_path) is not None
+    assert writers and threading.current_thread().name not in writers
+
+
+@pytest.mark.parametrize('graph_class', [KnowledgeGraph, CompactKnowledgeGraph])
+def test_close_writes_a_final_snapshot(tmp_path, graph_class):
+    graph = _graph(graph_class, tmp_path)
+    graph.add_citations_bulk(_citations(7))
+    expected = _state(graph)
+    graph.close()
+
+    assert _snapshot_position(tmp_path) == 7
+    restored = _graph(graph_class, tmp_path)
+    assert _state(restored) == expected
+    restored.close()
@@ -0,0 +1,147 @@
+import random
+import pytest
+from app import create_app
+from app.api import routes
+from app.models.author_index import AuthorIndex
+from app.models.compact_graph import CompactKnowledgeGraph
+from app.models.knowledge_graph import KnowledgeGraph
+
+
+@pytest.fixture(params=[KnowledgeGraph, CompactKnowledgeGraph])
+def graph(request):
+    rng = random.Random(3)
+    graph = request.param(load_sample_data=False, author_index=AuthorIndex())
+    graph.add_citations_bulk([{
+        'doi': f'10.1/{rng.randint(0, 30)}',
+        'ai_model': rng.choice(['GPT-4', 'Claude-3', 'Llama']),
+        'source_title': f'Title {i}',
+        'source_type': rng.choice(['paper', 'dataset']),
+        'authors': rng.choice(['Smith, J.', 'Ann Lee', 'Doe, A. and Lee, A.']),
+        'timestamp': f'2024-01-{rng.randint(1, 28):02d}T00:00:00'
+    } for i in range(150)])
+    return graph
+
+
+def _all(graph):
+    data = graph.get_visualization_data()
+    return {node['id']: node for node in data['nodes']}, data['edges']
+
+
+def _neighbours(graph, node_id):
+    connections = graph.get_entity_connections(node_id)
+    return {c['id'] for c in connections['incoming'] + connections['outgoing']}
+
+
+def _assert_induced(data):
+    node_ids = {node['id'] for node in data['nodes']}
+    assert len(node_ids) == len(data['nodes'])
+    assert all(edge['source'] in node_ids and edge['target'] in node_ids for edge in data['edges'])
+
+
+def test_ego_network_follows_edges_both_ways(graph):
+    center = '10.1/3'
+    ego = graph.get_ego_network(center, depth=1)
+    assert not ego['truncated']
+    depths = {node['id']: node['depth'] for node in ego['nodes']}
+    assert depths.pop(center) == 0
+    assert set(depths) == _neighbours(graph, center)
+    assert set(depths.values()) == {1}
+    _assert_induced(ego)
+
+    wider = graph.get_ego_network(center, depth=2)
+    assert {node['id'] for node in wider['nodes']} >= set(depths)
+    assert max(node['depth'] for node in wider['nodes']) == 2
+
+    assert graph.get_ego_network('missing') == {'error': 'Entity not found'}
+
+
+def test_ego_network_stops_at_max_nodes(graph):
+    ego = graph.get_ego_network('GPT-4', depth=3, max_nodes=10)
+    assert len(ego['nodes']) == 10
+    assert ego['truncated']
+    _assert_induced(ego)
+
+
+def test_top_nodes_by_degree_and_by_scores(graph):
+    nodes, edges = _all(graph)
+    degree = {node_id: 0 for node_id in nodes}
+    for edge in edges:
+        degree[edge['source']] += 1
+        degree[edge['target']] += 1
+
+    top = graph.get_top_nodes(n=5)
+    assert len(top['nodes']) == 5
+    scores = [node['score'] for node in top['nodes']]
+    assert scores == sorted(degree.values(), reverse=True)[:5]
+    assert all(degree[node['id']] == node['score'] for node in top['nodes'])
+    _assert_induced(top)
+
+    papers = graph.get_top_nodes(n=3, node_type='paper')
+    assert len(papers['nodes']) == 3
+    assert {node['type'] for node in papers['nodes']} == {'paper'}
+
+    ranked = graph.get_top_nodes(n=2, scores={'10.1/1': 1.0, '10.1/2': 3.0, 'missing': 9.0, 'GPT-4': 2.0})
+    assert [node['id'] for node in ranked['nodes']] == ['10.1/2', 'GPT-4']
+
+
+def test_overview_aggregates_every_node_and_edge(graph):
+    nodes, edges = _all(graph)
+    overview = graph.get_overview()
+    counts = {node['type']: node['count'] for node in overview['nodes']}
+    assert sum(counts.values()) == len(nodes)
+    assert counts['ai_model'] == 3
+    assert sum(edge['weight'] for edge in overview['edges']) == len(edges)
+    type_ids = {node['id'] for node in overview['nodes']}
+    assert all(edge['source'] in type_ids and edge['target'] in type_ids for edge in overview['edges'])
+
+
+def test_pages_list_every_node_and_edge_once(graph):
+    nodes, edges = _all(graph)
+    listed, offset = [], 0
+    while True:
+        page = graph.get_nodes_page(offset=offset, limit=7)
+        assert page['total'] == len(nodes)
+        assert len(page['nodes']) <= 7
+        if not page['nodes']:
+            break
+        listed.extend(node['id'] for node in page['nodes'])
+        offset += 7
+    assert sorted(listed) == sorted(nodes)
+
+    papers = graph.get_nodes_page(limit=1000, node_type='paper')['nodes']
+    assert {node['id'] for node in papers} == {node_id for node_id, node in nodes.items() if node['type'] == 'paper'}
+
+    listed = []
+    for offset in range(0, len(edges), 11):
+        page = graph.get_edges_page(offset=offset, limit=11)
+        assert page['total'] == len(edges)
+        listed.extend((edge['source'], edge['target'], edge['label']) for edge in page['edges'])
+    assert sorted(listed) == sorted((edge['source'], edge['target'], edge['label']) for edge in edges)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app.test_client()
+    app.extensions['aicif'].close()
+
+
+def test_graph_view_endpoints_cap_their_size(client, monkeypatch):
+    monkeypatch.setattr(routes, 'MAX_GRAPH_NODES', 3)
+    assert client.get('/api/graph/overview').json['graph']['nodes']
+
+    assert client.get('/api/graph/ego').status_code == 400
+    assert client.get('/api/graph/ego', query_string={'node': 'missing'}).status_code == 404
+    ego = client.get('/api/graph/ego', query_string={'node': 'GPT-4', 'depth': 3, 'max_nodes': 50})
+    assert len(ego.json['graph']['nodes']) == 3
+    assert ego.json['graph']['truncated']
+
+    top = client.get('/api/graph/top', query_string={'n': 50, 'by': 'aicif'})
+    assert len(top.json['graph']['nodes']) == 3
+    assert client.get('/api/graph/top', query_string={'by': 'alphabetical'}).status_code == 400
+
+    assert len(client.get('/api/graph/nodes', query_string={'limit': 50}).json['nodes']) == 3
+    assert len(client.get('/api/graph/edges', query_string={'limit': 50}).json['edges']) == 3
+    assert client.get('/api/graph/nodes', query_string={'offset': -5}).json['offset'] == 0
@@ -0,0 +1,34 @@
+import random
+from collections import Counter
+from app.models.citation_index import Leaderboard
+from app.models.citation_registry import CitationRegistry
+
+
+def test_leaderboard_matches_most_common():
+    rng = random.Random(0)
+    leaderboard, counter = Leaderboard(), Counter()
+    for step in range(3000):
+        key = f'doi-{int(rng.paretovariate(1.2)) % 60}'
+        amount = rng.randint(1, 3)
+        leaderboard.increment(key, amount)
+        counter[key] += amount
+        if step % 250 == 0:
+            for k in (1, 5, 60, 100):
+                assert leaderboard.top(k) == counter.most_common(k)
+    assert len(leaderboard) == len(counter)
+    # Stale heap entries are compacted away
+    assert len(leaderboard._heap) <= 2 * len(counter) + 64
+
+
+def test_registry_top_cited_overall_and_per_model():
+    registry = CitationRegistry(load_sample_data=False)
+    for i in range(40):
+        registry.add_citation({'doi': f'10.1/{i % 7 if i % 2 else 0}', 'ai_model': f'model-{i % 3}',
+                               'source_title': f'Paper {i % 7}', 'timestamp': '2024-01-01T00:00:00'})
+
+    expected = Counter(c['doi'] for c in registry.citations).most_common(3)
+    assert [(w['doi'], w['citation_count']) for w in registry.get_top_cited(limit=3)] == expected
+    per_model = Counter(c['doi'] for c in registry.citations if c['ai_model'] == 'model-1').most_common(2)
+    assert [(w['doi'], w['citation_count']) for w in registry.get_top_cited('model-1', limit=2)] == per_model
+    assert registry.get_top_cited('unknown') == []
+    assert registry.get_top_cited(limit=1)[0]['title'] == 'Paper 0'
@@ -0,0 +1,77 @@
+import json
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from app.models import model_registry
+from app.models.model_registry import ModelRegistry
+
+FEATURES = [{'name': 'a', 'doi': '10.1/a'}, {'name': 'b', 'doi': '10.1/b'}]
+
+
+@pytest.fixture
+def directory(tmp_path):
+    datasets = tmp_path / 'datasets'
+    datasets.mkdir()
+    np.save(datasets / 'numbers.npy', np.arange(6, dtype=np.float64).reshape(3, 2))
+    (datasets / 'table.parquet').write_bytes(b'PAR1')
+    for name in ('numbers', 'table'):
+        (datasets / f'{name}.json').write_text(json.dumps({'features': FEATURES}))
+    return tmp_path
+
+
+def test_npy_dataset_is_memory_mapped(directory):
+    registry = ModelRegistry(str(directory))
+    data = registry.load_data('numbers')
+    assert isinstance(data, np.memmap) and not data.flags.writeable
+    assert data.tolist() == [[0, 1], [2, 3], [4, 5]]
+    assert registry.source_map('numbers').dois == ['10.1/a', '10.1/b']
+
+
+def test_parquet_without_an_engine_is_skipped_with_the_reason(directory, monkeypatch):
+    monkeypatch.setattr(model_registry, '_parquet_available', lambda: False)
+    registry = ModelRegistry(str(directory))
+
+    assert 'table' not in registry.datasets
+    assert registry.skipped[str(directory / 'datasets' / 'table.parquet')] == model_registry.PARQUET_MISSING
+    assert 'numbers' in registry.datasets
+
+
+def test_estimators_over_the_memory_budget_are_evicted_and_reloaded(directory):
+    models = directory / 'models'
+    models.mkdir()
+    data = np.random.default_rng(0).normal(size=(20, 2))
+    for name in ('first', 'second'):
+        joblib.dump(LinearRegression().fit(data, data.sum(axis=1)), models / f'{name}.joblib')
+        (models / f'{name}.json').write_text(json.dumps({'dataset': 'numbers', 'type': 'regression'}))
+    (models / 'orphan.joblib').write_bytes(b'')
+    (models / 'orphan.json').write_text(json.dumps({'dataset': 'missing', 'type': 'regression'}))
+    size = os.path.getsize(models / 'first.joblib')
+    # Room for one estimator only
+    registry = ModelRegistry(str(directory), memory_budget=size + 1)
+    assert registry.skipped[str(models / 'orphan.joblib')] == 'unknown dataset missing'
+
+    first = registry.estimator('first', 'numbers')
+    assert registry.is_loaded('first', 'numbers')
+    registry.estimator('second', 'numbers')
+    assert not registry.is_loaded('first', 'numbers')
+    assert registry.is_loaded('second', 'numbers')
+    assert registry.memory_used() <= size + 1
+
+    reloaded = registry.estimator('first', 'numbers')
+    assert reloaded is not first
+    np.testing.assert_allclose(reloaded.coef_, first.coef_)
+    assert not registry.is_loaded('second', 'numbers')
+
+
+def test_parquet_dataset_is_served_from_its_npy_conversion(directory, monkeypatch):
+    monkeypatch.setattr(model_registry, '_parquet_available', lambda: True)
+    registry = ModelRegistry(str(directory))
+    version = registry.datasets['table']['version']
+    # As left by an earlier conversion
+    (directory / '.cache').mkdir()
+    np.save(directory / '.cache' / f'table-{version}.npy', np.ones((4, 2)))
+
+    data = registry.load_data('table')
+    assert isinstance(data, np.memmap) and data.shape == (4, 2)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from app.models.explanation_engine import ExplanationEngine
+
+
+class Interaction:
+    """Regression model whose features interact, so orderings disagree"""
+
+    def predict(self, data):
+        return data[:, 0] * data[:, 1] + np.sin(3 * data[:, 2]) * data[:, 3]
+
+
+@pytest.fixture
+def data():
+    return np.random.default_rng(0).normal(size=(100, 4))
+
+
+def _explain(engine, estimator, data, rows=None):
+    model = {'estimator': estimator, 'type': 'regression'}
+    rows = data[:10] if rows is None else rows
+    return engine.explain(model, rows, 'permutation', data, ('model', '1'), ('data', '1'))
+
+
+def test_additive_model_converges_to_exact_values(data):
+    weights = np.array([2.0, -1.0, 0.5, 0.0])
+    estimator = LinearRegression().fit(data, data @ weights + 1)
+    engine = ExplanationEngine(max_permutations=64)
+    explanation = _explain(engine, estimator, data)
+
+    # Every ordering gives the same marginals, so two pairs agree exactly
+    assert explanation.details['converged']
+    assert explanation.details['permutations'] == 4
+    summary = engine._summarized_background(data, ('data', '1'), engine.approximate_background)
+    expected = weights * (data[:10] - np.average(summary.data, axis=0, weights=summary.weights))
+    np.testing.assert_allclose(explanation.values, expected, atol=1e-8)
+
+
+def test_sampling_stops_at_the_permutation_cap(data):
+    explanation = _explain(ExplanationEngine(max_permutations=2, time_budget=60), Interaction(), data)
+    assert explanation.details['permutations'] == 2
+    assert not explanation.details['converged']
+
+    explanation = _explain(ExplanationEngine(max_permutations=8, tolerance=1e-9, time_budget=60),
+                           Interaction(), data)
+    assert explanation.details['permutations'] == 8
+    assert not explanation.details['converged']
+
+
+def test_loose_tolerance_converges_early(data):
+    explanation = _explain(ExplanationEngine(max_permutations=64, tolerance=10, time_budget=60),
+                           Interaction(), data)
+    assert explanation.details['converged']
+    assert explanation.details['permutations'] == 4
+
+
+def test_attributions_add_up_to_the_prediction(data):
+    explanation = _explain(ExplanationEngine(), Interaction(), data)
+    prediction = Interaction().predict(data[:10])
+    np.testing.assert_allclose(explanation.values.sum(axis=1) + explanation.base_value, prediction, atol=1e-8)
+    assert explanation.interval.shape == (4,)
+
+
+def test_rows_are_subsampled(data):
+    explanation = _explain(ExplanationEngine(approximate_rows=8), Interaction(), data, rows=data)
+    assert explanation.details['rows'] == 8
+    assert explanation.details['rows_requested'] == 100
+    assert explanation.values.shape == (8, 4)
@@ -0,0 +1,104 @@
+import atexit
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from app import create_app
+from app.models.citation_storage import read_log_range
+from app.services import Services, build_components, close_components
+from app.shared_store import start_server
+
+POC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _build_in_subprocess(data_dir):
+    code = ('from app.services import Services, build_components\n'
+            f'build_components({data_dir!r})\n')
+    return subprocess.run([sys.executable, '-c', code], cwd=POC, capture_output=True, text=True)
+
+
+def test_data_dir_is_refused_while_another_process_has_it_open(tmp_path):
+    registry, graph, _, _ = build_components(str(tmp_path))
+    result = _build_in_subprocess(str(tmp_path))
+    assert result.returncode != 0
+    assert 'StorageLockedError' in result.stderr and 'AICIF_SHARING=shared' in result.stderr
+
+    with registry.locked() as history, graph.locked() as knowledge_graph:
+        history.storage.close()
+        knowledge_graph.storage.close()
+    assert _build_in_subprocess(str(tmp_path)).returncode == 0
+
+
+def test_closing_the_services_stops_jobs_and_releases_the_data_dir(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    services = Services({'AICIF_DATA_DIR': str(tmp_path), 'AICIF_SHARING': 'local'})
+    services.citation_ingest.add_citation({'doi': '10.1/a', 'ai_model': 'GPT-4'})
+    credit = services.explanation_jobs.credit
+    services.close()
+
+    # Nothing of ours is left for exit time
+    assert not [hook for hook in registered if hook.__module__.startswith('app.')]
+    assert credit._stop.is_set()
+    assert _build_in_subprocess(str(tmp_path)).returncode == 0
+
+
+def test_synchronized_exposes_methods_and_guards_state():
+    registry, graph, _, _ = build_components()
+    registry.add_citation({'doi': '10.1/a', 'ai_model': 'GPT-4'})
+    with pytest.raises(AttributeError, match='locked'):
+        registry.citations
+    assert 'get_citations' in dir(registry)
+
+    with registry.locked() as history:
+        assert history.citations[-1]['doi'] == '10.1/a'
+        # Other threads wait for the lock, the graph's included
+        blocked = []
+        thread = threading.Thread(target=lambda: blocked.append(graph.lock.acquire(blocking=False)))
+        thread.start()
+        thread.join()
+        assert blocked == [False]
+
+
+def test_concurrent_ingest_logs_registry_and_graph_in_the_same_order(tmp_path):
+    registry, graph, _, ingest = build_components(str(tmp_path))
+
+    def log(worker):
+        for i in range(40):
+            if i % 4:
+                ingest.add_citation({'doi': f'10.1/{worker}-{i}', 'ai_model': f'model-{worker}'})
+            else:
+                ingest.add_citations_bulk([{'doi': f'10.1/{worker}-{i}-{j}', 'ai_model': f'model-{worker}'}
+                                           for j in range(3)])
+
+    threads = [threading.Thread(target=log, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    close_components(registry, graph)
+
+    # The registry also logged its sample citations
+    registry_log = [c['doi'] for c in read_log_range(str(tmp_path / 'citations'), 100000, 0, 10 ** 6)
+                    if c['doi'].startswith('10.1/')]
+    graph_log = [c['doi'] for c in read_log_range(str(tmp_path / 'graph'), 100000, 0, 10 ** 6)]
+    assert len(registry_log) == 6 * (30 + 10 * 3)
+    assert registry_log == graph_log
+
+
+def test_shared_mode_serves_one_registry_to_every_app(tmp_path, monkeypatch):
+    address = str(tmp_path / 'store.sock')
+    monkeypatch.setenv('AICIF_SHARING', 'shared')
+    monkeypatch.setenv('AICIF_SHARED_ADDRESS', address)
+    monkeypatch.setenv('AICIF_DATA_DIR', str(tmp_path / 'data'))
+    store = start_server(address, 'aicif-development-key', str(tmp_path / 'data'))
+    try:
+        first, second = create_app().test_client(), create_app().test_client()
+        assert first.post('/api/citations', json={'doi': '10.9/shared', 'ai_model': 'X'}).status_code == 200
+        citations = second.get('/api/citations?doi=10.9/shared').json['citations']
+        assert [c['ai_model'] for c in citations] == ['X']
+        assert second.get('/api/graph/edge?source=X&target=10.9/shared').status_code == 200
+    finally:
+        store.terminate()
+        store.wait()
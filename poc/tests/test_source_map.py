@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from app.models.source_map import SourceMap, feature_sources
+
+FEATURES = [
+    {'name': 'temperature', 'doi': '10.1/noaa', 'source': 'NOAA'},
+    {'name': 'heat index', 'sources': [{'doi': '10.1/noaa', 'source': 'NOAA', 'weight': 3},
+                                       {'doi': '10.1/era5', 'source': 'ERA5'}]},
+    {'name': 'co2', 'sources': [{'doi': '10.1/gcp'}, {'doi': '10.1/gcp', 'weight': 1}]}
+]
+
+
+def test_weights_spread_each_feature_over_its_sources():
+    source_map = SourceMap.from_features(FEATURES)
+    assert source_map.dois == ['10.1/noaa', '10.1/era5', '10.1/gcp']
+    assert source_map.titles == ['NOAA', 'ERA5', '10.1/gcp']
+    np.testing.assert_allclose(source_map.weights.toarray(), [[1, 0, 0], [0.75, 0.25, 0], [0, 0, 1]])
+    # A DOI named twice by one feature is summed into one entry
+    assert source_map.feature_sources(2) == [('10.1/gcp', '10.1/gcp', 1.0)]
+    assert source_map.feature_sources(1) == [('10.1/noaa', 'NOAA', 0.75), ('10.1/era5', 'ERA5', 0.25)]
+
+
+def test_credit_preserves_the_total():
+    source_map = SourceMap.from_features(FEATURES)
+    values = np.array([[0.2, 0.4, -0.1], [1.0, 0.0, 2.0]])
+    credit = source_map.credit(values)
+
+    np.testing.assert_allclose(credit, [[0.5, 0.1, -0.1], [1.0, 0.0, 2.0]])
+    np.testing.assert_allclose(credit.sum(axis=1), values.sum(axis=1))
+    np.testing.assert_allclose(source_map.credit(values[0]), credit[0])
+
+
+@pytest.mark.parametrize('feature', [
+    {'name': 'none'},
+    {'name': 'empty', 'sources': []},
+    {'name': 'number', 'doi': 10.1},
+    {'name': 'missing', 'sources': [{'source': 'No DOI'}]},
+    {'name': 'zero', 'sources': [{'doi': '10.1/a', 'weight': 0}]},
+    {'name': 'text', 'sources': [{'doi': '10.1/a', 'weight': 'heavy'}]},
+    {'name': 'string', 'sources': ['10.1/a']}
+])
+def test_features_without_a_valid_source_are_rejected(feature):
+    with pytest.raises(ValueError, match=feature['name']):
+        feature_sources(feature)
+    with pytest.raises(ValueError):
+        SourceMap.from_features(FEATURES + [feature])
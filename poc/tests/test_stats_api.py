@@ -0,0 +1,49 @@
+import pytest
+from app import create_app
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.delenv('AICIF_DATA_DIR', raising=False)
+    monkeypatch.setenv('AICIF_SHARING', 'local')
+    app = create_app({'TESTING': True})
+    yield app
+    app.extensions['aicif'].close()
+
+
+def _shift_last_change(app, seconds):
+    # Move the registry's last change in time instead of waiting for the clock
+    with app.extensions['aicif'].citation_registry.locked() as registry:
+        registry.last_modified += seconds
+
+
+def test_etag_revalidates_until_a_citation_is_added(app):
+    client = app.test_client()
+    first = client.get('/api/stats')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    cached = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+
+    client.post('/api/citations', json={'doi': '10.1/new', 'ai_model': 'GPT-4'})
+    changed = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.json['total_citations'] == first.json['total_citations'] + 1
+    assert changed.headers['ETag'] != etag
+
+
+def test_last_modified_is_only_sent_once_its_second_is_over(app):
+    client = app.test_client()
+    client.post('/api/citations', json={'doi': '10.1/new', 'ai_model': 'GPT-4'})
+    _shift_last_change(app, 5)
+    assert 'Last-Modified' not in client.get('/api/stats').headers
+
+    _shift_last_change(app, -10)
+    last_modified = client.get('/api/stats').headers['Last-Modified']
+    assert client.get('/api/stats', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    client.post('/api/citations', json={'doi': '10.1/newer', 'ai_model': 'GPT-4'})
+    assert client.get('/api/stats', headers={'If-Modified-Since': last_modified}).status_code == 200